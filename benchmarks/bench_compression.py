@@ -0,0 +1,86 @@
+"""
+Бенчмарк сжатия карточки ``GET /api/v1/films/{film_id}`` на тёплом кеше.
+
+Сравнивает процессорное время на запрос:
+
+* ``identity`` — клиент не принимает сжатие, байты уходят как есть;
+* ``on-the-fly`` — тело сжимает ``CompressionMiddleware`` на каждый ответ;
+* ``precompressed`` — текущий путь: сжатый вариант лежит в кеше рядом с
+  payload и отдаётся без работы кодека.
+
+Redis и Elasticsearch не нужны — как и в ``bench_raw_passthrough``.
+
+Запуск::
+
+    DOCS_ONLY=true python -m benchmarks.bench_compression -n 20000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.bench_raw_passthrough import FILM_ID, PAYLOAD
+from src.core.compression import PREFERENCE, compress, variant_etag
+from src.main import app
+from src.services.cache import RawPayload, make_etag
+from src.services.container import ServiceContainer
+
+ETAG = make_etag(PAYLOAD)
+VARIANTS = {encoding: compress(PAYLOAD, encoding) for encoding in PREFERENCE}
+
+
+class WarmCacheFilmService:
+    """Заглушка сервиса: кеш тёплый, сжатые варианты уже в памяти."""
+
+    precompressed = True
+
+    async def get_raw_by_id(self, film_id: str, encoding: str | None = None) -> RawPayload:
+        if encoding is None or not self.precompressed:
+            return RawPayload(PAYLOAD, ETAG)
+        return RawPayload(VARIANTS[encoding], variant_etag(ETAG, encoding), encoding)
+
+
+service = WarmCacheFilmService()
+app.state.services = ServiceContainer(film=service, genre=None, person=None)
+
+
+async def _get(client: httpx.AsyncClient, url: str, headers: dict) -> None:
+    # сырые байты без распаковки: в замер не должна попадать работа клиента
+    async with client.stream("GET", url, headers=headers) as resp:
+        assert resp.status_code == 200, resp.status_code
+        async for _ in resp.aiter_raw():
+            pass
+
+
+async def _measure(client: httpx.AsyncClient, encoding: str, n: int) -> float:
+    url = f"/api/v1/films/{FILM_ID}"
+    headers = {"Accept-Encoding": encoding}
+    for _ in range(min(n, 500)):  # прогрев
+        await _get(client, url, headers)
+    started = time.process_time()
+    for _ in range(n):
+        await _get(client, url, headers)
+    return (time.process_time() - started) / n * 1e6
+
+
+async def main(n: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        identity = await _measure(client, "identity", n)
+        print(f"payload: {len(PAYLOAD)} bytes, {n} requests each")
+        print(f"identity:            {identity:8.1f} µs CPU/request")
+        for encoding in PREFERENCE:
+            service.precompressed = False
+            on_the_fly = await _measure(client, encoding, n)
+            service.precompressed = True
+            precompressed = await _measure(client, encoding, n)
+            print(f"{encoding:<5} ({len(VARIANTS[encoding])} bytes)")
+            print(f"  on-the-fly:        {on_the_fly:8.1f} µs CPU/request")
+            print(f"  precompressed:     {precompressed:8.1f} µs CPU/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=20_000, help="запросов на вариант")
+    asyncio.run(main(parser.parse_args().n))
@@ -0,0 +1,128 @@
+"""
+Микробенчмарк накладных расходов маршрутизации и внедрения зависимостей.
+
+Сервисы подменяются заглушками с готовыми ответами (без Redis/ES),
+поэтому в замер попадает только путь запроса через FastAPI: роутинг,
+разбор параметров, дерево ``Depends`` и сериализация ответа.
+
+Дополнительно сравниваются два способа получить сервис на пустом
+маршруте:
+
+* ``legacy-di`` — как было: ``@lru_cache`` поверх ``Depends(get_redis)``,
+  ``Depends(get_elastic)`` и т.д. — под‑зависимости резолвятся на каждый
+  запрос;
+* ``state-di`` — текущий ``get_film_service``: готовый сервис из
+  ``app.state.services``.
+
+Запуск::
+
+    DOCS_ONLY=true python -m benchmarks.bench_dependencies -n 5000
+"""
+import argparse
+import asyncio
+import time
+from functools import lru_cache
+
+import httpx
+from fastapi import Depends, Response
+
+from src.main import app
+from src.models.batch import BatchItem
+from src.models.film import ShortFilm
+from src.models.genre import Genre
+from src.models.person import Person
+from src.services.cache import RawPayload
+from src.services.container import ServiceContainer
+from src.services.film import get_film_service
+
+FILMS = [ShortFilm(id=f"f{i}", title=f"Film {i}", imdb_rating=7.5) for i in range(50)]
+GENRES = [Genre(id=f"g{i}", name=f"Genre {i}") for i in range(50)]
+PERSONS = [Person(id=f"p{i}", full_name=f"Person {i}", films=[]) for i in range(50)]
+RAW = RawPayload(b'{"id":"x","title":"Film","imdb_rating":7.5}', '"x"')
+
+
+class StubService:
+    def __init__(self, items):
+        self.items = items
+
+    async def list(self, **_):
+        return self.items
+
+    async def search(self, **_):
+        return self.items
+
+    async def get_raw_by_id(self, _, encoding=None):
+        return RAW
+
+    async def get_many(self, ids):
+        return [BatchItem(id=id_, found=False) for id_ in ids]
+
+
+app.state.services = ServiceContainer(
+    film=StubService(FILMS), genre=StubService(GENRES), person=StubService(PERSONS)
+)
+
+
+async def _get_redis():
+    return object()
+
+
+async def _get_elastic():
+    return object()
+
+
+@lru_cache()
+def _legacy_get_film_service(redis=Depends(_get_redis), elastic=Depends(_get_elastic)):
+    return app.state.services.film
+
+
+@app.get("/bench/legacy-di", include_in_schema=False)
+async def legacy_di(service=Depends(_legacy_get_film_service)):
+    return Response(b"{}", media_type="application/json")
+
+
+@app.get("/bench/state-di", include_in_schema=False)
+async def state_di(service=Depends(get_film_service)):
+    return Response(b"{}", media_type="application/json")
+
+
+ENDPOINTS = [
+    ("GET", "/bench/legacy-di", None),
+    ("GET", "/bench/state-di", None),
+    ("GET", "/api/v1/films/?sort=-imdb_rating&page_size=50", None),
+    ("GET", "/api/v1/films/search?query=star", None),
+    ("GET", "/api/v1/films/3d825f60", None),
+    ("POST", "/api/v1/films/batch", {"ids": [f"f{i}" for i in range(20)]}),
+    ("GET", "/api/v1/genres/", None),
+    ("GET", "/api/v1/genres/g1", None),
+    ("GET", "/api/v1/persons/", None),
+    ("GET", "/api/v1/persons/p1", None),
+]
+
+
+async def _measure(client: httpx.AsyncClient, method: str, url: str, body, n: int) -> float:
+    for _ in range(min(n, 200)):  # прогрев
+        await client.request(method, url, json=body)
+    started = time.process_time()
+    for _ in range(n):
+        resp = await client.request(method, url, json=body)
+        assert resp.status_code == 200, resp.text
+    return (time.process_time() - started) / n * 1e6
+
+
+async def main(n: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    # без сжатия: меряем путь ответа, а не кодек (его — в bench_compression)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", headers={"Accept-Encoding": "identity"}
+    ) as client:
+        print(f"{'endpoint':55} µs CPU/request ({n} requests)")
+        for method, url, body in ENDPOINTS:
+            cpu = await _measure(client, method, url, body, n)
+            print(f"{method + ' ' + url:55} {cpu:8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=5_000, help="запросов на маршрут")
+    asyncio.run(main(parser.parse_args().n))
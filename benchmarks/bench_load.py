@@ -0,0 +1,374 @@
+"""
+Нагрузочный бенчмарк всего приложения на заглушках ES и Redis.
+
+Поднимается настоящее приложение — ``lifespan`` из ``src.main`` со всеми
+middleware, кешами, каталогом жанров и метриками, — только вместо
+подключений к Redis/ES/Postgres подставляются ``benchmarks.fakes``:
+ES отвечает по сгенерированному каталогу с задержкой ``--es-latency``,
+Redis — ``fakeredis``. Запросы идут через ``httpx.ASGITransport`` без
+сети, ``--concurrency`` параллельных клиентов в замкнутом цикле.
+
+Смесь трафика — JSONL, по запросу на строку (``benchmarks/traffic/``)::
+
+    {"name": "film_detail", "weight": 30, "method": "GET", "path": "/api/v1/films/{film_id}"}
+
+Плейсхолдеры (``{film_id}``, ``{person_id}``, ``{genre_id}``, ``{genre}``,
+``{film_ids}``, ``{page}``, ``{word}``, ``{prefix}``, ``{name}``,
+``{name_prefix}``) заполняются из каталога с перекосом популярности
+(``--skew``, закон Ципфа) — как в жизни, где горячие карточки
+запрашиваются чаще. Строки без плейсхолдеров — готовые запросы, так что
+записанный лог доступа реплеится той же командой (``--sequential`` —
+строго по порядку, без весов).
+
+Печатаются RPS, p50/p95/p99 (всего и по сценариям), CPU на запрос и
+память на запрос (пик и остаток по ``tracemalloc`` — отдельным
+последовательным проходом, чтобы трассировка не искажала задержки).
+Результат пишется в ``benchmarks/results/<commit>.json``; ``--compare``
+показывает разницу с прошлым прогоном. Всё детерминировано (``--seed``),
+поэтому прогоны разных коммитов сравнимы. Время заглушки ES из CPU
+вычитается; клиент и ``fakeredis`` остаются в замере — их доля от
+коммита к коммиту постоянна и на разницу не влияет. Рейтинги «топ
+фильмов» строятся перед прогревом, как это сделал бы ETL
+(``RANKINGS_ENABLED=false`` — замер без них).
+
+Запуск (``DOCS_ONLY`` не задаётся — нужен полный ``lifespan``)::
+
+    python -m benchmarks.bench_load --requests 20000 --concurrency 16
+    python -m benchmarks.bench_load --compare benchmarks/results/<base>.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from bisect import bisect
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple
+
+import httpx
+
+from benchmarks import fakes
+from src.core.config import settings
+from src.db import elastic, pg, redis
+from src.main import app
+from src.services import cache
+from src.services.rankings import Rankings
+
+RESULTS_DIR = Path(__file__).parent / "results"
+DEFAULT_MIX = Path(__file__).parent / "traffic" / "default.jsonl"
+
+
+class Request(NamedTuple):
+    name: str
+    method: str
+    url: str
+    body: bytes | None
+
+
+class Traffic:
+    """Генератор запросов по смеси из JSONL."""
+
+    def __init__(self, entries: List[dict], catalog: Dict[str, List[dict]], skew: float, seed: int):
+        self.entries = entries
+        self.rng = random.Random(seed)
+        self.cum_weights = list(accumulate(entry.get("weight", 1) for entry in entries))
+        self.films = catalog["movies"]
+        self.persons = catalog["persons"]
+        self.genres = catalog["genres"]
+        # популярность по Ципфу: i‑й по порядку документ в (i+1)^skew раз реже первого
+        self._zipf = {
+            size: list(accumulate(1 / (i + 1) ** skew for i in range(size)))
+            for size in {len(self.films), len(self.persons), len(self.genres)}
+        }
+
+    def _pick(self, items: List[dict]) -> dict:
+        weights = self._zipf[len(items)]
+        return items[bisect(weights, self.rng.random() * weights[-1])]
+
+    def _prefix(self, text: str) -> str:
+        return text[: self.rng.randint(1, len(text))]
+
+    def _values(self) -> Dict[str, object]:
+        film = self._pick(self.films)
+        person = self._pick(self.persons)
+        genre = self._pick(self.genres)
+        return {
+            "film_id": film["id"],
+            "person_id": person["id"],
+            "genre_id": genre["id"],
+            "genre": genre["name"],
+            "film_ids": [self._pick(self.films)["id"] for _ in range(20)],
+            "page": min(int(self.rng.paretovariate(1.5)), 20),
+            "word": self.rng.choice(film["title"].split()),
+            "prefix": self._prefix(film["title"]),
+            "name": person["full_name"].split()[-1],
+            "name_prefix": self._prefix(person["full_name"]),
+        }
+
+    def _render(self, entry: dict) -> Request:
+        values = self._values()
+        url = entry["path"].format_map(values) if "{" in entry["path"] else entry["path"]
+        body = None
+        if "body" in entry:
+            body = json.dumps(_fill(entry["body"], values)).encode()
+        return Request(entry.get("name", entry["path"]), entry.get("method", "GET"), url, body)
+
+    def sample(self, n: int) -> List[Request]:
+        return [
+            self._render(self.entries[bisect(self.cum_weights, self.rng.random() * self.cum_weights[-1])])
+            for _ in range(n)
+        ]
+
+    def sequential(self, n: int) -> List[Request]:
+        return [self._render(self.entries[i % len(self.entries)]) for i in range(n)]
+
+
+def _fill(value, values: Dict[str, object]):
+    """Плейсхолдеры в теле; ``"{film_ids}"`` целиком заменяется списком."""
+    if isinstance(value, dict):
+        return {key: _fill(item, values) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, values) for item in value]
+    if isinstance(value, str) and value.startswith("{") and value.endswith("}") and value[1:-1] in values:
+        return values[value[1:-1]]
+    if isinstance(value, str):
+        return value.format_map(values)
+    return value
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(p) - 1]
+
+
+def _git_commit() -> Dict[str, object]:
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": True}
+    return {"commit": sha, "dirty": dirty}
+
+
+def _install_fakes(store: fakes.FakeStore, es_latency: float) -> None:
+    """Подменяет подключения, которые открывает ``lifespan``."""
+
+    async def open_redis():
+        redis.redis = fakes.fake_redis()
+
+    async def open_elastic():
+        elastic.es = fakes.fake_elastic(store, es_latency)
+
+    async def noop():
+        pass
+
+    redis.open_redis = open_redis
+    elastic.open_elastic = open_elastic
+    pg.open_pg = noop
+    pg.close_pg = noop
+
+
+async def _send(client: httpx.AsyncClient, request: Request, headers: dict) -> int:
+    # сырые байты без распаковки: работа клиента не должна попадать в замер
+    async with client.stream(
+        request.method, request.url, content=request.body,
+        headers={**headers, "content-type": "application/json"} if request.body else headers,
+    ) as resp:
+        async for _ in resp.aiter_raw():
+            pass
+        return resp.status_code
+
+
+async def _load(
+    client: httpx.AsyncClient, requests: List[Request], concurrency: int, headers: dict
+) -> Dict[str, List]:
+    results: Dict[str, List] = defaultdict(list)
+    queue: Iterator[Request] = iter(requests)
+
+    async def worker() -> None:
+        for request in queue:
+            started = time.perf_counter()
+            status = await _send(client, request, headers)
+            results[request.name].append(((time.perf_counter() - started) * 1000, status))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def _allocations(
+    client: httpx.AsyncClient, requests: List[Request], headers: dict
+) -> Dict[str, Dict[str, float]]:
+    """Пик и остаток памяти на запрос, по одному запросу за раз."""
+    samples: Dict[str, List] = defaultdict(list)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for request in requests:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await _send(client, request, headers)
+            after, peak = tracemalloc.get_traced_memory()
+            samples[request.name].append((peak - before, after - before))
+    finally:
+        tracemalloc.stop()
+    return {
+        name: {
+            "alloc_peak_kib": round(statistics.mean(p for p, _ in values) / 1024, 2),
+            "alloc_retained_b": round(statistics.mean(r for _, r in values)),
+        }
+        for name, values in samples.items()
+    }
+
+
+def _summary(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p95_ms": round(_percentile(latencies, 95), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    catalog = fakes.make_catalog(args.films, args.persons, args.seed)
+    store = fakes.FakeStore(catalog)
+    _install_fakes(store, args.es_latency / 1000)
+    entries = [json.loads(line) for line in Path(args.mix).read_text().splitlines() if line.strip()]
+    traffic = Traffic(entries, catalog, args.skew, args.seed)
+    generate = traffic.sequential if args.sequential else traffic.sample
+    # запросы готовятся до замера — их генерация не попадает в CPU
+    warmup = generate(args.warmup)
+    measured = generate(args.requests)
+    allocs = generate(args.alloc_requests)
+    headers = {"Accept-Encoding": args.accept_encoding} if args.accept_encoding else {}
+
+    async with app.router.lifespan_context(app):
+        if settings.rankings_enabled:
+            await Rankings(cache.entity_cache, elastic.es, settings.rankings_depth).build()
+        transport = httpx.ASGITransport(app=app)
+        limits = httpx.Limits(max_connections=None)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits) as client:
+            await _load(client, warmup, args.concurrency, headers)
+            store.calls.clear()
+            store.cpu = 0.0
+            gc.collect()
+            cpu, wall = time.process_time(), time.perf_counter()
+            results = await _load(client, measured, args.concurrency, headers)
+            cpu, wall = time.process_time() - cpu - store.cpu, time.perf_counter() - wall
+            es_calls = dict(store.calls)
+            memory = await _allocations(client, allocs, headers) if allocs else {}
+
+    latencies = [ms for values in results.values() for ms, _ in values]
+    errors = sum(status >= 500 for values in results.values() for _, status in values)
+    return {
+        **_git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("compare", "output")
+        },
+        "summary": {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / wall, 1),
+            **_summary(latencies),
+            "cpu_us_per_request": round(cpu / len(latencies) * 1e6, 1),
+            "fake_es_cpu_us_per_request": round(store.cpu / len(latencies) * 1e6, 1),
+            "errors_5xx": errors,
+            "es_calls_per_request": round(sum(es_calls.values()) / len(latencies), 3),
+        },
+        "es_calls": es_calls,
+        "scenarios": {
+            name: {
+                "requests": len(values),
+                **_summary([ms for ms, _ in values]),
+                "statuses": dict(sorted(
+                    (str(s), sum(1 for _, x in values if x == s)) for s in {x for _, x in values}
+                )),
+                **memory.get(name, {}),
+            }
+            for name, values in sorted(results.items())
+        },
+    }
+
+
+def _print(result: dict, baseline: dict | None) -> None:
+    def delta(new: float, old: float | None) -> str:
+        if old in (None, 0):
+            return ""
+        return f" ({(new - old) / old:+.1%})"
+
+    base = (baseline or {}).get("summary", {})
+    summary = result["summary"]
+    print(f"commit {result['commit']}{' (dirty)' if result['dirty'] else ''}, "
+          f"{summary['requests']} requests, concurrency {result['config']['concurrency']}, "
+          f"ES latency {result['config']['es_latency']} ms")
+    for key in ("rps", "p50_ms", "p95_ms", "p99_ms", "cpu_us_per_request", "es_calls_per_request"):
+        print(f"  {key:22s}{summary[key]:>10}{delta(summary[key], base.get(key))}")
+    print(f"  {'errors_5xx':22s}{summary['errors_5xx']:>10}")
+
+    base_scenarios = (baseline or {}).get("scenarios", {})
+    print(f"\n  {'scenario':18s}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'peak KiB':>10}{'kept B':>9}")
+    for name, s in result["scenarios"].items():
+        old = base_scenarios.get(name, {})
+        print(f"  {name:18s}{s['requests']:>7}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}"
+              f"{s.get('alloc_peak_kib', 0):>10.1f}{s.get('alloc_retained_b', 0):>9}"
+              f"{delta(s['p99_ms'], old.get('p99_ms'))}")
+        bad = {k: v for k, v in s["statuses"].items() if not k.startswith(("2", "3"))}
+        if bad:
+            print(f"  {'':18s}non-2xx: {bad}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mix", default=str(DEFAULT_MIX), help="JSONL со смесью запросов")
+    parser.add_argument("--sequential", action="store_true", help="реплей строк по порядку, без весов")
+    parser.add_argument("--requests", type=int, default=20_000, help="запросов в замере")
+    parser.add_argument("--warmup", type=int, default=2_000, help="запросов на прогрев кешей")
+    parser.add_argument("--alloc-requests", type=int, default=500, help="запросов на замер памяти")
+    parser.add_argument("--concurrency", type=int, default=16, help="параллельных клиентов")
+    parser.add_argument("--es-latency", type=float, default=2.0, help="задержка ES, мс")
+    parser.add_argument("--films", type=int, default=2_000, help="фильмов в каталоге")
+    parser.add_argument("--persons", type=int, default=1_000, help="персон в каталоге")
+    parser.add_argument("--skew", type=float, default=1.0, help="показатель Ципфа для популярности")
+    parser.add_argument("--accept-encoding", default="br", help="Accept-Encoding клиента ('' — без сжатия)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию results/<commit>.json)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    # лог на каждый запрос искажает замер; предупреждения о бюджете
+    # подсказок при насыщенном event loop ожидаемы и видны в ``statuses``/p99
+    for name in ("httpx", "elastic_transport"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    logging.getLogger("src").setLevel(logging.ERROR)
+
+    result = asyncio.run(run(args))
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    _print(result, baseline)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        f"{result['commit']}{'-dirty' if result['dirty'] else ''}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False) + "\n")
+    print(f"\nresults: {os.path.relpath(output)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
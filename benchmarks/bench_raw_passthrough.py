@@ -0,0 +1,102 @@
+"""
+Бенчмарк горячего пути ``GET /api/v1/films/{film_id}`` на тёплом кеше.
+
+Сравнивает процессорное время на запрос:
+
+* ``validated`` — как было: ``Film.model_validate_json`` из кеша, затем
+  валидация по ``response_model`` и сериализация ``ORJSONResponse``;
+* ``raw`` — текущий маршрут: байты из кеша уходят в ответ как есть.
+
+Redis и Elasticsearch не нужны: сервис подменяется заглушкой, которая
+держит готовый payload в памяти, а запросы гоняются через ASGI в том же
+процессе, так что в замер попадает только работа FastAPI и pydantic.
+
+Запуск::
+
+    DOCS_ONLY=true python -m benchmarks.bench_raw_passthrough -n 20000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends
+
+from src.main import app
+from src.models.film import Film
+from src.services.cache import RawPayload, make_etag
+from src.services.container import ServiceContainer
+from src.services.film import get_film_service
+
+FILM_ID = "3d825f60-9fff-4dfe-b294-1a45fa1e115d"
+
+
+def _person(i: int) -> dict:
+    return {"id": f"00000000-0000-0000-0000-{i:012d}", "name": f"Person {i}"}
+
+
+FILM = Film(
+    id=FILM_ID,
+    title="Star Wars: Episode IV - A New Hope",
+    imdb_rating=8.6,
+    description="Luke Skywalker joins forces with a Jedi Knight... " * 5,
+    genre=[{"id": "g1", "name": "Action"}, {"id": "g2", "name": "Sci-Fi"}],
+    actors=[_person(i) for i in range(30)],
+    writers=[_person(i) for i in range(30, 35)],
+    directors=[_person(35)],
+)
+PAYLOAD = FILM.model_dump_json(by_alias=True).encode()
+RAW = RawPayload(PAYLOAD, make_etag(PAYLOAD))
+
+
+class WarmCacheFilmService:
+    """Заглушка сервиса: кеш всегда тёплый, payload уже в памяти."""
+
+    async def get_by_id(self, film_id: str) -> Film:
+        return Film.model_validate_json(PAYLOAD)
+
+    async def get_raw_by_id(self, film_id: str, encoding: str | None = None) -> RawPayload:
+        return RAW
+
+
+app.state.services = ServiceContainer(film=WarmCacheFilmService(), genre=None, person=None)
+
+
+@app.get("/bench/validated/{film_id}", response_model=Film, include_in_schema=False)
+async def film_details_validated(film_id: str, film_service=Depends(get_film_service)):
+    return await film_service.get_by_id(film_id)
+
+
+async def _measure(client: httpx.AsyncClient, url: str, n: int) -> float:
+    for _ in range(min(n, 500)):  # прогрев
+        await client.get(url)
+    started = time.process_time()
+    for _ in range(n):
+        resp = await client.get(url)
+        assert resp.status_code == 200, resp.text
+    return (time.process_time() - started) / n * 1e6
+
+
+async def main(n: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    # без сжатия: меряем путь ответа, а не кодек (его — в bench_compression)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", headers={"Accept-Encoding": "identity"}
+    ) as client:
+        a = (await client.get(f"/bench/validated/{FILM_ID}")).json()
+        b = (await client.get(f"/api/v1/films/{FILM_ID}")).json()
+        assert a == b, "ответы должны совпадать"
+
+        validated = await _measure(client, f"/bench/validated/{FILM_ID}", n)
+        raw = await _measure(client, f"/api/v1/films/{FILM_ID}", n)
+
+    print(f"payload: {len(PAYLOAD)} bytes, {n} requests each")
+    print(f"validated: {validated:8.1f} µs CPU/request")
+    print(f"raw:       {raw:8.1f} µs CPU/request")
+    print(f"saved:     {validated - raw:8.1f} µs CPU/request ({1 - raw / validated:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=20_000, help="запросов на вариант")
+    asyncio.run(main(parser.parse_args().n))
@@ -0,0 +1,117 @@
+"""
+Бенчмарк ``GET /api/v1/films/suggest`` под нагрузкой «нажатий клавиш».
+
+Каждый из ``--users`` виртуальных пользователей набирает название фильма
+по букве (нажатие раз в ``--keystroke-ms``) и на каждое нажатие шлёт
+запрос подсказок; пользователи работают параллельно. Печатаются
+перцентили задержки (wall time), доля запросов, дошедших до ES, и число
+ответов, не уложившихся в бюджет.
+
+Работают настоящие ``FilmService``, ``EntityCache`` и ``QueryCache``;
+Redis — ``fakeredis`` (нужен только для бенчмарка: ``pip install
+fakeredis``), Elasticsearch — заглушка с задержкой ``--es-latency`` мс.
+
+Запуск::
+
+    DOCS_ONLY=true python -m benchmarks.bench_suggest --users 50 --es-latency 8
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+import fakeredis
+import httpx
+
+from src.core.config import settings
+from src.main import app
+from src.services.cache import EntityCache, LocalCache
+from src.services.container import create_services
+from src.services.query_cache import QueryCache
+
+TITLES = [
+    f"{a} {b}"
+    for a in ("Star", "Stardust", "Starship", "Dark", "Darkest", "Lost", "Last", "Little")
+    for b in ("Wars", "Trek", "Knight", "Hour", "City", "Women", "Island", "Troopers")
+]
+
+
+class FakeElastic:
+    """Отвечает на ``bool_prefix``-запрос подсказок по ``TITLES`` с заданной задержкой."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def search(self, index: str, body: dict, **_):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        words = body["query"]["multi_match"]["query"].split()
+        hits = [
+            {"_source": {"id": str(i), "title": title, "imdb_rating": 7.0}}
+            for i, title in enumerate(TITLES)
+            if all(
+                any(w.startswith(q) if n == len(words) - 1 else w == q
+                    for w in title.casefold().split())
+                for n, q in enumerate(words)
+            )
+        ]
+        return {"hits": {"hits": hits[: body["size"]]}}
+
+
+def _percentile(values: list, p: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[int(p) - 1]
+
+
+async def _user(
+    client: httpx.AsyncClient, title: str, pause: float, latencies: list, empty: list
+) -> None:
+    for i in range(1, len(title) + 1):
+        await asyncio.sleep(pause * random.uniform(0.5, 1.5))
+        started = time.perf_counter()
+        resp = await client.get("/api/v1/films/suggest", params={"prefix": title[:i]})
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert resp.status_code == 200, resp.text
+        if not resp.json():
+            empty.append(title[:i])
+
+
+async def main(users: int, rounds: int, keystroke_ms: float, es_latency: float) -> None:
+    elastic = FakeElastic(es_latency / 1000)
+    cache = EntityCache(fakeredis.FakeAsyncRedis(), LocalCache(10_000, 5.0), "bench")
+    queries = QueryCache(cache, settings.query_cache_ttl, settings.index_version_ttl)
+    app.state.services = create_services(cache, queries, elastic)
+
+    latencies: list = []
+    empty: list = []
+    rng = random.Random(42)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*(
+                _user(client, rng.choice(TITLES), keystroke_ms / 1000, latencies, empty)
+                for _ in range(users)
+            ))
+        elapsed = time.perf_counter() - started
+
+    print(f"{len(latencies)} keystrokes, {users} users x {rounds} rounds, "
+          f"ES latency {es_latency} ms, budget {settings.suggest_timeout * 1000:.0f} ms")
+    print(f"offered load: {len(latencies) / elapsed:6.0f} req/s")
+    for p in (50, 95, 99):
+        print(f"p{p}:        {_percentile(latencies, p):8.2f} ms")
+    print(f"ES calls:   {elastic.calls:8d} ({elastic.calls / len(latencies):.0%} of requests)")
+    print(f"over budget (empty): {len(empty)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=50, help="параллельных пользователей")
+    parser.add_argument("--rounds", type=int, default=20, help="сколько раз каждый набирает название")
+    parser.add_argument("--keystroke-ms", type=float, default=150.0, help="пауза между нажатиями, мс")
+    parser.add_argument("--es-latency", type=float, default=8.0, help="задержка ES, мс")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # лог на каждый запрос искажает замер
+    asyncio.run(main(args.users, args.rounds, args.keystroke_ms, args.es_latency))
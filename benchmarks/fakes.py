@@ -0,0 +1,420 @@
+"""
+Заглушки Elasticsearch и Redis для нагрузочных бенчмарков.
+
+Elasticsearch подменяется на уровне транспорта: настоящий
+``AsyncElasticsearch`` (с сериализацией, проверкой продукта и метриками)
+ходит не в сеть, а в ``FakeNode`` — узел, который отвечает по
+сгенерированному каталогу с заданной задержкой. Поддерживается то, что
+использует API: ``get``, ``mget``, ``search`` (``match``/``multi_match``/
+``match_bool_prefix``/``term``/``bool``, сортировка, ``from``/``size``,
+``search_after``, ``post_filter``, агрегации ``terms``/``histogram``/
+``min``/``max``/``filter``), ``msearch`` и point‑in‑time.
+
+Ответ на одинаковый запрос считается один раз и дальше отдаётся готовыми
+байтами, так что повторный запрос стоит заглушке поиска в словаре;
+время самой заглушки копится отдельно (``FakeStore.cpu``).
+
+Redis — ``fakeredis`` (нужен только для бенчмарков: ``pip install fakeredis``)
+под тем же ``InstrumentedRedis``, что и в приложении.
+"""
+import asyncio
+import random
+import re
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, List, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import fakeredis
+import orjson
+from elastic_transport import ApiResponseMeta, BaseAsyncNode, HttpHeaders
+from elastic_transport._node import NodeApiResponse
+
+from src.db.elastic import InstrumentedElasticsearch
+from src.db.redis import InstrumentedRedis
+
+WORDS = (
+    "star dark lost last little city island night river storm king queen hour "
+    "road ghost iron silver golden black white red blue winter summer house "
+    "dream shadow fire water stone wind secret empire garden ocean mountain"
+).split()
+FIRST_NAMES = "Anna Boris Clara David Elena Fedor Greta Hugo Irina Jack Kira Leon Maria Nikolai".split()
+LAST_NAMES = "Smith Ivanova Brown Petrov Garcia Muller Rossi Novak Kowalski Dubois Jensen Sato".split()
+GENRES = (
+    "Action Adventure Animation Biography Comedy Crime Documentary Drama Family "
+    "Fantasy History Horror Music Musical Mystery Romance Sci-Fi Sport Thriller War"
+).split()
+ROLES = {"actor": "actors", "writer": "writers", "director": "directors"}
+
+_RESPONSE_HEADERS = HttpHeaders({
+    "content-type": "application/vnd.elasticsearch+json;compatible-with=8",
+    "x-elastic-product": "Elasticsearch",
+})
+_MEMO_LIMIT = 50_000
+
+
+def _uuid(rng: random.Random) -> str:
+    return "%08x-%04x-%04x-%04x-%012x" % (
+        rng.getrandbits(32), rng.getrandbits(16), rng.getrandbits(16),
+        rng.getrandbits(16), rng.getrandbits(48),
+    )
+
+
+def make_catalog(films: int, persons: int, seed: int = 42) -> Dict[str, List[dict]]:
+    """Документы индексов ``movies``/``genres``/``persons`` в формате ETL."""
+    rng = random.Random(seed)
+    genres = [{"id": _uuid(rng), "name": name, "modified": "2024-01-01T00:00:00+00:00"}
+              for name in GENRES]
+    people = [
+        {"id": _uuid(rng), "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+         "modified": "2024-01-01T00:00:00+00:00", "films": []}
+        for _ in range(persons)
+    ]
+    movies = []
+    for _ in range(films):
+        film = {
+            "id": _uuid(rng),
+            "title": " ".join(rng.sample(WORDS, rng.randint(1, 3))).title(),
+            "description": " ".join(rng.choices(WORDS, k=40)),
+            "imdb_rating": round(rng.uniform(1, 10), 1),
+            "creation_date": f"{rng.randint(1950, 2024)}-01-01",
+            "modified": "2024-01-01T00:00:00+00:00",
+            "genre": [],
+            "actors": [], "writers": [], "directors": [],
+        }
+        for genre in rng.sample(genres, rng.randint(1, 3)):
+            film["genre"].append({"uuid": genre["id"], "name": genre["name"]})
+        film["genres"] = [genre["name"] for genre in film["genre"]]
+        for role, count in (("actor", 6), ("writer", 2), ("director", 1)):
+            for person in rng.sample(people, count):
+                film[ROLES[role]].append({"uuid": person["id"], "full_name": person["full_name"]})
+                person["films"].append({"uuid": film["id"], "roles": [role]})
+        movies.append(film)
+    return {"movies": movies, "genres": genres, "persons": people}
+
+
+# --- поиск по документам ---
+def _tokens(text) -> List[str]:
+    return re.findall(r"\w+", str(text).casefold())
+
+
+def _source_field(field: str) -> str:
+    """Поле документа без ``^boost`` и подполей (``.keyword``, ``.suggest._2gram``)."""
+    return re.sub(r"\.(keyword|suggest(\._\w+)?)$", "", field.split("^")[0])
+
+
+def _values(doc: dict, field: str) -> list:
+    """Значения поля (``a.b`` — по вложенным объектам), без подполей и ``^boost``."""
+    field = _source_field(field)
+    values = [doc]
+    for part in field.split("."):
+        found = []
+        for value in values:
+            item = value.get(part) if isinstance(value, dict) else None
+            if isinstance(item, list):
+                found.extend(item)
+            elif item is not None:
+                found.append(item)
+        values = found
+    return values
+
+
+def _listify(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _parse(target: str, body: bytes | None):
+    if not body:
+        return {}
+    if urlsplit(target).path.endswith("/_msearch"):
+        return [orjson.loads(line) for line in body.splitlines() if line.strip()]
+    return orjson.loads(body)
+
+
+def _project(doc: dict, includes) -> dict:
+    if not includes:
+        return doc
+    top = {path.split(".")[0] for path in includes}
+    return {key: value for key, value in doc.items() if key in top}
+
+
+class FakeStore:
+    """Индексы в памяти и обработка запросов к ним.
+
+    Документ внутри индекса — его позиция в списке; запросы сводятся к
+    операциям над множествами позиций по инвертированным индексам, которые
+    строятся при первом обращении к полю. Время, потраченное самой
+    заглушкой, копится в ``cpu`` — бенчмарк вычитает его из замера.
+    """
+
+    def __init__(self, catalog: Dict[str, List[dict]]):
+        self.order = catalog
+        self.docs = {index: {doc["id"]: doc for doc in docs} for index, docs in catalog.items()}
+        self.positions = {
+            index: {doc["id"]: pos for pos, doc in enumerate(docs)} for index, docs in catalog.items()
+        }
+        self.calls: Counter = Counter()
+        self.cpu = 0.0
+        self._memo: Dict[Tuple[str, str, bytes], Tuple[int, bytes]] = {}
+        self._postings: Dict[Tuple[str, str, bool], Tuple[Dict[object, Set[int]], List]] = {}
+        self._orders: Dict[Tuple[str, str], List[int]] = {}
+
+    def handle(self, method: str, target: str, body: bytes | None) -> Tuple[int, bytes]:
+        started = time.process_time()
+        key = (method, target, body or b"")
+        cached = self._memo.get(key)
+        if cached is None:
+            if len(self._memo) > _MEMO_LIMIT:
+                self._memo.clear()
+            try:
+                status, payload = self._dispatch(method, target, _parse(target, body))
+            except (ValueError, KeyError) as exc:
+                status, payload = 400, {"error": {"type": "fake_unsupported", "reason": str(exc)}}
+            cached = self._memo[key] = (status, orjson.dumps(payload))
+        self.cpu += time.process_time() - started
+        return cached
+
+    def _dispatch(self, method: str, target: str, body: dict) -> Tuple[int, dict]:
+        url = urlsplit(target)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+        includes = params["_source_includes"].split(",") if "_source_includes" in params else None
+
+        if parts == ["_pit"] and method == "DELETE":
+            self.calls["close_point_in_time"] += 1
+            return 200, {"succeeded": True, "num_freed": 1}
+        if len(parts) == 2 and parts[1] == "_pit":
+            self.calls["open_point_in_time"] += 1
+            return 200, {"id": parts[0]}
+        if parts and parts[-1] == "_msearch":
+            self.calls["msearch"] += 1
+            return 200, {"took": 1, "responses": [
+                self._msearch_item(header.get("index", parts[0] if len(parts) == 2 else None), search)
+                for header, search in zip(body[::2], body[1::2])
+            ]}
+        if parts and parts[-1] == "_search":
+            self.calls["search"] += 1
+            index = parts[0] if len(parts) == 2 else body["pit"]["id"]
+            return 200, self._search(index, body)
+        if len(parts) == 2 and parts[1] == "_mget":
+            self.calls["mget"] += 1
+            docs = self.docs[parts[0]]
+            return 200, {"docs": [
+                {"_index": parts[0], "_id": id_, "found": True, "_source": _project(docs[id_], includes)}
+                if id_ in docs else {"_index": parts[0], "_id": id_, "found": False}
+                for id_ in body["ids"]
+            ]}
+        if len(parts) == 3 and parts[1] == "_doc":
+            self.calls["get"] += 1
+            doc = self.docs[parts[0]].get(parts[2])
+            if doc is None:
+                return 404, {"_index": parts[0], "_id": parts[2], "found": False}
+            return 200, {"_index": parts[0], "_id": parts[2], "found": True,
+                         "_source": _project(doc, includes)}
+        raise ValueError(f"unsupported endpoint: {method} {url.path}")
+
+    def _msearch_item(self, index: str | None, body: dict) -> dict:
+        # ошибка одного поиска — в его элементе ответа, как у ES
+        try:
+            if index not in self.docs:
+                return {"status": 404, "error": {"type": "index_not_found_exception", "index": index}}
+            return {**self._search(index, body), "status": 200}
+        except (ValueError, KeyError) as exc:
+            return {"status": 400, "error": {"type": "fake_unsupported", "reason": str(exc)}}
+
+    # --- запросы ---
+    def _index(self, index: str, field: str, analyzed: bool) -> Tuple[Dict[object, Set[int]], List]:
+        """Инвертированный индекс поля: значение (или токен) → позиции."""
+        key = (index, field, analyzed)
+        if key not in self._postings:
+            postings: Dict[object, Set[int]] = defaultdict(set)
+            for pos, doc in enumerate(self.order[index]):
+                for value in _values(doc, field):
+                    for term in (_tokens(value) if analyzed else [value]):
+                        postings[term].add(pos)
+            self._postings[key] = (dict(postings), sorted(postings, key=str))
+        return self._postings[key]
+
+    def _text(self, index: str, fields: List[str], query: str, prefix: bool = False) -> Set[int]:
+        words = _tokens(query)
+        found: Set[int] = set()
+        for field in dict.fromkeys(map(_source_field, fields)):
+            postings, terms = self._index(index, field, analyzed=True)
+            if prefix and words:
+                *exact, last = words
+                start = bisect_left(terms, last)
+                matched = set()
+                for term in terms[start:]:
+                    if not term.startswith(last):
+                        break
+                    matched |= postings[term]
+                for word in exact:
+                    matched &= postings.get(word, set())
+            else:
+                matched = set().union(*(postings.get(word, set()) for word in words))
+            found |= matched
+        return found
+
+    def _select(self, index: str, query: dict) -> Set[int]:
+        (kind, spec), = query.items()
+        if kind == "match_all":
+            return set(range(len(self.order[index])))
+        if kind == "bool":
+            selected = set(range(len(self.order[index])))
+            for clause in [*_listify(spec.get("must")), *_listify(spec.get("filter"))]:
+                selected &= self._select(index, clause)
+            return selected
+        if kind in ("term", "terms"):
+            (field, values), = spec.items()
+            if kind == "term":
+                values = [values["value"] if isinstance(values, dict) else values]
+            postings, _ = self._index(index, field, analyzed=False)
+            return set().union(*(postings.get(value, set()) for value in values))
+        if kind == "exists":
+            return {
+                pos for pos, doc in enumerate(self.order[index])
+                if _values(doc, spec["field"])
+            }
+        if kind == "ids":
+            positions = self.positions[index]
+            return {positions[id_] for id_ in spec["values"] if id_ in positions}
+        if kind in ("match", "match_bool_prefix"):
+            (field, value), = spec.items()
+            text = value["query"] if isinstance(value, dict) else value
+            return self._text(index, [field], text, prefix=kind == "match_bool_prefix")
+        if kind == "multi_match":
+            return self._text(index, spec["fields"], spec["query"], prefix=spec.get("type") == "bool_prefix")
+        if kind == "range":
+            (field, bounds), = spec.items()
+            ops = {"gt": lambda v, b: v > b, "gte": lambda v, b: v >= b,
+                   "lt": lambda v, b: v < b, "lte": lambda v, b: v <= b}
+            return {
+                pos for pos, doc in enumerate(self.order[index])
+                if all(ops[op](v, bound) for v in _values(doc, field)[:1]
+                       for op, bound in bounds.items() if op in ops)
+            }
+        raise ValueError(f"unsupported query: {kind}")
+
+    def _sorted(self, index: str, selected: Set[int], sort: list) -> List[int]:
+        key = (index, orjson.dumps(sort).decode())
+        order = self._orders.get(key)
+        if order is None:
+            order = list(range(len(self.order[index])))
+            docs = self.order[index]
+            for clause in reversed(sort):
+                field, direction = (clause, "asc") if isinstance(clause, str) else next(iter(clause.items()))
+                if field in ("_score", "_shard_doc", "_doc"):
+                    continue
+                direction = direction["order"] if isinstance(direction, dict) else direction
+                present = [pos for pos in order if _values(docs[pos], field)]
+                missing = [pos for pos in order if not _values(docs[pos], field)]
+                present.sort(key=lambda pos: _values(docs[pos], field)[0], reverse=direction == "desc")
+                order = present + missing
+            self._orders[key] = order
+        return [pos for pos in order if pos in selected]
+
+    def _aggs(self, index: str, spec: dict, selected: Set[int]) -> dict:
+        docs = self.order[index]
+        out = {}
+        for name, agg in spec.items():
+            sub = agg.get("aggs") or agg.get("aggregations") or {}
+            if "filter" in agg:
+                matched = selected & self._select(index, agg["filter"])
+                out[name] = {"doc_count": len(matched), **self._aggs(index, sub, matched)}
+            elif "terms" in agg:
+                postings, _ = self._index(index, agg["terms"]["field"], analyzed=False)
+                counts = {key: len(positions & selected) for key, positions in postings.items()}
+                top = sorted(
+                    ((k, n) for k, n in counts.items() if n), key=lambda kv: (-kv[1], kv[0])
+                )[: agg["terms"].get("size", 10)]
+                out[name] = {"buckets": [{"key": k, "doc_count": n} for k, n in top]}
+            elif "histogram" in agg:
+                field, step = agg["histogram"]["field"], agg["histogram"]["interval"]
+                counts = Counter((v // step) * step for pos in selected for v in _values(docs[pos], field)[:1])
+                buckets = []
+                if counts:
+                    key = min(counts)
+                    while key <= max(counts):
+                        buckets.append({"key": key, "doc_count": counts.get(key, 0)})
+                        key += step
+                out[name] = {"buckets": buckets}
+            elif "min" in agg or "max" in agg:
+                kind = "min" if "min" in agg else "max"
+                values = [v for pos in selected for v in _values(docs[pos], agg[kind]["field"])[:1]]
+                if not values:
+                    out[name] = {"value": None}
+                else:
+                    value = min(values) if kind == "min" else max(values)
+                    # даты: формат «yyyy» из запроса
+                    out[name] = {"value": 0, "value_as_string": str(value)[:4]}
+            else:
+                raise ValueError(f"unsupported aggregation: {name}")
+        return out
+
+    def _search(self, index: str, body: dict) -> dict:
+        selected = self._select(index, body.get("query", {"match_all": {}}))
+        aggregations = self._aggs(index, body.get("aggs") or body.get("aggregations") or {}, selected)
+        if "post_filter" in body:
+            selected &= self._select(index, body["post_filter"])
+        positions = self._sorted(index, selected, _listify(body.get("sort")))
+
+        start = body.get("from", 0)
+        if "search_after" in body:
+            start = body["search_after"][-1] + 1
+        size = body.get("size", 10)
+        includes = body.get("_source")
+        includes = includes if isinstance(includes, (list, tuple)) else None
+        docs = self.order[index]
+        hits = [
+            {"_index": index, "_id": docs[pos]["id"], "_score": 1.0,
+             "_source": _project(docs[pos], includes), "sort": [rank]}
+            for rank, pos in enumerate(positions[start:start + size], start)
+        ]
+        resp = {"took": 1, "timed_out": False, "hits": {"hits": hits}}
+        limit = body.get("track_total_hits", 10_000)
+        if limit is not False:
+            total = len(positions)
+            if limit is True or total <= limit:
+                resp["hits"]["total"] = {"value": total, "relation": "eq"}
+            else:
+                resp["hits"]["total"] = {"value": limit, "relation": "gte"}
+        if aggregations:
+            resp["aggregations"] = aggregations
+        if "pit" in body:
+            resp["pit_id"] = body["pit"]["id"]
+        return resp
+
+
+def make_node_class(store: FakeStore, latency: float, jitter: float, seed: int = 42):
+    """Класс узла для ``node_class=``: транспорт создаёт узлы сам, по конфигу."""
+    rng = random.Random(seed)
+
+    class FakeNode(BaseAsyncNode):
+        async def perform_request(self, method, target, body=None, headers=None, request_timeout=None):
+            started = time.perf_counter()
+            if latency:
+                await asyncio.sleep(latency * rng.uniform(1 - jitter, 1 + jitter))
+            status, payload = store.handle(method, target, body)
+            meta = ApiResponseMeta(
+                status=status, http_version="1.1", headers=_RESPONSE_HEADERS,
+                duration=time.perf_counter() - started, node=self.config,
+            )
+            return NodeApiResponse(meta, payload)
+
+        async def close(self) -> None:
+            pass
+
+    return FakeNode
+
+
+def fake_elastic(store: FakeStore, latency: float, jitter: float = 0.5) -> InstrumentedElasticsearch:
+    return InstrumentedElasticsearch(
+        hosts=["http://bench:9200"], node_class=make_node_class(store, latency, jitter)
+    )
+
+
+def fake_redis() -> InstrumentedRedis:
+    return InstrumentedRedis(connection_pool=fakeredis.FakeAsyncRedis().connection_pool)
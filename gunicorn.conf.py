@@ -0,0 +1,26 @@
+"""
+Настройки gunicorn, относящиеся к метрикам.
+
+prometheus_client в режиме multiprocess хранит значения каждого воркера
+в файлах ``PROMETHEUS_MULTIPROC_DIR``. Переменная задаётся здесь, а не в
+образе: воркеры наследуют её от мастера до импорта приложения, а ETL в
+том же образе пишет метрики в обычный реестр процесса. Каталог очищается при старте
+мастера (иначе в сумму попали бы счётчики прошлого запуска), а файлы
+живых gauge умершего воркера убираются в ``child_exit``.
+"""
+import os
+import shutil
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus")
+
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
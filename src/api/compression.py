@@ -0,0 +1,115 @@
+"""
+Сжатие ответов API (gzip / brotli) по ``Accept-Encoding``.
+
+Чистый ASGI‑middleware, как и ``HTTPCacheMiddleware``. Карточки сущностей
+приходят уже сжатыми из кеша (маршрут сам выставляет ``Content-Encoding``)
+— такие ответы пропускаются без изменений. Остальные JSON‑ответы сжимаются
+здесь: целиком, если тело пришло одним сообщением, и потоково — для
+``StreamingResponse``. Тела меньше ``min_size`` отдаются как есть.
+
+ETag сжатого варианта получает суффикс кодировки (``"<hash>-gzip"``), чтобы
+промежуточные кеши не путали представления одного ресурса.
+"""
+from typing import Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.compression import StreamCompressor, choose_encoding, compress, variant_etag
+from src.services.cache import RawPayload
+
+COMPRESSIBLE_TYPES: Tuple[str, ...] = (
+    "application/json",
+    "application/x-ndjson",
+    "text/",
+)
+
+
+def add_vary(headers: MutableHeaders) -> None:
+    vary = headers.get("vary")
+    if vary is None:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+def raw_response(raw: RawPayload) -> Response:
+    """Ответ из готовых байтов кеша (возможно, уже сжатых)."""
+    headers = {"ETag": raw.etag, "Vary": "Accept-Encoding"}
+    if raw.encoding is not None:
+        headers["Content-Encoding"] = raw.encoding
+    return Response(raw.body, media_type="application/json", headers=headers)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, min_size: int = 1024):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        if scope["method"] == "GET":
+            encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        start: Message | None = None
+        compressor: StreamCompressor | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                content_type = headers.get("content-type", "")
+                if message["status"] != 200 or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    await send(message)
+                    return
+                add_vary(headers)
+                if encoding is None or "content-encoding" in headers:
+                    # кодировку не принимают или маршрут уже отдал сжатое тело
+                    await send(message)
+                    return
+                start = message
+                return
+
+            if start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None and not more_body:
+                # тело целиком в одном сообщении — обычный ответ
+                if len(body) >= self.min_size:
+                    body = compress(body, encoding)
+                    self._mark_compressed(headers, encoding)
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            if compressor is None:
+                # потоковый ответ: длина заранее неизвестна
+                compressor = StreamCompressor(encoding)
+                self._mark_compressed(headers, encoding)
+                del headers["content-length"]
+                await send(start)
+
+            chunk = compressor.chunk(body) if body else b""
+            if not more_body:
+                chunk += compressor.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _mark_compressed(headers: MutableHeaders, encoding: str) -> None:
+        headers["Content-Encoding"] = encoding
+        etag = headers.get("etag")
+        if etag is not None:
+            headers["ETag"] = variant_etag(etag, encoding)
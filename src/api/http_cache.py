@@ -0,0 +1,177 @@
+"""
+HTTP‑кеширование ответов: ``ETag`` + ``If-None-Match`` → 304 и политики
+``Cache-Control`` по маршрутам.
+
+Чистый ASGI‑middleware (без ``BaseHTTPMiddleware``), чтобы не добавлять
+лишних задач и копий тела на каждый запрос. Если маршрут уже выставил
+``ETag`` (карточки сущностей берут его из кеша, хеш считается один раз на
+запись), тело не хешируется; иначе сильный ETag считается по телу ответа.
+
+Отданные ETag'и запоминаются в памяти воркера (``etags``) по пути, строке
+запроса и кодировке ответа. Совпавший с запомненным ``If-None-Match``
+получает 304 сразу, без вызова маршрута — без Redis и ES и для списков,
+и для поиска. Запомненный ETag живёт не дольше локального уровня кеша
+сущностей и забывается при любом оповещении об инвалидации: отстаёт от
+данных не больше, чем сам локальный уровень. Иначе (ETag неизвестен или
+устарел) маршрут выполняется, и 304 экономит только передачу тела.
+"""
+import re
+from typing import List, NamedTuple, Pattern, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.compression import choose_encoding
+from src.services import cache
+from src.services.cache import LocalCache, make_etag
+
+# (шаблон пути, Cache-Control); первое совпадение выигрывает
+CachePolicies = List[Tuple[Pattern[str], str]]
+
+DEFAULT_POLICIES: CachePolicies = [
+    (re.compile(r"^/api/v1/health/"), "no-store"),
+    (re.compile(r"^/api/v1/(films|persons)/export$"), "no-store"),
+    (re.compile(r"^/api/v1/genres/$"), "public, max-age=300, stale-while-revalidate=3600"),
+    (re.compile(r"^/api/v1/(films|genres|persons)/search$"),
+     "public, max-age=30, stale-while-revalidate=120"),
+    (re.compile(r"^/api/v1/(films|persons)/$"), "public, max-age=30, stale-while-revalidate=120"),
+    (re.compile(r"^/api/v1/(films|persons)/suggest$"),
+     "public, max-age=30, stale-while-revalidate=60"),
+    (re.compile(r"^/api/v1/(films|genres|persons)/[^/]+$"),
+     "public, max-age=60, stale-while-revalidate=300"),
+]
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение из RFC 9110 — как положено для If-None-Match."""
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == tag
+        for candidate in if_none_match.split(",")
+    )
+
+
+# заголовки ответа, которые повторяет 304
+NOT_MODIFIED_HEADERS = ("cache-control", "etag", "vary")
+
+
+class KnownETag(NamedTuple):
+    """Отданный ответ, достаточный для 304 без вызова маршрута."""
+    etag: str
+    headers: List[Tuple[bytes, bytes]]  # заголовки для 304
+    endpoint: object                     # для метки route в метриках
+    invalidations: int                   # EntityCache.invalidations на момент запроса
+
+
+def not_modified_headers(headers: MutableHeaders) -> List[Tuple[bytes, bytes]]:
+    kept = MutableHeaders()
+    for name in NOT_MODIFIED_HEADERS:
+        if name in headers:
+            kept[name] = headers[name]
+    return kept.raw
+
+
+class HTTPCacheMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        policies: CachePolicies = DEFAULT_POLICIES,
+        etags: LocalCache | None = None,
+    ):
+        self.app = app
+        self.policies = policies
+        self.etags = etags
+
+    def _policy(self, path: str) -> str | None:
+        for pattern, cache_control in self.policies:
+            if pattern.match(path):
+                return cache_control
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        cache_control = self._policy(scope["path"])
+        if cache_control is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        validate = scope["method"] == "GET" and cache_control != "no-store"
+        # без кеша сущностей (DOCS_ONLY) не узнать об инвалидации — не запоминаем
+        invalidations = None if cache.entity_cache is None else cache.entity_cache.invalidations
+        remember = validate and self.etags is not None and invalidations is not None
+        etag_key = ""
+        if remember:
+            encoding = choose_encoding(request_headers.get("accept-encoding")) or ""
+            etag_key = f"{scope['path']}?{scope['query_string'].decode('latin-1')}|{encoding}"
+            known: KnownETag | None = self.etags.get(etag_key)
+            if (
+                known is not None
+                and if_none_match
+                and known.invalidations == invalidations
+                and etag_matches(if_none_match, known.etag)
+            ):
+                scope["endpoint"] = known.endpoint
+                await send({"type": "http.response.start", "status": 304,
+                            "headers": known.headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        def remember_etag(headers: MutableHeaders) -> None:
+            if remember:
+                self.etags.set(etag_key, KnownETag(
+                    headers["etag"], not_modified_headers(headers),
+                    scope.get("endpoint"), invalidations,
+                ))
+
+        start: Message | None = None
+        chunks: List[bytes] = []
+
+        async def send_with_cache_headers(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if message["status"] == 200:
+                    headers.setdefault("Cache-Control", cache_control)
+                if message["status"] != 200 or not validate or (
+                    "etag" in headers and not if_none_match
+                ):
+                    # ETag уже есть и сравнивать не с чем — тело копить не нужно
+                    if message["status"] == 200 and validate:
+                        remember_etag(headers)
+                    await send(message)
+                    return
+                start = message
+                return
+
+            if start is None:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            headers = MutableHeaders(scope=start)
+            etag = headers.get("etag")
+            if etag is None:
+                etag = headers["ETag"] = make_etag(body)
+            remember_etag(headers)
+
+            if if_none_match and etag_matches(if_none_match, etag):
+                await send({"type": "http.response.start", "status": 304,
+                            "headers": not_modified_headers(headers)})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_cache_headers)
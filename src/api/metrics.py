@@ -0,0 +1,65 @@
+"""
+HTTP‑метрики и маршрут ``/metrics``.
+
+Чистый ASGI‑middleware, как ``HTTPCacheMiddleware`` и
+``CompressionMiddleware``, и самый внешний из них — в замер входят сжатие
+и проверка ETag. Метка ``route`` — шаблон пути (``/api/v1/films/{film_id}``),
+а не сам путь: иначе каждый UUID дал бы новый временной ряд. Запросы мимо
+маршрутов попадают в ``route="unmatched"``.
+"""
+import time
+from typing import Callable, Dict
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.metrics import HTTP_LATENCY, render
+
+UNMATCHED = "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._templates: Dict[Callable, str] | None = None
+
+    def _route(self, scope: Scope) -> str:
+        # роутер Starlette кладёт в scope найденный endpoint
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED
+        if self._templates is None:
+            self._templates = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+        return self._templates.get(endpoint, UNMATCHED)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_LATENCY.labels(scope["method"], self._route(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+
+async def metrics(_: Request) -> Response:
+    """Метрики в текстовом формате Prometheus (сводка по всем воркерам)."""
+    body, content_type = render()
+    return Response(body, media_type=content_type)
@@ -0,0 +1,20 @@
+"""
+Ответ на ``Overloaded``: 503 с ``Retry-After`` вместо 500.
+
+Клиент (и nginx) получают сигнал повторить запрос позже, а не ошибку
+сервера; кешируется только 200, так что 503 не попадёт и в HTTP‑кеши.
+"""
+import math
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse
+
+from src.core.overload import Overloaded
+
+
+async def overloaded_handler(_: Request, exc: Overloaded) -> ORJSONResponse:
+    return ORJSONResponse(
+        {"detail": f"{exc.backend} is overloaded, retry later"},
+        status_code=503,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
@@ -1,17 +1,26 @@
 """
 Маршруты `/api/v1/films/*`.
 """
-from typing import List
+from datetime import datetime
+from typing import List, Union
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Body, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
+from src.api.compression import raw_response
+from src.core.compression import choose_encoding
+from src.models.facets import FilmListPage
 from src.models.film import Film, ShortFilm
+from src.models.batch import BatchItem, BatchRequest
+from src.models.page import CursorPage
+from src.services.export import close_export
 from src.services.film import FilmService, get_film_service
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[ShortFilm])
+@router.get("/", response_model=Union[List[ShortFilm], CursorPage[ShortFilm], FilmListPage])
 async def films_list(
     sort: str | None = Query(
         None,
@@ -25,6 +34,21 @@ async def films_list(
     ),
     page_size: int = Query(50, ge=1, le=100),
     page_number: int = Query(1, ge=1),
+    cursor: str | None = Query(
+        None,
+        description=(
+            "Курсорная пагинация: «*» — первая страница, дальше — значение "
+            "`next_cursor` из предыдущего ответа. `page_number` при этом "
+            "игнорируется."
+        ),
+    ),
+    facets: bool = Query(
+        False,
+        description=(
+            "Вернуть конверт с `total` и фасетами (жанры, гистограмма рейтинга, "
+            "диапазон лет). С `cursor` не сочетается."
+        ),
+    ),
     film_service: FilmService = Depends(get_film_service),
 ):
     """
@@ -36,19 +60,31 @@ async def films_list(
     * Сортировка задаётся параметром ``sort``.  
       Пример: ``?sort=-imdb_rating`` — топ‑фильмы по рейтингу.
     * Фильтр по жанру .
-    * Пагинация: ``page_size`` и ``page_number``.
+    * Пагинация: ``page_size`` и ``page_number``, либо ``cursor`` для
+      глубокого обхода каталога (стоимость страницы не зависит от глубины).
+    * ``facets=true`` — всё для страницы каталога одним запросом: общее
+      число фильмов, счётчики по жанрам, гистограмма рейтинга, годы.
 
     Returns
     -------
-    List[ShortFilm]
-        Список фильмов текущей страницы.
+    List[ShortFilm] | CursorPage[ShortFilm] | FilmListPage
+        Список фильмов текущей страницы; при ``cursor`` — страница
+        с ``next_cursor``; при ``facets`` — конверт с фасетами.
     """
+    if cursor is not None:
+        return await film_service.list_page(
+            sort=sort, genre=genre, page_size=page_size, cursor=cursor
+        )
+    if facets:
+        return await film_service.list_with_facets(
+            sort=sort, genre=genre, page_size=page_size, page_number=page_number
+        )
     return await film_service.list(
         sort=sort, genre=genre, page_size=page_size, page_number=page_number
     )
 
 
-@router.get("/search", response_model=List[ShortFilm])
+@router.get("/search", response_model=Union[List[ShortFilm], CursorPage[ShortFilm]])
 async def films_search(
     query: str = Query(
         ...,
@@ -61,8 +97,16 @@ async def films_search(
     ),
     page_size: int = Query(50, ge=1, le=100),
     page_number: int = Query(1, ge=1),
+    cursor: str | None = Query(
+        None,
+        description=(
+            "Курсорная пагинация: «*» — первая страница, дальше — значение "
+            "`next_cursor` из предыдущего ответа. `page_number` при этом "
+            "игнорируется."
+        ),
+    ),
     film_service: FilmService = Depends(get_film_service),
-) -> List[ShortFilm]:
+) -> Union[List[ShortFilm], CursorPage[ShortFilm]]:
     """
     Полнотекстовый **поиск фильмов**.
 
@@ -71,14 +115,82 @@ async def films_search(
 
     Returns
     -------
-    List[ShortFilm]
+    List[ShortFilm] | CursorPage[ShortFilm]
         Релевантные фильмы (карточки) в порядке score ElasticSearch.
     """
+    if cursor is not None:
+        return await film_service.search_page(query=query, page_size=page_size, cursor=cursor)
     return await film_service.search(query=query, page_size=page_size, page_number=page_number)
 
 
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def films_export(
+    updated_since: datetime | None = Query(
+        None,
+        description="Только документы, изменённые не раньше этого момента (ISO 8601)",
+    ),
+    film_service: FilmService = Depends(get_film_service),
+):
+    """Выгрузка всех фильмов потоком NDJSON — по документу на строку.
+
+    Для синхронизации каталога вместо тысяч запросов постраничного списка.
+    Память сервиса не зависит от объёма выгрузки; медленный клиент
+    замедляет чтение из ES. Инкрементальная синхронизация — через
+    ``updated_since`` (поле ``modified`` есть в каждой строке).
+    """
+    stream = await film_service.export(updated_since=updated_since)
+    # закрывает PIT, даже если клиент ушёл до первого куска
+    return StreamingResponse(
+        stream, media_type="application/x-ndjson", background=BackgroundTask(close_export, stream)
+    )
+
+
+@router.get("/suggest", response_model=List[ShortFilm])
+async def films_suggest(
+    prefix: str = Query(
+        ...,
+        min_length=1,
+        max_length=100,
+        description="Начало названия, как его набирает пользователь",
+        example="star wa",
+    ),
+    size: int = Query(10, ge=1, le=20),
+    film_service: FilmService = Depends(get_film_service),
+):
+    """
+    **Подсказки** при наборе названия фильма (typeahead).
+
+    Лёгкий запрос по одному полю `title`, последнее слово — префикс.
+    Результаты кешируются по нормализованному префиксу; если ответ не
+    укладывается в бюджет времени, возвращается пустой список.
+    """
+    return await film_service.suggest(prefix=prefix, size=size)
+
+
+@router.post("/batch", response_model=List[BatchItem[Film]])
+async def film_batch(
+    request: BatchRequest = Body(...),
+    film_service: FilmService = Depends(get_film_service),
+):
+    """Пакетное получение фильмов по списку UUID (до 100 за раз).
+
+    Один ``MGET`` в Redis и один ES ``mget`` на все промахи вместо N
+    отдельных запросов. Ответ идёт в порядке ``ids``; для отсутствующих
+    UUID — ``found: false`` и ``item: null``.
+    """
+    return await film_service.get_many(request.ids)
+
+
 @router.get("/{film_id}", response_model=Film)
-async def film_details(film_id: str, film_service: FilmService = Depends(get_film_service)):
+async def film_details(
+    film_id: str,
+    accept_encoding: str | None = Header(None, include_in_schema=False),
+    film_service: FilmService = Depends(get_film_service),
+):
     """
     Получить **полную информацию** о фильме по UUID.
 
@@ -87,4 +199,6 @@ async def film_details(film_id: str, film_service: FilmService = Depends(get_fil
     HTTPException(404)
         Если фильм не найден.
     """
-    return await film_service.get_by_id(film_id)
+    # готовый JSON из кеша: FastAPI не валидирует и не сериализует Response
+    raw = await film_service.get_raw_by_id(film_id, choose_encoding(accept_encoding))
+    return raw_response(raw)
@@ -1,17 +1,29 @@
 """Маршруты для работы с жанрами (/api/v1/genres/*)."""
-from typing import List
-from fastapi import APIRouter, Depends, Query
+from typing import List, Union
+from fastapi import APIRouter, Body, Depends, Header, Query
 
+from src.api.compression import raw_response
+from src.core.compression import choose_encoding
 from src.models.genre import Genre
+from src.models.batch import BatchItem, BatchRequest
+from src.models.page import CursorPage
 from src.services.genre import GenreService, get_genre_service
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[Genre])
+@router.get("/", response_model=Union[List[Genre], CursorPage[Genre]])
 async def genres_list(
     page_size: int = Query(50, ge=1, le=100),
     page_number: int = Query(1, ge=1),
+    cursor: str | None = Query(
+        None,
+        description=(
+            "Курсорная пагинация: «*» — первая страница, дальше — значение "
+            "`next_cursor` из предыдущего ответа. `page_number` при этом "
+            "игнорируется."
+        ),
+    ),
     genre_service: GenreService = Depends(get_genre_service),
 ):
     """Список всех жанров с пагинацией.
@@ -24,12 +36,16 @@ async def genres_list(
         Сколько элементов на страницу.
     page_number : int
         Какая именно страница нужна.
+    cursor : str | None
+        Курсор для глубокого обхода (``*`` — с начала).
 
     Возвращает
     ----------
-    list[Genre]
-        Массив жанров текущей страницы.
+    list[Genre] | CursorPage[Genre]
+        Массив жанров текущей страницы. При ``cursor`` — страница с ``next_cursor``.
     """
+    if cursor is not None:
+        return await genre_service.list_page(page_size=page_size, cursor=cursor)
     return await genre_service.list(page_size=page_size, page_number=page_number)
 
 
@@ -57,10 +73,30 @@ async def genres_search(
     return await genre_service.search(query=query, page_size=page_size, page_number=page_number)
 
 
+@router.post("/batch", response_model=List[BatchItem[Genre]])
+async def genre_batch(
+    request: BatchRequest = Body(...),
+    genre_service: GenreService = Depends(get_genre_service),
+):
+    """Пакетное получение жанров по списку UUID (до 100 за раз).
+
+    Один ``MGET`` в Redis и один ES ``mget`` на все промахи вместо N
+    отдельных запросов. Ответ идёт в порядке ``ids``; для отсутствующих
+    UUID — ``found: false`` и ``item: null``.
+    """
+    return await genre_service.get_many(request.ids)
+
+
 @router.get("/{genre_id}", response_model=Genre)
-async def genre_details(genre_id: str, genre_service: GenreService = Depends(get_genre_service)):
+async def genre_details(
+    genre_id: str,
+    accept_encoding: str | None = Header(None, include_in_schema=False),
+    genre_service: GenreService = Depends(get_genre_service),
+):
     """Получить жанр по UUID.
 
     Если жанр не существует, вернётся HTTP 404.
     """
-    return await genre_service.get_by_id(genre_id)
+    # готовый JSON из кеша: FastAPI не валидирует и не сериализует Response
+    raw = await genre_service.get_raw_by_id(genre_id, choose_encoding(accept_encoding))
+    return raw_response(raw)
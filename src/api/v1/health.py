@@ -0,0 +1,58 @@
+"""Служебные маршруты (/api/v1/health/*)."""
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse
+
+from src.db import elastic, pg, redis
+from src.services.cache import EntityCache, get_entity_cache
+from src.services.genre import GenreService, get_genre_service
+
+router = APIRouter()
+
+
+@router.get("/cache")
+async def cache_stats(cache: EntityCache = Depends(get_entity_cache)) -> dict:
+    """Счётчики кеша сущностей **текущего воркера**.
+
+    У каждого воркера gunicorn свой локальный уровень, поэтому
+    цифры отражают только процесс, обработавший запрос.
+    """
+    return cache.stats()
+
+
+@router.get("/genres")
+async def genre_catalog_stats(genre_service: GenreService = Depends(get_genre_service)) -> dict:
+    """Состояние каталога жанров в памяти **текущего воркера**."""
+    if genre_service.catalog is None:
+        return {"enabled": False}
+    return {"enabled": True, **genre_service.catalog.stats()}
+
+
+@router.get("/pools")
+async def pools_stats() -> dict:
+    """Загрузка пулов соединений **текущего воркера**.
+
+    По каждому бэкенду: ``max`` — предел пула, ``created`` — открыто
+    соединений, ``in_use`` — занято, ``idle`` — свободно, ``waiting`` —
+    запросов в очереди за соединением.
+    """
+    return {
+        "redis": redis.pool_stats(),
+        "elastic": elastic.pool_stats(),
+        "postgres": pg.pool_stats(),
+    }
+
+
+@router.get("/ready")
+async def readiness(request: Request) -> ORJSONResponse:
+    """Готовность **текущего воркера** принимать трафик.
+
+    Пока идёт прогрев кеша после старта — 503 с прогрессом (``total`` —
+    сущностей и запросов к прогреву, ``done`` — из них пройдено,
+    ``failed`` — не удалось). Неудачный или не уложившийся в
+    ``WARMUP_TIMEOUT`` прогрев готовности не держит.
+    """
+    warmup = getattr(request.app.state, "warmup", None)
+    if warmup is None:
+        return ORJSONResponse({"ready": True, "state": "disabled"})
+    progress = warmup.progress()
+    return ORJSONResponse(progress, status_code=200 if progress["ready"] else 503)
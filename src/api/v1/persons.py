@@ -1,17 +1,33 @@
 """Маршруты для работы с персонами (/api/v1/persons/*)."""
-from typing import List
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime
+from typing import List, Union
+from fastapi import APIRouter, Body, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
-from src.models.person import Person
+from src.api.compression import raw_response
+from src.core.compression import choose_encoding
+from src.models.person import Person, PersonFilmCard, ShortPerson
+from src.models.batch import BatchItem, BatchRequest
+from src.models.page import CursorPage
+from src.services.export import close_export
 from src.services.person import PersonService, get_person_service
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[Person])
+@router.get("/", response_model=Union[List[Person], CursorPage[Person]])
 async def persons_list(
     page_size: int = Query(50, ge=1, le=100),
     page_number: int = Query(1, ge=1),
+    cursor: str | None = Query(
+        None,
+        description=(
+            "Курсорная пагинация: «*» — первая страница, дальше — значение "
+            "`next_cursor` из предыдущего ответа. `page_number` при этом "
+            "игнорируется."
+        ),
+    ),
     person_service: PersonService = Depends(get_person_service),
 ):
     """Список персон с пагинацией.
@@ -25,12 +41,16 @@ async def persons_list(
         Количество элементов на странице.
     page_number : int
         Номер запрашиваемой страницы.
+    cursor : str | None
+        Курсор для глубокого обхода (``*`` — с начала).
 
     Возвращает
     ----------
-    list[Person]
-        Персоны текущей страницы.
+    list[Person] | CursorPage[Person]
+        Персоны текущей страницы. При ``cursor`` — страница с ``next_cursor``.
     """
+    if cursor is not None:
+        return await person_service.list_page(page_size=page_size, cursor=cursor)
     return await person_service.list(page_size=page_size, page_number=page_number)
 
 
@@ -58,11 +78,87 @@ async def persons_search(
     return await person_service.search(query=query, page_size=page_size, page_number=page_number)
 
 
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def persons_export(
+    updated_since: datetime | None = Query(
+        None,
+        description="Только документы, изменённые не раньше этого момента (ISO 8601)",
+    ),
+    person_service: PersonService = Depends(get_person_service),
+):
+    """Выгрузка всех персон потоком NDJSON — по документу на строку.
+
+    Для синхронизации каталога вместо тысяч запросов постраничного списка.
+    Память сервиса не зависит от объёма выгрузки; медленный клиент
+    замедляет чтение из ES. Инкрементальная синхронизация — через
+    ``updated_since`` (поле ``modified`` есть в каждой строке).
+    """
+    stream = await person_service.export(updated_since=updated_since)
+    # закрывает PIT, даже если клиент ушёл до первого куска
+    return StreamingResponse(
+        stream, media_type="application/x-ndjson", background=BackgroundTask(close_export, stream)
+    )
+
+
+@router.get("/suggest", response_model=List[ShortPerson])
+async def persons_suggest(
+    prefix: str = Query(..., min_length=1, max_length=100, description="Начало имени"),
+    size: int = Query(10, ge=1, le=20),
+    person_service: PersonService = Depends(get_person_service),
+):
+    """Подсказки при наборе имени персоны (typeahead).
+
+    Если ответ не укладывается в бюджет времени, возвращается пустой список.
+    """
+    return await person_service.suggest(prefix=prefix, size=size)
+
+
+@router.post("/batch", response_model=List[BatchItem[Person]])
+async def person_batch(
+    request: BatchRequest = Body(...),
+    person_service: PersonService = Depends(get_person_service),
+):
+    """Пакетное получение персон по списку UUID (до 100 за раз).
+
+    Один ``MGET`` в Redis и один ES ``mget`` на все промахи вместо N
+    отдельных запросов. Ответ идёт в порядке ``ids``; для отсутствующих
+    UUID — ``found: false`` и ``item: null``.
+    """
+    return await person_service.get_many(request.ids)
+
+
 @router.get("/{person_id}", response_model=Person)
-async def person_details(person_id: str, person_service: PersonService = Depends(get_person_service)):
+async def person_details(
+    person_id: str,
+    accept_encoding: str | None = Header(None, include_in_schema=False),
+    person_service: PersonService = Depends(get_person_service),
+):
     """Подробности персоны по её UUID.
 
     В ответе также присутствует список фильмов и ролей,
     в которых участвовал данный человек.
     """
-    return await person_service.get_by_id(person_id)
+    # готовый JSON из кеша: FastAPI не валидирует и не сериализует Response
+    raw = await person_service.get_raw_by_id(person_id, choose_encoding(accept_encoding))
+    return raw_response(raw)
+
+
+@router.get("/{person_id}/film", response_model=List[PersonFilmCard])
+async def person_films(
+    person_id: str,
+    accept_encoding: str | None = Header(None, include_in_schema=False),
+    person_service: PersonService = Depends(get_person_service),
+):
+    """Фильмы персоны короткими карточками (`uuid`, `title`, `imdb_rating`)
+    с её ролями в каждом.
+
+    Вместо запроса `/api/v1/films/{film_id}` на каждый фильм из
+    `Person.films`: вся фильмография собирается на сервере одним запросом
+    и отдаётся из кеша.
+    """
+    raw = await person_service.get_films_raw(person_id, choose_encoding(accept_encoding))
+    return raw_response(raw)
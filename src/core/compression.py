@@ -0,0 +1,89 @@
+"""
+Сжатие ответов: выбор кодировки по ``Accept-Encoding`` и сами кодеки.
+
+brotli — необязательная зависимость: без пакета ``brotli`` остаётся gzip.
+gzip пишется с ``mtime=0``, чтобы одно и то же тело всегда давало одни и
+те же байты (и тот же ETag).
+"""
+import gzip
+import zlib
+from typing import Callable, Dict, Tuple
+
+from src.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli не установлен
+    brotli = None
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level, mtime=0)
+
+
+CODECS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _gzip}
+if brotli is not None:
+    CODECS["br"] = lambda body: brotli.compress(body, quality=settings.compression_brotli_quality)
+
+# при равных q предпочитаем то, что сильнее сжимает
+PREFERENCE: Tuple[str, ...] = tuple(enc for enc in ("br", "gzip") if enc in CODECS)
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """Лучшая поддерживаемая кодировка из ``Accept-Encoding`` или None."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in PREFERENCE:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return CODECS[encoding](body)
+
+
+def variant_etag(etag: str, encoding: str) -> str:
+    """ETag сжатого представления: ``"abc"`` → ``"abc-gzip"``."""
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+class StreamCompressor:
+    """Потоковое сжатие для ответов, отдаваемых частями."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+            self._compress = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            # wbits 16+MAX_WBITS — gzip‑обёртка вместо «голого» zlib
+            self._compressor = zlib.compressobj(
+                settings.compression_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+            self._compress = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def chunk(self, data: bytes) -> bytes:
+        # flush на каждом куске — клиент получает данные сразу, а не по
+        # заполнении внутреннего буфера кодека
+        return self._compress(data) + self._flush()
+
+    def finish(self) -> bytes:
+        return self._finish()
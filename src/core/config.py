@@ -26,11 +26,95 @@ class Settings(BaseSettings):                           # добавлено
     # --- Redis ---
     redis_host: str = Field("127.0.0.1", alias="REDIS_HOST")
     redis_port: int = Field(6379, alias="REDIS_PORT")
+    redis_max_connections: int = Field(100, alias="REDIS_MAX_CONNECTIONS")
+    redis_pool_timeout: float = Field(5.0, alias="REDIS_POOL_TIMEOUT")
+    redis_socket_timeout: float = Field(2.0, alias="REDIS_SOCKET_TIMEOUT")
+    redis_connect_timeout: float = Field(2.0, alias="REDIS_CONNECT_TIMEOUT")
+    redis_retries: int = Field(3, alias="REDIS_RETRIES")
+
+    # --- кеш сущностей (локальный уровень воркера + Redis) ---
+    local_cache_size: int = Field(10_000, alias="LOCAL_CACHE_SIZE")
+    local_cache_ttl: float = Field(5.0, alias="LOCAL_CACHE_TTL")
+    cache_invalidation_channel: str = Field(
+        "cache:invalidate", alias="CACHE_INVALIDATION_CHANNEL"
+    )
+    # межворкерная блокировка перестроения ключа (0 — выключена), секунды
+    cache_lock_ttl: float = Field(0, alias="CACHE_LOCK_TTL")
+    cache_lock_poll_interval: float = Field(0.05, alias="CACHE_LOCK_POLL_INTERVAL")
+    # stale‑while‑revalidate: мягкий/жёсткий TTL по типам сущностей, секунды
+    film_cache_soft_ttl: int = Field(60 * 5, alias="FILM_CACHE_SOFT_TTL")
+    film_cache_hard_ttl: int = Field(60 * 60, alias="FILM_CACHE_HARD_TTL")
+    genre_cache_soft_ttl: int = Field(60 * 5, alias="GENRE_CACHE_SOFT_TTL")
+    genre_cache_hard_ttl: int = Field(60 * 60, alias="GENRE_CACHE_HARD_TTL")
+    person_cache_soft_ttl: int = Field(60 * 5, alias="PERSON_CACHE_SOFT_TTL")
+    person_cache_hard_ttl: int = Field(60 * 60, alias="PERSON_CACHE_HARD_TTL")
+    # β из XFetch: > 1 — обновлять раньше, < 1 — позже
+    cache_xfetch_beta: float = Field(1.0, alias="CACHE_XFETCH_BETA")
+    # сколько запись живёт в Redis после жёсткого TTL — её отдают, если ES недоступен
+    cache_stale_if_error: int = Field(60 * 60 * 24, alias="CACHE_STALE_IF_ERROR")
+    # кеш результатов list/search и сколько воркер помнит версию индекса
+    query_cache_ttl: int = Field(60, alias="QUERY_CACHE_TTL")
+    index_version_ttl: float = Field(5.0, alias="INDEX_VERSION_TTL")
+
+    # --- учёт популярности и прогрев кеша при старте ---
+    popularity_enabled: bool = Field(True, alias="POPULARITY_ENABLED")
+    # доля обращений, попадающих в счётчики; как часто сбрасывать их в Redis, с
+    popularity_sample_rate: float = Field(0.1, alias="POPULARITY_SAMPLE_RATE")
+    popularity_flush_interval: float = Field(10.0, alias="POPULARITY_FLUSH_INTERVAL")
+    # раз в сколько секунд счёты делятся пополам; сколько позиций хранить
+    popularity_decay_interval: float = Field(60 * 60, alias="POPULARITY_DECAY_INTERVAL")
+    popularity_max_size: int = Field(10_000, alias="POPULARITY_MAX_SIZE")
+    warmup_enabled: bool = Field(True, alias="WARMUP_ENABLED")
+    # топ сущностей каждого типа и запросов list/search для прогрева
+    warmup_top_entities: int = Field(1000, alias="WARMUP_TOP_ENTITIES")
+    warmup_top_queries: int = Field(200, alias="WARMUP_TOP_QUERIES")
+    # id в одном mget и сколько пачек одновременно
+    warmup_batch_size: int = Field(100, alias="WARMUP_BATCH_SIZE")
+    warmup_concurrency: int = Field(4, alias="WARMUP_CONCURRENCY")
+    # дольше воркер не ждёт прогрева и объявляет себя готовым, секунды
+    warmup_timeout: float = Field(60.0, alias="WARMUP_TIMEOUT")
+
+    # --- подсказки при наборе (/films/suggest, /persons/suggest) ---
+    # длиннее префикс обрезается: ключей кеша меньше, а выдача уже не меняется
+    suggest_max_prefix: int = Field(32, alias="SUGGEST_MAX_PREFIX")
+    suggest_cache_ttl: int = Field(30, alias="SUGGEST_CACHE_TTL")
+    # бюджет на ответ, секунды: не уложились — пустая выдача, а не ожидание
+    suggest_timeout: float = Field(0.05, alias="SUGGEST_TIMEOUT")
+
+    # --- каталог жанров в памяти воркера ---
+    genre_catalog_enabled: bool = Field(True, alias="GENRE_CATALOG_ENABLED")
+    # как часто сверять версию индекса genres, секунды
+    genre_catalog_refresh_interval: float = Field(10.0, alias="GENRE_CATALOG_REFRESH_INTERVAL")
+
+    # --- фасеты списка фильмов ---
+    # точный подсчёт total до этого порога, дальше — «не меньше»
+    facets_track_total_hits: int = Field(10_000, alias="FACETS_TRACK_TOTAL_HITS")
+
+    # --- материализованные рейтинги «топ фильмов» в Redis ---
+    rankings_enabled: bool = Field(True, alias="RANKINGS_ENABLED")
+    # сколько лучших фильмов держать на рейтинг (не больше max_result_window ES)
+    rankings_depth: int = Field(1000, alias="RANKINGS_DEPTH")
+
+    # --- выгрузка каталога в NDJSON ---
+    export_batch_size: int = Field(1000, alias="EXPORT_BATCH_SIZE")
 
     # --- Elasticsearch ---
     elastic_schema: str = Field("http://", alias="ELASTIC_SCHEMA")
     elastic_host: str = Field("127.0.0.1", alias="ELASTIC_HOST")
     elastic_port: int = Field(9200, alias="ELASTIC_PORT")
+    elastic_connections_per_node: int = Field(25, alias="ELASTIC_CONNECTIONS_PER_NODE")
+    elastic_request_timeout: float = Field(10.0, alias="ELASTIC_REQUEST_TIMEOUT")
+    elastic_max_retries: int = Field(3, alias="ELASTIC_MAX_RETRIES")
+    elastic_retry_on_timeout: bool = Field(True, alias="ELASTIC_RETRY_ON_TIMEOUT")
+    # склейка одновременных поисков воркера в _msearch: окно ожидания, с,
+    # и предел поисков в одном запросе
+    elastic_msearch_enabled: bool = Field(False, alias="ELASTIC_MSEARCH_ENABLED")
+    elastic_msearch_window: float = Field(0.002, alias="ELASTIC_MSEARCH_WINDOW")
+    elastic_msearch_max_batch: int = Field(32, alias="ELASTIC_MSEARCH_MAX_BATCH")
+    # реплики индекса после переиндексации (на время заливки — 0)
+    elastic_index_replicas: int = Field(0, alias="ELASTIC_INDEX_REPLICAS")
+    # сколько живёт point-in-time между запросами курсорной пагинации
+    pit_keep_alive: str = Field("1m", alias="PIT_KEEP_ALIVE")
 
     # --- Postgres ---
     pg_host: str = Field("127.0.0.1", alias="PG_HOST")
@@ -38,6 +122,59 @@ class Settings(BaseSettings):                           # добавлено
     pg_db: str = Field("movies_db", alias="PG_DB")
     pg_user: str = Field("app", alias="PG_USER")
     pg_password: str = Field("secret", alias="PG_PASSWORD")
+    pg_connect_timeout: int = Field(5, alias="PG_CONNECT_TIMEOUT")
+    pg_pool_min_size: int = Field(1, alias="PG_POOL_MIN_SIZE")
+    pg_pool_max_size: int = Field(10, alias="PG_POOL_MAX_SIZE")
+    pg_pool_timeout: float = Field(5.0, alias="PG_POOL_TIMEOUT")
+    pg_pool_max_idle: float = Field(300.0, alias="PG_POOL_MAX_IDLE")
+    pg_reconnect_timeout: float = Field(60.0, alias="PG_RECONNECT_TIMEOUT")
+
+    # --- ETL Postgres → Elasticsearch ---
+    etl_batch_size: int = Field(500, alias="ETL_BATCH_SIZE")
+    # пауза между проходами, секунды
+    etl_interval: float = Field(60.0, alias="ETL_INTERVAL")
+    # TTL блокировки запуска; продлевается после каждой пачки
+    etl_lock_ttl: float = Field(300.0, alias="ETL_LOCK_TTL")
+    # строки моложе lag секунд не читаем — их транзакции могут быть не закоммичены
+    etl_watermark_lag: float = Field(1.0, alias="ETL_WATERMARK_LAG")
+    etl_state_key: str = Field("etl:state", alias="ETL_STATE_KEY")
+    # как часто сверять индексы с Postgres (удаления), секунды; 0 — не сверять
+    etl_reconcile_interval: float = Field(3600.0, alias="ETL_RECONCILE_INTERVAL")
+
+    # --- HTTP‑кеширование (ETag/304, Cache-Control) ---
+    http_cache_enabled: bool = Field(True, alias="HTTP_CACHE_ENABLED")
+
+    # --- сжатие ответов (gzip / brotli) ---
+    compression_enabled: bool = Field(True, alias="COMPRESSION_ENABLED")
+    # тела меньше порога отдаём как есть — заголовки и CPU дороже выигрыша
+    compression_min_size: int = Field(1024, alias="COMPRESSION_MIN_SIZE")
+    compression_gzip_level: int = Field(6, alias="COMPRESSION_GZIP_LEVEL")
+    compression_brotli_quality: int = Field(5, alias="COMPRESSION_BROTLI_QUALITY")
+
+    # --- метрики Prometheus (/metrics) ---
+    metrics_enabled: bool = Field(True, alias="METRICS_ENABLED")
+    # как часто воркер замеряет задержку event loop и пулы, секунды
+    metrics_sample_interval: float = Field(1.0, alias="METRICS_SAMPLE_INTERVAL")
+
+    # --- защита от перегрузки (лимиты на воркер, сброс нагрузки, предохранитель) ---
+    overload_protection_enabled: bool = Field(True, alias="OVERLOAD_PROTECTION_ENABLED")
+    # AIMD‑лимит одновременных вызовов: старт, границы и целевое время
+    # вызова, секунды (дольше — лимит уменьшается)
+    elastic_limit_initial: int = Field(10, alias="ELASTIC_LIMIT_INITIAL")
+    elastic_limit_min: int = Field(2, alias="ELASTIC_LIMIT_MIN")
+    elastic_limit_max: int = Field(25, alias="ELASTIC_LIMIT_MAX")
+    elastic_limit_latency: float = Field(0.5, alias="ELASTIC_LIMIT_LATENCY")
+    redis_limit_initial: int = Field(50, alias="REDIS_LIMIT_INITIAL")
+    redis_limit_min: int = Field(5, alias="REDIS_LIMIT_MIN")
+    redis_limit_max: int = Field(100, alias="REDIS_LIMIT_MAX")
+    redis_limit_latency: float = Field(0.05, alias="REDIS_LIMIT_LATENCY")
+    # очередь за слотом: длина и предельное ожидание, секунды; дальше — 503
+    overload_queue_size: int = Field(100, alias="OVERLOAD_QUEUE_SIZE")
+    overload_queue_timeout: float = Field(1.0, alias="OVERLOAD_QUEUE_TIMEOUT")
+    overload_retry_after: float = Field(1.0, alias="OVERLOAD_RETRY_AFTER")
+    # столько отказов подряд открывают предохранитель на reset_timeout секунд
+    circuit_failure_threshold: int = Field(5, alias="CIRCUIT_FAILURE_THRESHOLD")
+    circuit_reset_timeout: float = Field(5.0, alias="CIRCUIT_RESET_TIMEOUT")
 
     # --- режим «только документация» ---
     docs_only: bool = Field(False, alias="DOCS_ONLY")
@@ -0,0 +1,192 @@
+"""
+Метрики Prometheus.
+
+Под gunicorn каждый воркер — отдельный процесс, поэтому метрики пишутся
+в режиме multiprocess: значения лежат в mmap‑файлах каталога
+``PROMETHEUS_MULTIPROC_DIR`` (переменная должна быть задана до импорта
+prometheus_client — её выставляет ``gunicorn.conf.py``), а
+``/metrics`` любого воркера собирает их через ``MultiProcessCollector`` —
+ответ содержит сумму по всем воркерам. Без переменной (uvicorn, ETL)
+используется обычный реестр процесса.
+
+Что измеряется:
+
+* ``http_request_duration_seconds`` — по шаблону маршрута, методу и статусу;
+* ``backend_request_duration_seconds`` — каждый вызов Redis (команда или
+  пайплайн) и Elasticsearch (эндпоинт и индекс);
+* ``stage_duration_seconds`` — валидация и сериализация pydantic‑моделей
+  в кеше сущностей и кеше запросов;
+* ``cache_lookups_total`` — попадания по уровням кеша и промахи по типу
+  сущности (доля попаданий — ``rate`` попаданий к ``rate`` всех);
+* ``pool_connections`` и ``event_loop_lag_seconds`` — загрузка пулов и
+  задержка event loop, их снимает фоновая задача ``monitor``;
+* ``backend_shed_total`` — вызовы, отклонённые защитой от перегрузки, и
+  ``backend_guard`` — её состояние (лимит, занято, очередь, предохранитель),
+  тоже через ``monitor``;
+* ``elastic_msearch_batch_size`` и ``elastic_msearch_wait_seconds`` — размер
+  пачек склейки поисков в ``_msearch`` и ожидание поиска до отправки.
+"""
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# валидация/сериализация одной модели — десятки микросекунд
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# окно склейки поисков — единицы миллисекунд
+WAIT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+BACKEND_LATENCY = Histogram(
+    "backend_request_duration_seconds",
+    "Время вызова Redis / Elasticsearch",
+    ["backend", "operation", "index"],
+    buckets=LATENCY_BUCKETS,
+)
+BACKEND_ERRORS = Counter(
+    "backend_errors_total",
+    "Вызовы Redis / Elasticsearch, завершившиеся исключением",
+    ["backend", "operation", "index"],
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Валидация (validate) и сериализация (serialize) моделей",
+    ["stage", "model"],
+    buckets=STAGE_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups",
+    "Обращения к кешу сущностей: result = local | redis | miss | stale_if_error",
+    ["entity", "result"],
+)
+POOL_CONNECTIONS = Gauge(
+    "pool_connections",
+    "Соединения пулов: state = max | in_use | idle | waiting",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Насколько позже срока просыпается event loop воркера",
+    buckets=LAG_BUCKETS,
+)
+LOOP_LAG_LAST = Gauge(
+    "event_loop_lag_last_seconds",
+    "Последний замер задержки event loop (максимум по воркерам)",
+    multiprocess_mode="livemax",
+)
+
+SHED = Counter(
+    "backend_shed",
+    "Вызовы, отклонённые без обращения к бэкенду: reason = queue_full | queue_timeout | circuit_open",
+    ["backend", "reason"],
+)
+GUARD_STATE = Gauge(
+    "backend_guard",
+    "Защита от перегрузки: state = limit | in_flight | queued (сумма по воркерам)",
+    ["backend", "state"],
+    multiprocess_mode="livesum",
+)
+CIRCUIT_OPEN = Gauge(
+    "backend_circuit_open",
+    "1 — предохранитель открыт хотя бы у одного воркера",
+    ["backend"],
+    multiprocess_mode="livemax",
+)
+MSEARCH_BATCH = Histogram(
+    "elastic_msearch_batch_size",
+    "Поисков в одной отправке склейки (1 — ушёл обычным search)",
+    buckets=BATCH_BUCKETS,
+)
+MSEARCH_WAIT = Histogram(
+    "elastic_msearch_wait_seconds",
+    "Сколько поиск ждал отправки своей пачки в _msearch",
+    buckets=WAIT_BUCKETS,
+)
+
+POOL_STATES = ("max", "in_use", "idle", "waiting")
+GUARD_STATES = ("limit", "in_flight", "queued")
+
+
+@contextmanager
+def backend_call(backend: str, operation: str, index: str = "") -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        BACKEND_ERRORS.labels(backend, operation, index).inc()
+        raise
+    finally:
+        BACKEND_LATENCY.labels(backend, operation, index).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def stage(name: str, model: type) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(name, model.__name__).observe(time.perf_counter() - started)
+
+
+def cache_lookup(key: str, result: str) -> None:
+    """Учитывает обращение к ключу ``<entity>:...``."""
+    CACHE_LOOKUPS.labels(key.partition(":")[0], result).inc()
+
+
+async def monitor(
+    interval: float,
+    pools: Dict[str, Callable[[], dict]],
+    guards: Dict[str, Callable[[], dict]] | None = None,
+) -> None:
+    """Фоновая задача воркера: задержка event loop, загрузка пулов и
+    состояние защиты от перегрузки."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+        for pool, stats in pools.items():
+            values = stats()
+            for state in POOL_STATES:
+                if state in values:
+                    POOL_CONNECTIONS.labels(pool, state).set(values[state])
+        for backend, stats in (guards or {}).items():
+            values = stats()
+            for state in GUARD_STATES:
+                GUARD_STATE.labels(backend, state).set(values[state])
+            CIRCUIT_OPEN.labels(backend).set(values["circuit_open"])
+
+
+def render() -> tuple[bytes, str]:
+    """Тело ответа ``/metrics`` и его Content-Type."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
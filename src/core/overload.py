@@ -0,0 +1,265 @@
+"""
+Защита от перегрузки: адаптивный лимит параллелизма, сброс нагрузки и
+предохранитель (circuit breaker) для вызовов одного бэкенда.
+
+Без неё при замедлении ES каждый воркер копит неограниченное число
+ожидающих корутин: растут память и задержки, а ответы, которых клиент
+уже не ждёт, продолжают нагружать ES. ``Guard`` ставится вокруг каждого
+вызова клиента (см. ``src.db.elastic`` и ``src.db.redis``):
+
+* ``AdaptiveLimiter`` — AIMD: пока вызовы укладываются в целевое время,
+  лимит одновременных вызовов растёт на единицу за «окно» из ``limit``
+  вызовов; медленный или упавший вызов уменьшает его в ``backoff`` раз.
+  Лишние вызовы ждут в очереди, вызовы с высоким приоритетом — впереди;
+* сброс нагрузки — если очередь полна или слот не освободился за
+  ``queue_timeout``, вызов сразу завершается ``Overloaded`` (503 с
+  ``Retry-After``), не дожидаясь таймаутов бэкенда. Низкому приоритету
+  отдана только половина очереди — под нагрузкой он отсекается первым;
+* ``CircuitBreaker`` — после ``failure_threshold`` ошибок бэкенда подряд
+  вызовы ``reset_timeout`` секунд отклоняются без обращения к нему, затем
+  один пробный вызов решает, закрыть предохранитель или открыть снова.
+
+Ошибка бэкенда (соединение, таймаут, 5xx) тоже превращается в
+``Overloaded`` — кеш сущностей на неё отвечает последним известным
+значением (``stale-if-error``). Состояние у каждого воркера своё.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Tuple
+
+from src.core.metrics import SHED
+
+# приоритеты вызовов: выдача по id впереди поиска и списков
+HIGH, LOW = 0, 1
+
+
+class Overloaded(Exception):
+    """Бэкенд перегружен или недоступен — запрос стоит повторить позже."""
+
+    def __init__(self, backend: str, retry_after: float):
+        super().__init__(f"{backend} is overloaded")
+        self.backend = backend
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """AIMD‑лимит одновременных вызовов с приоритетной очередью."""
+
+    def __init__(
+        self,
+        *,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        latency: float,
+        queue_size: int,
+        queue_timeout: float,
+        backoff: float = 0.9,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency = latency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters: Tuple[Deque[asyncio.Future], ...] = (deque(), deque())
+        self._decreased_at = 0.0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters)
+
+    async def acquire(self, priority: int) -> None:
+        """Занимает слот; ``OverflowError`` — очередь полна,
+        ``asyncio.TimeoutError`` — слот не освободился за ``queue_timeout``."""
+        if self.in_flight < int(self.limit) and not self.queued:
+            self.in_flight += 1
+            return
+        capacity = self.queue_size if priority == HIGH else self.queue_size // 2
+        if self.queued >= capacity:
+            raise OverflowError("queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return  # слот передали в последний момент
+            self._forget(priority, waiter)
+            raise
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release(None)  # слот уже наш — отдаём следующему
+            else:
+                self._forget(priority, waiter)
+            raise
+
+    def _forget(self, priority: int, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        self._waiters[priority].remove(waiter)
+
+    def release(self, latency: float | None, dropped: bool = False) -> None:
+        """Освобождает слот и подстраивает лимит по исходу вызова.
+
+        ``latency=None`` — вызов отменён: лимит не меняется.
+        """
+        if latency is not None:
+            self.adjust(latency, dropped)
+        self.in_flight -= 1
+        while self.in_flight < int(self.limit):
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def adjust(self, latency: float, dropped: bool) -> None:
+        """Подстраивает лимит по исходу вызова (без занятия слота)."""
+        now = time.monotonic()
+        if dropped or latency > self.latency:
+            # волна медленных ответов уменьшает лимит один раз, а не на каждый из них
+            if now - self._decreased_at >= self.latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._decreased_at = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _next_waiter(self) -> asyncio.Future | None:
+        for waiters in self._waiters:
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    return waiter
+        return None
+
+
+class CircuitBreaker:
+    """Закрыт → (ошибки подряд) → открыт → (пауза) → пробный вызов.
+
+    ``allow`` выдаёт вызову пропуск: ``None`` — вызов отклонён, ``0`` —
+    обычный вызов, иначе — номер пробного вызова. Пропуск возвращается в
+    ``record``: состояние «открыт» меняет только исход пробного вызова, а
+    запоздавший исход вызова, начатого до открытия, ничего не сбрасывает.
+    """
+
+    def __init__(self, *, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe = 0       # номер идущего пробного вызова, 0 — пробы нет
+        self._probes = 0      # счётчик выданных номеров
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> int | None:
+        if self.opened_at is None:
+            return 0
+        if self._probe or self.retry_after() > 0:
+            return None
+        self._probes += 1
+        self._probe = self._probes
+        return self._probe
+
+    def record(self, failed: bool | None, permit: int = 0) -> None:
+        """Исход вызова с пропуском ``permit`` из ``allow``;
+        ``failed=None`` — вызов отменён и ничего не говорит о бэкенде."""
+        probe = bool(permit) and permit == self._probe
+        if probe:
+            self._probe = 0
+        if failed is None:
+            return
+        if self.opened_at is not None and not probe:
+            # вызов начат до открытия (или чужая проба) — решает только проба
+            return
+        if not failed:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if probe or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class Guard:
+    """Лимитер и предохранитель одного бэкенда.
+
+    ``is_failure`` решает, какие исключения клиента — отказ бэкенда
+    (остальные, например 404, — обычный ответ).
+    """
+
+    def __init__(
+        self,
+        backend: str,
+        limiter: AdaptiveLimiter,
+        breaker: CircuitBreaker,
+        is_failure: Callable[[BaseException], bool],
+        retry_after: float,
+    ):
+        self.backend = backend
+        self.limiter = limiter
+        self.breaker = breaker
+        self.is_failure = is_failure
+        self.retry_after = retry_after
+
+    def _shed(self, reason: str, retry_after: float) -> Overloaded:
+        SHED.labels(self.backend, reason).inc()
+        return Overloaded(self.backend, retry_after)
+
+    @asynccontextmanager
+    async def call(self, priority: int) -> AsyncIterator[None]:
+        permit = self.breaker.allow()
+        if permit is None:
+            raise self._shed("circuit_open", self.breaker.retry_after())
+        try:
+            await self.limiter.acquire(priority)
+        except OverflowError:
+            self.breaker.record(None, permit)
+            raise self._shed("queue_full", self.retry_after) from None
+        except asyncio.TimeoutError:
+            self.breaker.record(None, permit)
+            raise self._shed("queue_timeout", self.retry_after) from None
+        except BaseException:
+            self.breaker.record(None, permit)
+            raise
+
+        started = time.perf_counter()
+        failed: bool | None = None
+        try:
+            yield
+            failed = False
+        except Exception as exc:
+            failed = self.is_failure(exc)
+            if failed:
+                raise Overloaded(self.backend, self.retry_after) from exc
+            raise
+        finally:
+            latency = None if failed is None else time.perf_counter() - started
+            self.limiter.release(latency, bool(failed))
+            self.breaker.record(failed, permit)
+
+    def record(self, failed: bool) -> None:
+        """Исход части уже завершённого вызова — например, одного поиска
+        из ``_msearch``: сам вызов прошёл, но бэкенд отказал в части."""
+        self.limiter.adjust(0.0, failed)
+        self.breaker.record(failed)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limiter.limit,
+            "in_flight": self.limiter.in_flight,
+            "queued": self.limiter.queued,
+            "circuit_open": int(self.breaker.is_open),
+        }
@@ -1,8 +1,137 @@
-from elasticsearch import AsyncElasticsearch
+from elasticsearch import ApiError, AsyncElasticsearch, TransportError
+
+from src.core.config import settings
+from src.core.metrics import backend_call
+from src.core.overload import HIGH, LOW, AdaptiveLimiter, CircuitBreaker, Guard, Overloaded
+from src.db.msearch import SearchBatcher
 
 es: AsyncElasticsearch | None = None   # изменено
 
+# выдача по id (карточки) важнее поиска и списков: под нагрузкой они
+# стоят в очереди впереди и отсекаются последними
+PRIORITY_ENDPOINTS = frozenset({"get", "mget"})
+
+
+class InstrumentedElasticsearch(AsyncElasticsearch):
+    """Клиент, замеряющий каждый вызов API с именем эндпоинта и индексом.
+
+    С ``guard`` (его ставит ``lifespan`` API; ETL работает без него)
+    вызовы идут через защиту от перегрузки, с ``batcher`` — простые
+    поиски ``search(index=..., body=...)`` склеиваются в ``_msearch``.
+    """
+
+    guard: Guard | None = None
+    batcher: SearchBatcher | None = None
+
+    async def search(self, **kwargs):
+        # PIT-поиски (без индекса) и поиски с параметрами запроса — как есть
+        if self.batcher is None or kwargs.keys() != {"index", "body"} or kwargs["index"] is None:
+            return await super().search(**kwargs)
+        try:
+            return await self.batcher.search(kwargs["index"], kwargs["body"])
+        except ApiError as exc:
+            # отказ внутри ответа _msearch: сам вызов защита сочла успешным
+            if self.guard is not None and is_failure(exc):
+                raise Overloaded("elastic", self.guard.retry_after) from exc
+            raise
+
+    async def perform_request(self, method, path, *, endpoint_id=None, path_parts=None, **kwargs):
+        operation = endpoint_id or method.lower()
+        index = str((path_parts or {}).get("index", ""))
+        if self.guard is None:
+            with backend_call("elastic", operation, index):
+                return await super().perform_request(
+                    method, path, endpoint_id=endpoint_id, path_parts=path_parts, **kwargs
+                )
+        async with self.guard.call(HIGH if operation in PRIORITY_ENDPOINTS else LOW):
+            with backend_call("elastic", operation, index):
+                return await super().perform_request(
+                    method, path, endpoint_id=endpoint_id, path_parts=path_parts, **kwargs
+                )
+
+
+def is_failure(exc: BaseException) -> bool:
+    """Отказ ES: нет соединения, таймаут, 5xx или 429 (а не 404 и 400)."""
+    if isinstance(exc, ApiError):
+        return exc.meta.status == 429 or exc.meta.status >= 500
+    return isinstance(exc, TransportError)
+
+
+def make_guard() -> Guard:
+    return Guard(
+        "elastic",
+        AdaptiveLimiter(
+            initial=settings.elastic_limit_initial,
+            min_limit=settings.elastic_limit_min,
+            max_limit=settings.elastic_limit_max,
+            latency=settings.elastic_limit_latency,
+            queue_size=settings.overload_queue_size,
+            queue_timeout=settings.overload_queue_timeout,
+        ),
+        CircuitBreaker(
+            failure_threshold=settings.circuit_failure_threshold,
+            reset_timeout=settings.circuit_reset_timeout,
+        ),
+        is_failure,
+        settings.overload_retry_after,
+    )
+
+
+def make_batcher(client: AsyncElasticsearch) -> SearchBatcher:
+    return SearchBatcher(
+        client, window=settings.elastic_msearch_window, max_size=settings.elastic_msearch_max_batch
+    )
+
+
 async def get_elastic() -> AsyncElasticsearch:
     if es is None:
         raise RuntimeError("Elastic disabled in DOCS_ONLY mode")
     return es
+
+
+async def open_elastic():
+    global es
+    es = InstrumentedElasticsearch(
+        hosts=[f"{settings.elastic_schema}{settings.elastic_host}:{settings.elastic_port}"],
+        connections_per_node=settings.elastic_connections_per_node,
+        request_timeout=settings.elastic_request_timeout,
+        max_retries=settings.elastic_max_retries,
+        retry_on_timeout=settings.elastic_retry_on_timeout,
+    )
+
+
+async def close_elastic():
+    await es.close()
+
+
+def pool_stats() -> dict:
+    """Состояние aiohttp‑пулов по узлам ES (сессия создаётся при первом запросе)."""
+    if es is None:
+        return {}
+    nodes = {}
+    for node in es.transport.node_pool.all():
+        connector = node.session.connector if getattr(node, "session", None) else None
+        if connector is None:
+            nodes[str(node.config.host)] = {"max": settings.elastic_connections_per_node}
+            continue
+        # pylint: disable=protected-access
+        in_use = len(connector._acquired)
+        idle = sum(len(conns) for conns in connector._conns.values())
+        waiting = sum(len(waiters) for waiters in connector._waiters.values())
+        nodes[str(node.config.host)] = {
+            "max": connector.limit_per_host,
+            "created": in_use + idle,
+            "in_use": in_use,
+            "idle": idle,
+            "waiting": waiting,
+        }
+    return nodes
+
+
+def pool_totals() -> dict:
+    """``pool_stats``, просуммированный по узлам."""
+    totals: dict = {}
+    for node in pool_stats().values():
+        for state, value in node.items():
+            totals[state] = totals.get(state, 0) + value
+    return totals
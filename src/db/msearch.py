@@ -0,0 +1,132 @@
+"""
+Склейка одновременных поисков в ``_msearch``.
+
+Под нагрузкой воркер шлёт в ES сотни мелких независимых ``search`` в
+секунду (списки, поиск, жанры, персоны), и каждый платит за свой
+HTTP‑запрос: соединение из пула, заголовки, разбор ответа, место в
+лимите защиты от перегрузки. ``SearchBatcher`` копит поиски, пришедшие
+за ``window`` секунд (или пока их не наберётся ``max_size``), отправляет
+их одним ``_msearch`` и раздаёт ответы ожидающим корутинам.
+
+Ошибки не смешиваются: ошибка одного поиска в ответе ``_msearch``
+превращается в то же исключение, что бросил бы отдельный ``search``
+(``NotFoundError``, ``BadRequestError``, …), и достаётся только ему;
+отказ всего вызова (нет соединения, ``Overloaded``) получают все поиски
+пачки. Одиночный поиск, которому за окно не нашлось пары, уходит
+обычным ``search``.
+
+Каждый поиск пачки учитывается в метриках ES как отдельный ``search`` по
+своему индексу (время — время всего ``_msearch``), а отказ в его элементе
+(429, 5xx) засчитывается защите от перегрузки клиента (``guard.record``) —
+склейка не прячет перегрузку ES от лимитера и предохранителя.
+
+Включается ``ELASTIC_MSEARCH_ENABLED``: окно добавляет к каждому поиску
+до ``window`` ожидания, что окупается только при плотном потоке.
+"""
+import asyncio
+import dataclasses
+import time
+from typing import List, Set, Tuple
+
+from elasticsearch import ApiError, AsyncElasticsearch
+from elasticsearch.exceptions import HTTP_EXCEPTIONS
+from elastic_transport import ApiResponseMeta, ObjectApiResponse
+
+from src.core.metrics import BACKEND_ERRORS, BACKEND_LATENCY, MSEARCH_BATCH, MSEARCH_WAIT
+
+# поиск в очереди: индекс, тело, ожидающий ответа future и время постановки
+_Pending = Tuple[str, dict, asyncio.Future, float]
+
+
+class SearchBatcher:
+    """Очередь поисков одного клиента, сбрасываемая по окну или размеру."""
+
+    def __init__(self, client: AsyncElasticsearch, *, window: float, max_size: int):
+        self.client = client
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[_Pending] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def search(self, index: str, body: dict) -> ObjectApiResponse:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((index, body, future, time.perf_counter()))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # отменённые ожидающие (клиент ушёл) в ES не отправляются
+        batch = [pending for pending in self._pending if not pending[2].done()]
+        self._pending = []
+        if not batch:
+            return
+        now = time.perf_counter()
+        for *_, enqueued in batch:
+            MSEARCH_WAIT.observe(now - enqueued)
+        MSEARCH_BATCH.observe(len(batch))
+        task = asyncio.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[_Pending]) -> None:
+        started = time.perf_counter()
+        try:
+            if len(batch) == 1:
+                index, body, _, _ = batch[0]
+                # в обход перехвата search у InstrumentedElasticsearch
+                results = [await AsyncElasticsearch.search(self.client, index=index, body=body)]
+            else:
+                resp = await self.client.msearch(searches=[
+                    part for index, body, _, _ in batch for part in ({"index": index}, body)
+                ])
+                results = [_result(item, resp.meta) for item in resp["responses"]]
+        except asyncio.CancelledError:
+            for _, _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            if len(batch) > 1:
+                self._observe(batch, [exc] * len(batch), time.perf_counter() - started)
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        if len(batch) > 1:
+            # одиночный search метрики и защита учли сами
+            self._observe(batch, results, time.perf_counter() - started)
+        for (_, _, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _observe(self, batch: List[_Pending], results: list, duration: float) -> None:
+        guard = getattr(self.client, "guard", None)
+        for (index, _, _, _), result in zip(batch, results):
+            BACKEND_LATENCY.labels("elastic", "search", index).observe(duration)
+            if isinstance(result, Exception):
+                BACKEND_ERRORS.labels("elastic", "search", index).inc()
+                # отказ всего вызова защита уже учла в guard.call
+                if guard is not None and isinstance(result, ApiError) and guard.is_failure(result):
+                    guard.record(True)
+
+
+def _result(item: dict, meta: ApiResponseMeta) -> ObjectApiResponse | ApiError:
+    """Ответ одного поиска из ``_msearch`` — как от отдельного ``search``."""
+    if "error" not in item:
+        return ObjectApiResponse(body=item, meta=meta)
+    error = item["error"]
+    status = item.get("status", 500)
+    message = error.get("type", "") if isinstance(error, dict) else str(error)
+    meta = dataclasses.replace(meta, status=status)
+    return HTTP_EXCEPTIONS.get(status, ApiError)(message=message, meta=meta, body=item)
@@ -1,11 +1,12 @@
-import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
 
 from src.core.config import settings
 
-pg: psycopg.AsyncConnection | None = None  # изменено
+pg: AsyncConnectionPool | None = None  # изменено
 
 
-async def get_pg() -> psycopg.AsyncConnection:
+async def get_pg() -> AsyncConnectionPool:
     if pg is None:
         raise RuntimeError("PG disabled in DOCS_ONLY mode")
     return pg
@@ -13,14 +14,38 @@ async def get_pg() -> psycopg.AsyncConnection:
 
 async def open_pg():
     global pg
-    pg = await psycopg.AsyncConnection.connect(
-        host=settings.pg_host,
-        port=settings.pg_port,
-        dbname=settings.pg_db,
-        user=settings.pg_user,
-        password=settings.pg_password,
+    pg = AsyncConnectionPool(
+        make_conninfo(
+            host=settings.pg_host,
+            port=settings.pg_port,
+            dbname=settings.pg_db,
+            user=settings.pg_user,
+            password=settings.pg_password,
+            connect_timeout=settings.pg_connect_timeout,
+        ),
+        min_size=settings.pg_pool_min_size,
+        max_size=settings.pg_pool_max_size,
+        timeout=settings.pg_pool_timeout,
+        max_idle=settings.pg_pool_max_idle,
+        reconnect_timeout=settings.pg_reconnect_timeout,
+        open=False,
     )
+    await pg.open()
 
 
 async def close_pg():
     await pg.close()
+
+
+def pool_stats() -> dict:
+    if pg is None:
+        return {}
+    stats = pg.get_stats()
+    size, idle = stats.get("pool_size", 0), stats.get("pool_available", 0)
+    return {
+        "max": pg.max_size,
+        "created": stats.get("connections_num", 0),
+        "in_use": size - idle,
+        "idle": idle,
+        "waiting": stats.get("requests_waiting", 0),
+    }
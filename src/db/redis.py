@@ -1,10 +1,118 @@
-from redis.asyncio import Redis  # pylint: disable=no-name-in-module,import-error
+from redis.asyncio import BlockingConnectionPool, Redis  # pylint: disable=no-name-in-module,import-error
+from redis.asyncio.client import Pipeline
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 
+from src.core.config import settings
+from src.core.metrics import backend_call
+from src.core.overload import HIGH, AdaptiveLimiter, CircuitBreaker, Guard
 
 redis: Redis | None = None
 
 
+class _InstrumentedPipeline(Pipeline):
+    guard: Guard | None = None
+
+    async def execute(self, raise_on_error: bool = True):
+        if self.guard is None:
+            with backend_call("redis", "pipeline"):
+                return await super().execute(raise_on_error)
+        async with self.guard.call(HIGH):
+            with backend_call("redis", "pipeline"):
+                return await super().execute(raise_on_error)
+
+
+class InstrumentedRedis(Redis):
+    """Клиент, замеряющий каждую команду и каждый пайплайн.
+
+    С ``guard`` (его ставит ``lifespan`` API; ETL работает без него)
+    команды идут через защиту от перегрузки. Pub/sub держит своё
+    соединение и в ней не участвует.
+    """
+
+    guard: Guard | None = None
+
+    async def execute_command(self, *args, **options):
+        if self.guard is None:
+            with backend_call("redis", str(args[0]).lower()):
+                return await super().execute_command(*args, **options)
+        async with self.guard.call(HIGH):
+            with backend_call("redis", str(args[0]).lower()):
+                return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> Pipeline:
+        pipe = _InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+        pipe.guard = self.guard
+        return pipe
+
+
+def is_failure(exc: BaseException) -> bool:
+    """Отказ Redis: нет соединения (в том числе свободного в пуле) или таймаут."""
+    return isinstance(exc, (RedisConnectionError, RedisTimeoutError))
+
+
+def make_guard() -> Guard:
+    return Guard(
+        "redis",
+        AdaptiveLimiter(
+            initial=settings.redis_limit_initial,
+            min_limit=settings.redis_limit_min,
+            max_limit=settings.redis_limit_max,
+            latency=settings.redis_limit_latency,
+            queue_size=settings.overload_queue_size,
+            queue_timeout=settings.overload_queue_timeout,
+        ),
+        CircuitBreaker(
+            failure_threshold=settings.circuit_failure_threshold,
+            reset_timeout=settings.circuit_reset_timeout,
+        ),
+        is_failure,
+        settings.overload_retry_after,
+    )
+
+
 async def get_redis() -> Redis:
     if redis is None:
         raise RuntimeError("Redis disabled in DOCS_ONLY mode")
     return redis
+
+
+async def open_redis():
+    global redis
+    # блокирующий пул: при исчерпании ждём соединение до redis_pool_timeout,
+    # а не открываем новые без ограничений
+    pool = BlockingConnectionPool(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_connect_timeout,
+        health_check_interval=30,
+        retry=Retry(ExponentialBackoff(cap=1, base=0.01), settings.redis_retries),
+        retry_on_error=[RedisConnectionError, RedisTimeoutError],
+    )
+    redis = InstrumentedRedis(connection_pool=pool)
+
+
+async def close_redis():
+    await redis.aclose(close_connection_pool=True)
+
+
+def pool_stats() -> dict:
+    if redis is None:
+        return {}
+    pool = redis.connection_pool
+    in_use = len(pool._in_use_connections)       # pylint: disable=protected-access
+    idle = len(pool._available_connections)      # pylint: disable=protected-access
+    waiting = getattr(pool._condition, "_waiters", None) or ()  # pylint: disable=protected-access
+    return {
+        "max": pool.max_connections,
+        "created": in_use + idle,
+        "in_use": in_use,
+        "idle": idle,
+        "waiting": len(waiting),
+    }
@@ -0,0 +1,97 @@
+"""
+Запуск ETL Postgres → Elasticsearch.
+
+::
+
+    python -m src.etl            # бесконечный цикл с паузой ETL_INTERVAL
+    python -m src.etl --once     # один проход (cron, ручной запуск)
+    python -m src.etl --reset    # сбросить водяные знаки и переиндексировать всё
+
+Одновременно работает только один экземпляр (блокировка в Redis);
+остальные ждут в резерве и подхватывают работу, если первый упал.
+Блокировка берётся на каждый проход и отпускается в паузе — в это
+окно её может забрать переиндексация (``python -m src.etl.reindex``).
+
+Раз в ``ETL_RECONCILE_INTERVAL`` (время последней сверки хранится рядом
+с водяными знаками, так что интервал выдерживается и для ``--once`` из
+cron) после прохода индексы сверяются с Postgres: так до них доходят
+удаления, которых нет в потоках изменений.
+
+После прохода, изменившего ``movies`` (и после первого прохода — рейтингов
+может ещё не быть), перестраиваются рейтинги «топ фильмов» в Redis.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from src.core.config import settings
+from src.db import elastic, pg, redis
+from src.etl.pipeline import ETL
+from src.etl.state import LOCK_KEY, RunLock, State
+from src.services.cache import EntityCache, LocalCache
+from src.services.query_cache import QueryCache
+from src.services.rankings import Rankings
+
+logger = logging.getLogger("src.etl")
+
+
+async def reconcile_due(state: State) -> bool:
+    interval = settings.etl_reconcile_interval
+    return interval > 0 and time.time() - await state.reconciled_at() >= interval
+
+
+async def main(once: bool, reset: bool) -> None:
+    await redis.open_redis()
+    await elastic.open_elastic()
+    await pg.open_pg()
+    # локальный уровень не нужен: ETL только сбрасывает ключи и рассылает их воркерам API
+    cache = EntityCache(redis.redis, LocalCache(0, 0), settings.cache_invalidation_channel)
+    query_cache = QueryCache(cache, settings.query_cache_ttl, settings.index_version_ttl)
+    state = State(redis.redis, settings.etl_state_key)
+    lock = RunLock(redis.redis, LOCK_KEY, settings.etl_lock_ttl)
+    etl = ETL(
+        pg.pg, elastic.es, cache, query_cache, state, lock,
+        batch_size=settings.etl_batch_size,
+        lag=settings.etl_watermark_lag,
+    )
+    rankings = Rankings(cache, elastic.es, settings.rankings_depth) if settings.rankings_enabled else None
+    first = True
+
+    try:
+        while True:
+            if await lock.acquire():
+                try:
+                    if reset:
+                        await state.reset()
+                        reset = False
+                    indexed = await etl.run_once()
+                    logger.info("etl pass done: %s", indexed)
+                    if await reconcile_due(state):
+                        changed = await etl.reconcile()
+                        await state.set_reconciled_at(time.time())
+                        logger.info("etl reconcile done: %s", changed)
+                        indexed = {index: indexed[index] + changed[index] for index in indexed}
+                    if rankings is not None and (indexed["movies"] or first):
+                        await rankings.build()
+                    first = False
+                finally:
+                    await lock.release()
+            elif once:
+                logger.warning("ETL lock is held by another process, exiting")
+                return
+            if once:
+                break
+            await asyncio.sleep(settings.etl_interval)
+    finally:
+        await pg.close_pg()
+        await elastic.close_elastic()
+        await redis.close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETL Postgres → Elasticsearch")
+    parser.add_argument("--once", action="store_true", help="один проход и выход")
+    parser.add_argument("--reset", action="store_true", help="начать с нуля (полная переиндексация)")
+    args = parser.parse_args()
+    asyncio.run(main(args.once, args.reset))
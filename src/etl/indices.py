@@ -0,0 +1,116 @@
+"""
+Схемы индексов и настройки для сборки/работы.
+
+API обращается к индексам по именам алиасов (``movies``, ``genres``,
+``persons``); физические индексы — ``<алиас>_v<N>``. Поля совпадают с
+тем, что пишет ``transform`` и читают сервисы: ``genres``, ``*.keyword``
+— для фильтров и сортировки, ``imdb_rating``/``creation_date`` — для
+сортировки и фасетов, ``title.suggest``/``full_name.suggest`` — для
+подсказок при наборе. Смена схемы вступает в силу после
+``python -m src.etl.reindex``.
+"""
+from typing import Dict
+
+from src.core.config import settings
+
+ALIASES = ("movies", "genres", "persons")
+
+# пока индекс заливается, его никто не читает: без refresh и реплик
+BUILD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+def live_settings() -> dict:
+    return {"refresh_interval": "1s", "number_of_replicas": settings.elastic_index_replicas}
+
+
+ANALYSIS = {
+    "analyzer": {
+        "ru_en": {
+            "tokenizer": "standard",
+            "filter": ["lowercase", "english_stemmer", "russian_stemmer"],
+        },
+        # для подсказок: без стемминга — в индексе лежит основа, и
+        # недописанное слово с ней не совпадает («runni» — не префикс «run»
+        # от «running»)
+        "prefix": {"tokenizer": "standard", "filter": ["lowercase"]},
+    },
+    "filter": {
+        "english_stemmer": {"type": "stemmer", "language": "english"},
+        "russian_stemmer": {"type": "stemmer", "language": "russian"},
+    },
+}
+
+_TEXT_KEYWORD = {
+    "type": "text",
+    "analyzer": "ru_en",
+    "fields": {"keyword": {"type": "keyword"}},
+}
+
+# поля с подсказками: ``.suggest`` — search_as_you_type (шинглы и
+# edge n-gram'ы строятся при индексации, префикс ищется как терм)
+_TEXT_SUGGEST = {
+    **_TEXT_KEYWORD,
+    "fields": {
+        **_TEXT_KEYWORD["fields"],
+        "suggest": {"type": "search_as_you_type", "analyzer": "prefix"},
+    },
+}
+
+_PERSON_REF = {
+    "type": "object",
+    "properties": {"uuid": {"type": "keyword"}, "full_name": _TEXT_KEYWORD},
+}
+
+MAPPINGS: Dict[str, dict] = {
+    "movies": {
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "title": _TEXT_SUGGEST,
+            "description": {"type": "text", "analyzer": "ru_en"},
+            "imdb_rating": {"type": "float"},
+            "creation_date": {"type": "date"},
+            "modified": {"type": "date"},
+            "genres": {"type": "keyword"},
+            "genre": {
+                "type": "object",
+                "properties": {"uuid": {"type": "keyword"}, "name": {"type": "keyword"}},
+            },
+            "actors": _PERSON_REF,
+            "writers": _PERSON_REF,
+            "directors": _PERSON_REF,
+        },
+    },
+    "genres": {
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "name": _TEXT_KEYWORD,
+            "modified": {"type": "date"},
+        },
+    },
+    "persons": {
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "full_name": _TEXT_SUGGEST,
+            "modified": {"type": "date"},
+            "films": {
+                "type": "object",
+                "properties": {"uuid": {"type": "keyword"}, "roles": {"type": "keyword"}},
+            },
+        },
+    },
+}
+
+
+def physical_name(alias: str, version: int) -> str:
+    return f"{alias}_v{version}"
+
+
+def parse_version(alias: str, name: str) -> int | None:
+    """Номер версии из имени ``<alias>_v<N>`` (``None`` — чужой индекс)."""
+    prefix = f"{alias}_v"
+    if name.startswith(prefix) and name[len(prefix):].isdigit():
+        return int(name[len(prefix):])
+    return None
@@ -0,0 +1,231 @@
+"""
+Инкрементальная загрузка Postgres → Elasticsearch.
+
+Три потока изменений, каждый со своим водяным знаком:
+
+* ``film_work`` — изменённые фильмы переиндексируются целиком, вместе с
+  их персонами (у персоны в документе список фильмов и ролей);
+* ``genre`` — жанры переиндексируются, а все фильмы с этими жанрами
+  пересобираются (в документе фильма — названия жанров);
+* ``person`` — персоны переиндексируются, фильмы с ними пересобираются.
+
+Строки читаются серверными курсорами пачками по ``batch_size``. Каждая
+пачка: запись в ES через ``async_bulk`` с ``refresh=wait_for`` (новые
+данные уже видны поиску), затем сброс ровно затронутых ключей кеша
+(``film:``/``genre:``/``person:`` текущего поколения индекса, с рассылкой
+воркерам API) и версии индекса для кеша списков — и только потом сдвиг
+водяного знака.
+
+Удаления строк и связей (``person_film_work``/``genre_film_work``) не
+двигают ``modified`` и в потоки изменений не попадают. Их ловит сверка
+(``reconcile``, раз в ``ETL_RECONCILE_INTERVAL``): индекс обходится по
+``id``, для каждой пачки документы собираются заново из Postgres.
+Документы, чьих строк больше нет, удаляются, а разошедшиеся с Postgres
+переписываются: фильм без удалённой персоны или жанра и персона без
+удалённого фильма. Ключи кеша сбрасываются так же, как при записи.
+"""
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List
+
+import orjson
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_bulk
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from src.etl import queries
+from src.etl.state import RunLock, State, Watermark
+from src.etl.transform import film_doc, genre_doc, person_doc
+from src.services.cache import EntityCache
+from src.services.person import FILMS_KEY_SUFFIX
+from src.services.query_cache import QueryCache
+
+# записи кеша, собранные из документа индекса и сбрасываемые вместе с ним
+DERIVED_KEYS = {"persons": (FILMS_KEY_SUFFIX,)}
+
+logger = logging.getLogger(__name__)
+
+Batch = Callable[[List[dict]], Awaitable[None]]
+Build = Callable[[List[str]], Awaitable[List[dict]]]
+
+
+async def batches(
+    pg: AsyncConnectionPool, name: str, sql: str, params, size: int
+) -> AsyncIterator[List[dict]]:
+    """Результат запроса пачками через серверный курсор ``name``."""
+    async with pg.connection() as conn:
+        async with conn.cursor(name=name, row_factory=dict_row) as cur:
+            await cur.execute(sql, params)
+            while rows := await cur.fetchmany(size):
+                yield rows
+
+
+async def fetch_all(pg: AsyncConnectionPool, sql: str, params) -> List[dict]:
+    async with pg.connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchall()
+
+
+class ETL:
+    def __init__(
+        self,
+        pg: AsyncConnectionPool,
+        elastic: AsyncElasticsearch,
+        cache: EntityCache,
+        query_cache: QueryCache,
+        state: State,
+        lock: RunLock,
+        *,
+        batch_size: int,
+        lag: float,
+    ):
+        self.pg = pg
+        self.elastic = elastic
+        self.cache = cache
+        self.query_cache = query_cache
+        self.state = state
+        self.lock = lock
+        self.batch_size = batch_size
+        self.lag = lag
+        self.indexed: Dict[str, int] = {}
+        self.deleted: Dict[str, int] = {}
+
+    async def run_once(self) -> Dict[str, int]:
+        """Один проход по всем потокам; возвращает число записанных документов."""
+        self._reset_counters()
+        await self._sync("genre", queries.GENRE_CHANGES, self._genres_changed)
+        await self._sync("person", queries.PERSON_CHANGES, self._persons_changed)
+        await self._sync("film_work", queries.FILM_WORK_CHANGES, self._films_changed)
+        return self.indexed
+
+    async def reconcile(self) -> Dict[str, int]:
+        """Сверка индексов с Postgres; возвращает число переписанных и удалённых документов."""
+        self._reset_counters()
+        await self._reconcile("genres", "genre", self._genre_docs)
+        await self._reconcile("persons", "person", self._person_docs)
+        await self._reconcile("movies", "film", self._film_docs)
+        return {index: self.indexed[index] + self.deleted[index] for index in self.indexed}
+
+    def _reset_counters(self) -> None:
+        self.indexed = {"movies": 0, "genres": 0, "persons": 0}
+        self.deleted = dict.fromkeys(self.indexed, 0)
+
+    async def _sync(self, stream: str, sql: str, handle: Batch) -> None:
+        mark = await self.state.get(stream)
+        params = {"modified": mark.modified, "id": mark.id, "lag": self.lag}
+        async for rows in batches(self.pg, f"etl_{stream}", sql, params, self.batch_size):
+            await handle(rows)
+            last = rows[-1]
+            await self.state.set(stream, Watermark(last["modified"], str(last["id"])))
+            # пачка могла идти дольше TTL блокировки — проверяем, что она наша
+            await self.lock.extend()
+            logger.info("etl %s: %d rows up to %s", stream, len(rows), last["modified"])
+
+    async def _reconcile(self, index: str, entity: str, build: Build) -> None:
+        """Обходит индекс по ``id`` и приводит каждую пачку к Postgres."""
+        search_after = None
+        while True:
+            body = {
+                "query": {"match_all": {}},
+                "sort": [{"id": "asc"}],
+                "size": self.batch_size,
+                "track_total_hits": False,
+            }
+            if search_after is not None:
+                body["search_after"] = search_after
+            hits = (await self.elastic.search(index=index, body=body))["hits"]["hits"]
+            if not hits:
+                break
+
+            stored = {hit["_id"]: hit["_source"] for hit in hits}
+            actual = {doc["id"]: doc for doc in await build(list(stored))}
+            await self._delete(index, entity, [id_ for id_ in stored if id_ not in actual])
+            # сравниваем в JSON-виде, как документ лежит в ES
+            await self._load(index, entity, [
+                doc for id_, doc in actual.items() if orjson.loads(orjson.dumps(doc)) != stored[id_]
+            ])
+            await self.lock.extend()
+            if len(hits) < self.batch_size:
+                break
+            search_after = hits[-1]["sort"]
+        logger.info(
+            "etl reconcile %s: %d rewritten, %d deleted", index, self.indexed[index], self.deleted[index]
+        )
+
+    # --- обработчики пачек изменений ---
+    async def _genres_changed(self, rows: List[dict]) -> None:
+        await self._load("genres", "genre", [genre_doc(row) for row in rows])
+        await self._reindex_films_of(queries.FILMS_BY_GENRES, [row["id"] for row in rows])
+
+    async def _persons_changed(self, rows: List[dict]) -> None:
+        ids = [row["id"] for row in rows]
+        await self._index_persons(ids)
+        await self._reindex_films_of(queries.FILMS_BY_PERSONS, ids)
+
+    async def _films_changed(self, rows: List[dict]) -> None:
+        person_ids = await self._index_films([row["id"] for row in rows])
+        # связи фильм—персона меняются вместе с modified фильма (удалённые
+        # связи без него дочищает сверка)
+        for start in range(0, len(person_ids), self.batch_size):
+            await self._index_persons(person_ids[start:start + self.batch_size])
+
+    # --- сборка документов ---
+    async def _reindex_films_of(self, sql: str, ids: List) -> None:
+        """Пересобирает все фильмы, связанные с ``ids``, пачками."""
+        async for rows in batches(self.pg, "etl_related_films", sql, (ids,), self.batch_size):
+            await self._index_films([row["id"] for row in rows])
+
+    async def _index_films(self, ids: List) -> List:
+        """Индексирует фильмы; возвращает id их персон."""
+        rows = await fetch_all(self.pg, queries.FILMS, (ids,))
+        await self._load("movies", "film", [film_doc(row) for row in rows])
+        return list({person["uuid"] for row in rows for person in row["persons"]})
+
+    async def _index_persons(self, ids: List) -> None:
+        if ids:
+            await self._load("persons", "person", await self._person_docs(ids))
+
+    async def _film_docs(self, ids: List) -> List[dict]:
+        return [film_doc(row) for row in await fetch_all(self.pg, queries.FILMS, (ids,))]
+
+    async def _genre_docs(self, ids: List) -> List[dict]:
+        return [genre_doc(row) for row in await fetch_all(self.pg, queries.GENRES, (ids,))]
+
+    async def _person_docs(self, ids: List) -> List[dict]:
+        return [person_doc(row) for row in await fetch_all(self.pg, queries.PERSONS, {"ids": ids})]
+
+    # --- запись ---
+    async def _load(self, index: str, entity: str, docs: Iterable[dict]) -> None:
+        docs = list(docs)
+        if not docs:
+            return
+        await async_bulk(
+            self.elastic,
+            ({"_index": index, "_id": doc["id"], "_source": doc} for doc in docs),
+            chunk_size=self.batch_size,
+            refresh="wait_for",
+        )
+        await self._invalidate(index, entity, [doc["id"] for doc in docs])
+        self.indexed[index] += len(docs)
+
+    async def _delete(self, index: str, entity: str, ids: List[str]) -> None:
+        if not ids:
+            return
+        await async_bulk(
+            self.elastic,
+            ({"_op_type": "delete", "_index": index, "_id": id_} for id_ in ids),
+            chunk_size=self.batch_size,
+            refresh="wait_for",
+        )
+        await self._invalidate(index, entity, ids)
+        self.deleted[index] += len(ids)
+
+    async def _invalidate(self, index: str, entity: str, ids: List[str]) -> None:
+        # сначала ES, потом кеш: промах после сброса прочитает уже новые данные
+        prefix = await self.query_cache.key_prefix(index, entity)
+        keys = [prefix + id_ for id_ in ids]
+        # вместе с персоной — её фильмография (ETL переписывает персон изменённых фильмов)
+        keys += [key + suffix for key in keys for suffix in DERIVED_KEYS.get(index, ())]
+        await self.cache.invalidate(*keys)
+        await self.query_cache.bump_version(index)
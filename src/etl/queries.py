@@ -0,0 +1,91 @@
+"""
+SQL для ETL (схема ``content`` в Postgres).
+
+Потоки изменений читаются по водяному знаку ``(modified, id)``. Верхняя
+граница ``now() - lag`` отсекает строки, чьи транзакции ещё могут
+закоммититься с более ранним ``modified`` — иначе их можно проскочить.
+"""
+
+# --- потоки изменений: (modified, id) > водяной знак, по порядку ---
+_CHANGES = """
+SELECT {columns}
+FROM content.{table}
+WHERE (modified, id) > (%(modified)s, %(id)s::uuid)
+  AND modified < now() - make_interval(secs => %(lag)s)
+ORDER BY modified, id
+"""
+
+FILM_WORK_CHANGES = _CHANGES.format(table="film_work", columns="id, modified")
+GENRE_CHANGES = _CHANGES.format(table="genre", columns="id, name, modified")
+PERSON_CHANGES = _CHANGES.format(table="person", columns="id, full_name, modified")
+
+# --- полная выгрузка (переиндексация) ---
+ALL_FILM_IDS = "SELECT id FROM content.film_work ORDER BY id"
+ALL_GENRES = "SELECT id, name, modified FROM content.genre ORDER BY id"
+ALL_PERSON_IDS = "SELECT id FROM content.person ORDER BY id"
+
+# --- текущие строки по id (сверка с индексом) ---
+GENRES = "SELECT id, name, modified FROM content.genre WHERE id = ANY(%s::uuid[])"
+
+# --- фильмы, которых касается изменение жанра/персоны ---
+FILMS_BY_GENRES = """
+SELECT DISTINCT film_work_id AS id
+FROM content.genre_film_work
+WHERE genre_id = ANY(%s::uuid[])
+"""
+
+FILMS_BY_PERSONS = """
+SELECT DISTINCT film_work_id AS id
+FROM content.person_film_work
+WHERE person_id = ANY(%s::uuid[])
+"""
+
+# --- денормализация ---
+FILMS = """
+SELECT
+    fw.id,
+    fw.title,
+    fw.description,
+    fw.rating,
+    fw.creation_date,
+    fw.modified,
+    COALESCE(
+        json_agg(DISTINCT jsonb_build_object('uuid', g.id, 'name', g.name))
+            FILTER (WHERE g.id IS NOT NULL),
+        '[]'
+    ) AS genres,
+    COALESCE(
+        json_agg(DISTINCT jsonb_build_object(
+            'uuid', p.id, 'full_name', p.full_name, 'role', pfw.role
+        )) FILTER (WHERE p.id IS NOT NULL),
+        '[]'
+    ) AS persons
+FROM content.film_work fw
+LEFT JOIN content.genre_film_work gfw ON gfw.film_work_id = fw.id
+LEFT JOIN content.genre g ON g.id = gfw.genre_id
+LEFT JOIN content.person_film_work pfw ON pfw.film_work_id = fw.id
+LEFT JOIN content.person p ON p.id = pfw.person_id
+WHERE fw.id = ANY(%s::uuid[])
+GROUP BY fw.id
+"""
+
+PERSONS = """
+SELECT
+    p.id,
+    p.full_name,
+    p.modified,
+    COALESCE(
+        json_agg(json_build_object('uuid', r.film_work_id, 'roles', r.roles))
+            FILTER (WHERE r.film_work_id IS NOT NULL),
+        '[]'
+    ) AS films
+FROM content.person p
+LEFT JOIN (
+    SELECT person_id, film_work_id, array_agg(DISTINCT role ORDER BY role) AS roles
+    FROM content.person_film_work
+    WHERE person_id = ANY(%(ids)s::uuid[])
+    GROUP BY person_id, film_work_id
+) r ON r.person_id = p.id
+WHERE p.id = ANY(%(ids)s::uuid[])
+GROUP BY p.id
+"""
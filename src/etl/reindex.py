@@ -0,0 +1,180 @@
+"""
+Полная переиндексация без простоя.
+
+::
+
+    python -m src.etl.reindex                  # все индексы
+    python -m src.etl.reindex movies persons   # выборочно
+    python -m src.etl.reindex all --keep 2     # оставить две прошлые версии для отката
+
+Для каждого алиаса собирается новый физический индекс ``<алиас>_v<N+1>``
+с настройками для заливки (без refresh и реплик), заполняется из Postgres,
+получает рабочие настройки и одним ``update_aliases`` подменяет старый.
+API всё это время читает старый индекс через алиас. После переключения
+поколение индекса в Redis становится ``N+1`` — ключи сущностей меняют
+префикс, и кеш старого индекса разом перестаёт читаться, без SCAN.
+
+Переиндексация берёт ту же блокировку, что и инкрементальный ETL: пока
+она идёт, ETL стоит, а его водяные знаки не двигаются. Изменения, сделанные
+во время сборки, он затем дочитает и запишет уже через алиас в новый индекс.
+После переключения ``movies`` рейтинги «топ фильмов» строятся заново.
+"""
+import argparse
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_bulk
+from psycopg_pool import AsyncConnectionPool
+
+from src.core.config import settings
+from src.db import elastic, pg, redis
+from src.etl import queries
+from src.etl.indices import (
+    ALIASES, ANALYSIS, BUILD_SETTINGS, MAPPINGS, live_settings, parse_version, physical_name,
+)
+from src.etl.pipeline import batches, fetch_all
+from src.etl.state import LOCK_KEY, RunLock
+from src.etl.transform import film_doc, genre_doc, person_doc
+from src.services.cache import EntityCache, LocalCache
+from src.services.query_cache import QueryCache
+from src.services.rankings import Rankings
+
+logger = logging.getLogger("src.etl")
+
+
+class Reindexer:
+    def __init__(
+        self,
+        pg_pool: AsyncConnectionPool,
+        es: AsyncElasticsearch,
+        query_cache: QueryCache,
+        lock: RunLock,
+        *,
+        batch_size: int,
+    ):
+        self.pg = pg_pool
+        self.elastic = es
+        self.query_cache = query_cache
+        self.lock = lock
+        self.batch_size = batch_size
+        self.sources: Dict[str, Callable[[], AsyncIterator[List[dict]]]] = {
+            "movies": self._films,
+            "genres": self._genres,
+            "persons": self._persons,
+        }
+
+    async def reindex(self, alias: str, keep: int) -> str:
+        """Собирает новую версию индекса и переключает на неё алиас."""
+        versions = await self._versions(alias)
+        version = max(versions, default=0) + 1
+        index = physical_name(alias, version)
+
+        await self.elastic.indices.create(
+            index=index,
+            settings={**BUILD_SETTINGS, "analysis": ANALYSIS},
+            mappings=MAPPINGS[alias],
+        )
+        try:
+            count = await self._fill(alias, index)
+            await self.elastic.indices.put_settings(index=index, settings=live_settings())
+            await self.elastic.indices.refresh(index=index)
+            await self._switch(alias, index)
+        except BaseException:
+            # недостроенный индекс за алиасом не окажется — убираем его
+            await self.elastic.indices.delete(index=index, ignore_unavailable=True)
+            raise
+        # сначала алиас, потом поколение: иначе под новым префиксом
+        # успели бы закешироваться документы из старого индекса
+        await self.query_cache.set_generation(alias, str(version))
+        await self.query_cache.bump_version(alias)
+        logger.info("alias %s -> %s (%d docs)", alias, index, count)
+
+        for old in sorted(versions)[:-keep or None]:
+            await self.elastic.indices.delete(index=physical_name(alias, old))
+            logger.info("dropped %s", physical_name(alias, old))
+        return index
+
+    async def _fill(self, alias: str, index: str) -> int:
+        count = 0
+        async for docs in self.sources[alias]():
+            await async_bulk(
+                self.elastic,
+                ({"_index": index, "_id": doc["id"], "_source": doc} for doc in docs),
+                chunk_size=self.batch_size,
+            )
+            count += len(docs)
+            await self.lock.extend()
+            logger.info("reindex %s: %d docs", index, count)
+        return count
+
+    async def _versions(self, alias: str) -> List[int]:
+        found = await self.elastic.indices.get(
+            index=f"{alias}_v*", allow_no_indices=True, expand_wildcards="open"
+        )
+        return [v for name in found if (v := parse_version(alias, name)) is not None]
+
+    async def _switch(self, alias: str, index: str) -> None:
+        """Атомарно переводит алиас на ``index``."""
+        actions: List[dict] = []
+        if await self.elastic.indices.exists_alias(name=alias):
+            current = await self.elastic.indices.get_alias(name=alias)
+            actions += [{"remove": {"index": name, "alias": alias}} for name in current]
+        elif await self.elastic.indices.exists(index=alias):
+            # первый запуск: на месте алиаса — индекс со старой схемой именования
+            actions.append({"remove_index": {"index": alias}})
+        actions.append({"add": {"index": index, "alias": alias}})
+        await self.elastic.indices.update_aliases(actions=actions)
+
+    # --- источники документов ---
+    async def _films(self) -> AsyncIterator[List[dict]]:
+        async for rows in batches(self.pg, "reindex_films", queries.ALL_FILM_IDS, None, self.batch_size):
+            films = await fetch_all(self.pg, queries.FILMS, ([row["id"] for row in rows],))
+            yield [film_doc(row) for row in films]
+
+    async def _genres(self) -> AsyncIterator[List[dict]]:
+        async for rows in batches(self.pg, "reindex_genres", queries.ALL_GENRES, None, self.batch_size):
+            yield [genre_doc(row) for row in rows]
+
+    async def _persons(self) -> AsyncIterator[List[dict]]:
+        async for rows in batches(self.pg, "reindex_persons", queries.ALL_PERSON_IDS, None, self.batch_size):
+            persons = await fetch_all(self.pg, queries.PERSONS, {"ids": [row["id"] for row in rows]})
+            yield [person_doc(row) for row in persons]
+
+
+async def main(aliases: List[str], keep: int) -> None:
+    await redis.open_redis()
+    await elastic.open_elastic()
+    await pg.open_pg()
+    cache = EntityCache(redis.redis, LocalCache(0, 0), settings.cache_invalidation_channel)
+    query_cache = QueryCache(cache, settings.query_cache_ttl, settings.index_version_ttl)
+    lock = RunLock(redis.redis, LOCK_KEY, settings.etl_lock_ttl)
+    reindexer = Reindexer(pg.pg, elastic.es, query_cache, lock, batch_size=settings.etl_batch_size)
+
+    try:
+        # ждём, пока инкрементальный ETL закончит текущий проход
+        while not await lock.acquire():
+            logger.info("waiting for the ETL lock")
+            await asyncio.sleep(1)
+        try:
+            for alias in aliases:
+                await reindexer.reindex(alias, keep)
+            if "movies" in aliases and settings.rankings_enabled:
+                await Rankings(cache, elastic.es, settings.rankings_depth).build()
+        finally:
+            await lock.release()
+    finally:
+        await pg.close_pg()
+        await elastic.close_elastic()
+        await redis.close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Переиндексация с переключением алиаса")
+    parser.add_argument(
+        "indices", nargs="*", choices=[*ALIASES, "all"], default="all", help="алиасы (по умолчанию все)"
+    )
+    parser.add_argument("--keep", type=int, default=1, help="сколько прошлых версий оставить")
+    args = parser.parse_args()
+    asyncio.run(main(list(ALIASES) if "all" in args.indices else args.indices, args.keep))
@@ -0,0 +1,104 @@
+"""
+Состояние ETL в Redis: водяные знаки по таблицам и блокировка запуска.
+
+Водяной знак — пара ``(modified, id)`` последней обработанной строки:
+строки читаются в порядке ``modified, id``, так что пара однозначно
+задаёт позицию, даже если у нескольких строк одинаковый ``modified``.
+Знак сдвигается только после того, как пачка записана в ES и кеш
+сброшен, — после перезапуска ETL в худшем случае повторит одну пачку
+(индексация по id идемпотентна).
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import orjson
+from redis.asyncio import Redis  # pylint: disable=no-name-in-module,import-error
+
+# продлеваем/снимаем блокировку, только если она всё ещё наша
+_EXTEND_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# общая для инкрементального ETL и полной переиндексации
+LOCK_KEY = "etl:lock"
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# поле хеша состояния со временем последней сверки (рядом с водяными знаками)
+RECONCILED = "reconciled_at"
+
+
+class Watermark(NamedTuple):
+    modified: datetime
+    id: str
+
+
+START = Watermark(EPOCH, "00000000-0000-0000-0000-000000000000")
+
+
+class State:
+    """Водяные знаки в хеше Redis: поле — имя потока изменений."""
+
+    def __init__(self, redis: Redis, key: str):
+        self.redis = redis
+        self.key = key
+
+    async def get(self, stream: str) -> Watermark:
+        raw = await self.redis.hget(self.key, stream)
+        if raw is None:
+            return START
+        modified, id_ = orjson.loads(raw)
+        return Watermark(datetime.fromisoformat(modified), id_)
+
+    async def set(self, stream: str, mark: Watermark) -> None:
+        await self.redis.hset(self.key, stream, orjson.dumps([mark.modified.isoformat(), mark.id]))
+
+    async def reconciled_at(self) -> float:
+        """Время (unix) последней сверки индексов с Postgres, 0 — не было."""
+        raw = await self.redis.hget(self.key, RECONCILED)
+        return float(raw) if raw is not None else 0.0
+
+    async def set_reconciled_at(self, at: float) -> None:
+        await self.redis.hset(self.key, RECONCILED, at)
+
+    async def reset(self) -> None:
+        """Следующий запуск перечитает всё с начала."""
+        await self.redis.delete(self.key)
+
+
+class LockLost(RuntimeError):
+    """Блокировку перехватил другой экземпляр ETL — продолжать нельзя."""
+
+
+class RunLock:
+    """Не даёт двум экземплярам ETL работать одновременно.
+
+    Блокировка с TTL: если процесс умер, она истечёт сама. Живой процесс
+    продлевает её после каждой пачки (``extend``).
+    """
+
+    def __init__(self, redis: Redis, key: str, ttl: float):
+        self.redis = redis
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = uuid.uuid4().hex
+
+    async def acquire(self) -> bool:
+        return bool(await self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms))
+
+    async def extend(self) -> None:
+        if not await self.redis.eval(_EXTEND_LOCK, 1, self.key, self.token, self.ttl_ms):
+            raise LockLost(self.key)
+
+    async def release(self) -> None:
+        await self.redis.eval(_RELEASE_LOCK, 1, self.key, self.token)
@@ -0,0 +1,49 @@
+"""
+Строки Postgres → документы Elasticsearch.
+
+Имена полей совпадают с тем, что читают модели API (``src/models``):
+``id`` на верхнем уровне, ``uuid`` во вложенных объектах. ``genres`` —
+плоский список названий для фильтра по жанру; ``modified`` — для
+выгрузки с ``updated_since``.
+"""
+from typing import Dict, List
+
+ROLES = {"actor": "actors", "writer": "writers", "director": "directors"}
+
+
+def film_doc(row: dict) -> dict:
+    people: Dict[str, List[dict]] = {field: [] for field in ROLES.values()}
+    for person in sorted(row["persons"], key=lambda p: p["full_name"]):
+        field = ROLES.get(person["role"])
+        if field is not None:
+            people[field].append({"uuid": str(person["uuid"]), "full_name": person["full_name"]})
+
+    genres = sorted(row["genres"], key=lambda g: g["name"])
+    return {
+        "id": str(row["id"]),
+        "title": row["title"],
+        "description": row["description"],
+        "imdb_rating": row["rating"],
+        "creation_date": row["creation_date"].isoformat() if row["creation_date"] else None,
+        "modified": row["modified"].isoformat(),
+        "genres": [genre["name"] for genre in genres],
+        "genre": [{"uuid": str(genre["uuid"]), "name": genre["name"]} for genre in genres],
+        **people,
+    }
+
+
+def genre_doc(row: dict) -> dict:
+    return {
+        "id": str(row["id"]),
+        "name": row["name"],
+        "modified": row["modified"].isoformat(),
+    }
+
+
+def person_doc(row: dict) -> dict:
+    return {
+        "id": str(row["id"]),
+        "full_name": row["full_name"],
+        "modified": row["modified"].isoformat(),
+        "films": [{"uuid": str(film["uuid"]), "roles": film["roles"]} for film in row["films"]],
+    }
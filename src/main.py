@@ -1,13 +1,24 @@
 # src/main.py
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
-from elasticsearch import AsyncElasticsearch
-from redis.asyncio import Redis
 
+from .core import metrics
 from .core.config import settings   # изменено
+from .core.overload import Overloaded
 from .db import elastic, redis, pg
-from .api.v1 import films, genres, persons
+from .api.compression import CompressionMiddleware
+from .api.http_cache import HTTPCacheMiddleware
+from .api.metrics import MetricsMiddleware, metrics as metrics_endpoint
+from .api.overload import overloaded_handler
+from .api.v1 import films, genres, health, persons
+from .services import cache, query_cache
+from .services.container import create_services
+from .services.genre_catalog import GenreCatalog
+from .services.popularity import Popularity
+from .services.rankings import Rankings
+from .services.warmup import WarmUp
 
 
 @asynccontextmanager
@@ -18,7 +29,17 @@ async def lifespan(app: FastAPI):
     При обычном запуске (``DOCS_ONLY = False``):
 
     * **startup**  
-      ─ Подключается к Redis (кеш),  
+      ─ Поднимает пулы соединений к Redis (кеш),  
+      ─ ставит на клиенты Redis и ES защиту от перегрузки (лимиты
+        параллелизма, сброс нагрузки, предохранитель) и, если включена,
+        склейку поисков в ``_msearch``,  
+      ─ поднимает двухуровневый кеш сущностей и результатов list/search
+        и подписку на инвалидацию,  
+      ─ загружает каталог жанров в память и запускает его фоновое обновление,  
+      ─ запускает замер задержки event loop и загрузки пулов для метрик,  
+      ─ один раз собирает сервисы и кладёт их в ``app.state.services``,  
+      ─ запускает учёт популярности и фоном — прогрев кеша самым
+        популярным (ход прогрева — ``app.state.warmup``),  
       ─ создаёт асинхронный клиент Elasticsearch,  
       ─ открывает соединение с PostgreSQL (используется для ETL‑проверок).
 
@@ -39,17 +60,97 @@ async def lifespan(app: FastAPI):
         Управление возвращается FastAPI — после ``yield`` приложение работает.
     """
     if not settings.docs_only:       # изменено
-        redis.redis = Redis(host=settings.redis_host, port=settings.redis_port)
-        elastic.es = AsyncElasticsearch(
-            hosts=[f"{settings.elastic_schema}{settings.elastic_host}:{settings.elastic_port}"]
-        )
+        await redis.open_redis()
+        await elastic.open_elastic()
         await pg.open_pg()
+        guards = {}
+        if settings.overload_protection_enabled:
+            guards = {"redis": redis.make_guard(), "elastic": elastic.make_guard()}
+            redis.redis.guard = guards["redis"]
+            elastic.es.guard = guards["elastic"]
+        if settings.elastic_msearch_enabled:
+            elastic.es.batcher = elastic.make_batcher(elastic.es)
+        popularity = None
+        if settings.popularity_enabled:
+            popularity = Popularity(
+                redis.redis,
+                sample_rate=settings.popularity_sample_rate,
+                flush_interval=settings.popularity_flush_interval,
+                decay_interval=settings.popularity_decay_interval,
+                max_size=settings.popularity_max_size,
+            )
+        cache.entity_cache = cache.EntityCache(
+            redis.redis,
+            cache.LocalCache(settings.local_cache_size, settings.local_cache_ttl),
+            settings.cache_invalidation_channel,
+            lock_ttl=settings.cache_lock_ttl,
+            lock_poll_interval=settings.cache_lock_poll_interval,
+            xfetch_beta=settings.cache_xfetch_beta,
+            compress_min_size=(
+                settings.compression_min_size if settings.compression_enabled else None
+            ),
+            stale_if_error=settings.cache_stale_if_error,
+            popularity=popularity,
+        )
+        query_cache.query_cache = query_cache.QueryCache(
+            cache.entity_cache, settings.query_cache_ttl, settings.index_version_ttl
+        )
+        genre_catalog = None
+        if settings.genre_catalog_enabled:
+            genre_catalog = GenreCatalog(
+                elastic.es, query_cache.query_cache, settings.genre_catalog_refresh_interval
+            )
+            # без ES старт не падает: сервисы пойдут в ES, а каталог догрузится в фоне
+            await genre_catalog.refresh()
+        rankings = None
+        if settings.rankings_enabled:
+            # строит их ETL; пока рейтингов нет, топ идёт из ES
+            rankings = Rankings(cache.entity_cache, elastic.es, settings.rankings_depth)
+        app.state.services = create_services(
+            cache.entity_cache, query_cache.query_cache, elastic.es, genre_catalog, rankings
+        )
+        background = [asyncio.create_task(cache.entity_cache.listen())]
+        if genre_catalog is not None:
+            background.append(asyncio.create_task(genre_catalog.run()))
+        app.state.warmup = None
+        if popularity is not None:
+            background.append(asyncio.create_task(popularity.run()))
+            if settings.warmup_enabled:
+                # воркер принимает запросы сразу; балансировщик ждёт /health/ready
+                app.state.warmup = WarmUp(
+                    app.state.services,
+                    query_cache.query_cache,
+                    elastic.es,
+                    popularity,
+                    top_entities=settings.warmup_top_entities,
+                    top_queries=settings.warmup_top_queries,
+                    batch_size=settings.warmup_batch_size,
+                    concurrency=settings.warmup_concurrency,
+                )
+                background.append(
+                    asyncio.create_task(app.state.warmup.run(settings.warmup_timeout))
+                )
+        if settings.metrics_enabled:
+            pools = {
+                "redis": redis.pool_stats,
+                "elastic": elastic.pool_totals,
+                "postgres": pg.pool_stats,
+            }
+            guard_stats = {backend: guard.stats for backend, guard in guards.items()}
+            background.append(
+                asyncio.create_task(
+                    metrics.monitor(settings.metrics_sample_interval, pools, guard_stats)
+                )
+            )
 
     yield
 
     if not settings.docs_only:       # изменено
-        await redis.redis.close()
-        await elastic.es.close()
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await redis.close_redis()
+        await elastic.close_elastic()
         await pg.close_pg()
 
 
@@ -60,8 +161,25 @@ app = FastAPI(
     default_response_class=ORJSONResponse,
     lifespan=lifespan,
 )
+app.add_exception_handler(Overloaded, overloaded_handler)
+
 
+# порядок важен: последний добавленный middleware — внешний. HTTP‑кеш
+# должен видеть уже сжатое тело и ETag варианта, поэтому сжатие — внутри;
+# метрики — снаружи всех, чтобы замер включал и сжатие, и проверку ETag
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware, min_size=settings.compression_min_size)
+if settings.http_cache_enabled:
+    app.add_middleware(
+        HTTPCacheMiddleware,
+        # ETag'и отданных ответов — для 304 без вызова маршрута
+        etags=cache.LocalCache(settings.local_cache_size, settings.local_cache_ttl),
+    )
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
 app.include_router(films.router,  prefix="/api/v1/films",  tags=["Фильмы"])
 app.include_router(genres.router, prefix="/api/v1/genres", tags=["Жанры"])
 app.include_router(persons.router, prefix="/api/v1/persons", tags=["Персоны"])
+app.include_router(health.router, prefix="/api/v1/health", tags=["Служебное"])
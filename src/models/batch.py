@@ -0,0 +1,17 @@
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel, Field
+
+T = TypeVar("T")
+
+BATCH_MAX_SIZE = 100
+
+
+class BatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_SIZE)
+
+
+class BatchItem(BaseModel, Generic[T]):
+    id: str
+    found: bool
+    item: Optional[T] = None
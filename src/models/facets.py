@@ -0,0 +1,35 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel
+
+from src.models.film import ShortFilm
+
+
+class GenreFacet(BaseModel):
+    name: str
+    count: int
+
+
+class RatingBucket(BaseModel):
+    min: float  # включительно
+    max: float  # не включительно
+    count: int
+
+
+class YearRange(BaseModel):
+    min: Optional[int] = None  # None — в выборке нет дат
+    max: Optional[int] = None
+
+
+class FilmFacets(BaseModel):
+    genres: List[GenreFacet]
+    rating: List[RatingBucket]
+    years: YearRange
+
+
+class FilmListPage(BaseModel):
+    items: List[ShortFilm]
+    total: int
+    # "gte" — подсчёт остановлен на пороге, фильмов не меньше ``total``
+    total_relation: Literal["eq", "gte"]
+    facets: FilmFacets
@@ -1,5 +1,7 @@
 from typing import List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, RootModel
+
+from src.models.film import ShortFilm
 
 
 class PersonFilm(BaseModel):
@@ -7,7 +9,21 @@ class PersonFilm(BaseModel):
     roles: List[str]
 
 
+class ShortPerson(BaseModel):
+    uuid: str = Field(alias="id")
+    full_name: str
+
+
 class Person(BaseModel):
     uuid: str = Field(alias="id")
     full_name: str
     films: List[PersonFilm] = []
+
+
+class PersonFilmCard(ShortFilm):
+    """Короткая карточка фильма и роли персоны в нём."""
+    roles: List[str]
+
+
+class PersonFilmography(RootModel[List[PersonFilmCard]]):
+    """Фильмография персоны — кешируется одной записью."""
@@ -0,0 +1,591 @@
+"""
+Двухуровневый кеш сущностей: локальный LRU/TTL в памяти воркера + Redis.
+
+Локальный уровень хранит готовый JSON ответа и (лениво) провалидированную
+pydantic‑модель, поэтому горячие ключи отдаются без сетевого похода и без
+разбора JSON, а ``get_or_load_raw`` — вообще без валидации и сериализации.
+Согласованность между воркерами gunicorn поддерживается через Redis pub/sub:
+при инвалидации ключ удаляется из Redis, а его имя рассылается всем
+воркерам, и каждый выбрасывает ключ из своего локального уровня.
+
+Промахи по одному ключу внутри воркера объединяются (single-flight),
+а опциональная блокировка в Redis не даёт нескольким воркерам
+одновременно перестраивать один и тот же ключ.
+
+Запись в Redis — строка заголовка ``"<soft_expires_at> <delta> <hard_expires_at>"``
+и JSON модели. Рядом лежат заранее сжатые варианты payload (``<key>:gzip``,
+``<key>:br``). Ключ живёт на ``stale_if_error`` дольше жёсткого срока:
+запись за жёстким сроком — промах, но если источник недоступен
+(``Overloaded``), отдаётся она — последнее известное значение.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Type, TypeVar
+
+from pydantic import BaseModel
+from redis.asyncio import Redis  # pylint: disable=no-name-in-module,import-error
+
+from src.core.compression import CODECS, compress, variant_etag
+from src.core.metrics import cache_lookup, stage
+from src.core.overload import Overloaded
+from src.services.popularity import Popularity
+from src.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+# снимаем блокировку, только если она всё ещё наша
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LocalCache:
+    """Ограниченный LRU‑кеш с TTL в памяти одного процесса.
+
+    Не потокобезопасен — рассчитан на один event loop воркера.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CacheTTL(NamedTuple):
+    """Сроки жизни записи, секунды.
+
+    ``soft`` — после него запись считается устаревшей, но ещё отдаётся,
+    пока фоновая задача её обновляет; ``hard`` — после него запись —
+    промах (ключ в Redis живёт ещё ``stale_if_error``).
+    При ``soft == hard`` получаем обычный кеш без stale‑while‑revalidate.
+    """
+    soft: int
+    hard: int
+
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag тела ответа."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+@dataclass(slots=True)
+class _Entry:
+    payload: bytes          # JSON модели в итоговом формате ответа API (by_alias)
+    soft_expires_at: float  # unix‑время, общее для всех воркеров
+    delta: float            # сколько длилась последняя загрузка, секунды
+    value: Any = None       # провалидированная модель — создаётся по требованию
+    etag: str | None = None  # сильный ETag payload — считается по требованию
+    # заранее сжатые варианты payload: {"gzip": ..., "br": ...}
+    variants: Dict[str, bytes] = field(default_factory=dict)
+    # после него запись — только запасная на случай отказа источника
+    hard_expires_at: float = math.inf
+
+    def model(self, model: Type[M]) -> M:
+        if self.value is None:
+            with stage("validate", model):
+                self.value = model.model_validate_json(self.payload)
+        return self.value
+
+    def raw(self, encoding: str | None = None, min_size: int | None = None) -> "RawPayload":
+        if self.etag is None:
+            self.etag = make_etag(self.payload)
+        if encoding is None or min_size is None or len(self.payload) < min_size:
+            return RawPayload(self.payload, self.etag)
+
+        body = self.variants.get(encoding)
+        if body is None:
+            # запись пришла без этого варианта — сжимаем один раз на локальную запись
+            body = self.variants[encoding] = compress(self.payload, encoding)
+        # у каждого представления свой сильный ETag
+        return RawPayload(body, variant_etag(self.etag, encoding), encoding)
+
+
+class RawPayload(NamedTuple):
+    """Готовое тело ответа и его ETag (хеш считается один раз на запись)."""
+    body: bytes
+    etag: str
+    encoding: str | None = None  # Content-Encoding тела, None — без сжатия
+
+
+def _variant_key(key: str, encoding: str) -> str:
+    return f"{key}:{encoding}"
+
+
+def _encode(entry: _Entry) -> bytes:
+    # заголовок отдельной строкой, чтобы не заворачивать payload в ещё один JSON
+    return (
+        f"{entry.soft_expires_at:.3f} {entry.delta:.4f} {entry.hard_expires_at:.3f}\n".encode()
+        + entry.payload
+    )
+
+
+def _decode(raw: bytes) -> _Entry:
+    header, _, payload = raw.partition(b"\n")
+    # у записей без третьего поля жёсткий срок — TTL ключа в Redis
+    soft_expires_at, delta, *hard_expires_at = header.split()
+    entry = _Entry(payload, float(soft_expires_at), float(delta))
+    if hard_expires_at:
+        entry.hard_expires_at = float(hard_expires_at[0])
+    return entry
+
+
+def _is_expired(entry: _Entry) -> bool:
+    return time.time() >= entry.hard_expires_at
+
+
+class EntityCache:
+    """Кеш «локальная память → Redis → источник».
+
+    * ``get`` — ищет модель сначала локально, затем в Redis;
+    * ``get_or_load`` — при промахе обоих уровней вызывает загрузчик
+      (обычно запрос в Elasticsearch) и заполняет оба уровня; конкурентные
+      промахи по одному ключу ждут одну загрузку;
+    * ``get_or_load_raw`` — то же, но возвращает готовые байты ответа;
+    * ``get_many`` — то же для пачки id за один ``MGET`` и один загрузчик;
+    * если загрузчик упал с ``Overloaded``, ``get_or_load*``/``get_many``
+      отдают запись за жёстким сроком, если она ещё есть (stale-if-error);
+    * ``invalidate`` — удаляет ключи из Redis и оповещает все воркеры;
+    * ``listen`` — фоновая задача воркера, принимающая оповещения.
+
+    С ``popularity`` обращения к ключам сущностей учитываются для прогрева.
+
+    Записи живут по схеме stale‑while‑revalidate (см. ``CacheTTL``), а момент
+    фонового обновления выбирается вероятностно (XFetch): чем дольше загрузка
+    и чем ближе мягкий срок, тем раньше запись может обновиться, и воркеры
+    не бросаются перестраивать горячий ключ все одновременно.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local: LocalCache,
+        channel: str,
+        *,
+        lock_ttl: float | None = None,
+        lock_poll_interval: float = 0.05,
+        xfetch_beta: float = 1.0,
+        compress_min_size: int | None = None,
+        stale_if_error: int = 0,
+        popularity: Popularity | None = None,
+    ):
+        self.redis = redis
+        self.local = local
+        self.channel = channel
+        self.lock_ttl = lock_ttl
+        self.lock_poll_interval = lock_poll_interval
+        self.xfetch_beta = xfetch_beta
+        self.compress_min_size = compress_min_size
+        self.stale_if_error = stale_if_error
+        self.popularity = popularity
+        self.flights = SingleFlight()
+        self._refreshes: set[asyncio.Task] = set()
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.lock_waits = 0
+        self.lock_timeouts = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.stale_if_error_hits = 0
+        # оповещений принято (и переподключений) — по нему производные данные
+        # воркера (ETag'и ответов в HTTPCacheMiddleware) узнают об изменениях
+        self.invalidations = 0
+
+    def _make_entry(self, value: BaseModel, ttl: CacheTTL, delta: float) -> _Entry:
+        with stage("serialize", type(value)):
+            payload = value.model_dump_json(by_alias=True).encode()
+        now = time.time()
+        entry = _Entry(payload, now + ttl.soft, delta, value, hard_expires_at=now + ttl.hard)
+        if self.compress_min_size is not None and len(payload) >= self.compress_min_size:
+            # сжимаем один раз на заполнение кеша, а не на каждый ответ
+            entry.variants = {encoding: compress(payload, encoding) for encoding in CODECS}
+        return entry
+
+    def _store(self, pipe, key: str, entry: _Entry, ttl: CacheTTL) -> None:
+        ex = ttl.hard + self.stale_if_error
+        pipe.set(key, _encode(entry), ex=ex)
+        for encoding, body in entry.variants.items():
+            pipe.set(_variant_key(key, encoding), body, ex=ex)
+
+    async def _get_entry(self, key: str, encoding: str | None = None) -> _Entry | None:
+        entry = self.local.get(key)
+        if entry is not None:
+            cache_lookup(key, "local")
+            return entry
+
+        if encoding is None:
+            cached, variant = await self.redis.get(key), None
+        else:
+            cached, variant = await self.redis.mget(key, _variant_key(key, encoding))
+        try:
+            entry = None if cached is None else _decode(cached)
+        except ValueError:
+            entry = None  # запись старого формата — как промах
+        if entry is None:
+            self.redis_misses += 1
+            cache_lookup(key, "miss")
+            return None
+
+        self.redis_hits += 1
+        cache_lookup(key, "redis")
+        if variant is not None:
+            entry.variants[encoding] = variant
+        self.local.set(key, entry)
+        return entry
+
+    def _is_fresh(self, entry: _Entry) -> bool:
+        # XFetch: now - delta * beta * ln(rand) < expiry; ln(rand) <= 0
+        jitter = entry.delta * self.xfetch_beta * math.log(1.0 - random.random())
+        return time.time() - jitter < entry.soft_expires_at
+
+    async def get(self, key: str, model: Type[M]) -> M | None:
+        entry = await self._get_entry(key)
+        return None if entry is None or _is_expired(entry) else entry.model(model)
+
+    async def set(self, key: str, value: BaseModel, ttl: CacheTTL, delta: float = 0.0) -> None:
+        entry = self._make_entry(value, ttl, delta)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._store(pipe, key, entry, ttl)
+            await pipe.execute()
+        self.local.set(key, entry)
+
+    async def get_or_load(
+        self,
+        key: str,
+        model: Type[M],
+        loader: Callable[[], Awaitable[M]],
+        ttl: CacheTTL,
+    ) -> M:
+        entry = await self._get_or_load_entry(key, loader, ttl)
+        return entry.model(model)
+
+    async def get_or_load_raw(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[BaseModel]],
+        ttl: CacheTTL,
+        encoding: str | None = None,
+    ) -> RawPayload:
+        """Как ``get_or_load``, но отдаёт готовый JSON ответа и его ETag.
+
+        На попадании модель не валидируется и не сериализуется заново —
+        байты из Redis уходят клиенту как есть. Валидация происходит только
+        при загрузке из источника.
+
+        ``encoding`` — кодировка, которую принимает клиент; если запись
+        достаточно велика, возвращается заранее сжатый вариант.
+        """
+        entry = await self._get_or_load_entry(key, loader, ttl, encoding)
+        return entry.raw(encoding, self.compress_min_size)
+
+    async def _get_or_load_entry(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[BaseModel]],
+        ttl: CacheTTL,
+        encoding: str | None = None,
+    ) -> _Entry:
+        if self.popularity is not None:
+            self.popularity.record_key(key)
+        entry = await self._get_entry(key, encoding)
+        if entry is None or _is_expired(entry):
+            try:
+                return await self.flights.do(key, lambda: self._fill(key, loader, ttl))
+            except Overloaded:
+                if entry is None:
+                    raise
+                self._served_stale_if_error(key)
+                return entry
+
+        if not self._is_fresh(entry):
+            self.stale_hits += 1
+            self._refresh_in_background(key, loader, ttl)
+        return entry
+
+    def _served_stale_if_error(self, key: str) -> None:
+        self.stale_if_error_hits += 1
+        cache_lookup(key, "stale_if_error")
+
+    def _refresh_in_background(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[BaseModel]],
+        ttl: CacheTTL,
+    ) -> None:
+        if key in self.flights:
+            return
+        self.refreshes += 1
+        task = asyncio.create_task(self.flights.do(key, lambda: self._fill(key, loader, ttl)))
+        self._refreshes.add(task)
+        task.add_done_callback(self._on_refresh_done)
+
+    def _on_refresh_done(self, task: asyncio.Task) -> None:
+        self._refreshes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_errors += 1
+            logger.warning("background cache refresh failed: %r", task.exception())
+
+    async def get_many(
+        self,
+        prefix: str,
+        ids: List[str],
+        model: Type[M],
+        loader: Callable[[List[str]], Awaitable[Dict[str, M]]],
+        ttl: CacheTTL,
+    ) -> Dict[str, M]:
+        """Пакетный вариант ``get_or_load``: ключи ``prefix + id``.
+
+        Локальный уровень → один ``MGET`` → один вызов ``loader`` на все
+        промахи (обычно ES ``mget``) → запись пайплайном. Возвращает только
+        найденные сущности; ненайденные в ответе отсутствуют.
+        """
+        found: Dict[str, M] = {}
+        stale: List[str] = []
+        remote: List[str] = []
+        missing: List[str] = []
+        expired: Dict[str, _Entry] = {}   # запасные записи на случай отказа загрузчика
+        for id_ in dict.fromkeys(ids):
+            if self.popularity is not None:
+                self.popularity.record_key(prefix + id_)
+            entry = self.local.get(prefix + id_)
+            if entry is None:
+                remote.append(id_)
+            elif _is_expired(entry):
+                expired[id_] = entry
+                missing.append(id_)
+            else:
+                cache_lookup(prefix, "local")
+                found[id_] = entry.model(model)
+                if not self._is_fresh(entry):
+                    stale.append(id_)
+
+        if remote:
+            for id_, cached in zip(remote, await self.redis.mget([prefix + id_ for id_ in remote])):
+                try:
+                    entry = None if cached is None else _decode(cached)
+                except ValueError:
+                    entry = None
+                if entry is not None and _is_expired(entry):
+                    expired[id_] = entry
+                    entry = None
+                if entry is None:
+                    self.redis_misses += 1
+                    cache_lookup(prefix, "miss")
+                    missing.append(id_)
+                    continue
+                self.redis_hits += 1
+                cache_lookup(prefix, "redis")
+                self.local.set(prefix + id_, entry)
+                found[id_] = entry.model(model)
+                if not self._is_fresh(entry):
+                    stale.append(id_)
+
+        if missing:
+            started = time.monotonic()
+            try:
+                loaded = await loader(missing)
+            except Overloaded:
+                # «не найдено» про сущность без запасной записи было бы неправдой
+                if not all(id_ in expired for id_ in missing):
+                    raise
+                for id_ in missing:
+                    self._served_stale_if_error(prefix + id_)
+                    found[id_] = expired[id_].model(model)
+                return found
+            delta = time.monotonic() - started
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for id_, value in loaded.items():
+                    entry = self._make_entry(value, ttl, delta)
+                    self._store(pipe, prefix + id_, entry, ttl)
+                    self.local.set(prefix + id_, entry)
+                await pipe.execute()
+            found.update(loaded)
+
+        for id_ in stale:
+            self.stale_hits += 1
+            self._refresh_in_background(prefix + id_, partial(self._load_one, loader, id_), ttl)
+        return found
+
+    @staticmethod
+    async def _load_one(loader: Callable[[List[str]], Awaitable[Dict[str, M]]], id_: str) -> M:
+        loaded = await loader([id_])
+        if id_ not in loaded:
+            raise LookupError(id_)
+        return loaded[id_]
+
+    async def _load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[BaseModel]],
+        ttl: CacheTTL,
+    ) -> _Entry:
+        started = time.monotonic()
+        value = await loader()
+        entry = self._make_entry(value, ttl, time.monotonic() - started)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._store(pipe, key, entry, ttl)
+            await pipe.execute()
+        self.local.set(key, entry)
+        return entry
+
+    async def _fill(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[BaseModel]],
+        ttl: CacheTTL,
+    ) -> _Entry:
+        if not self.lock_ttl:
+            return await self._load(key, loader, ttl)
+
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        if await self.redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000)):
+            try:
+                return await self._load(key, loader, ttl)
+            finally:
+                await self.redis.eval(_RELEASE_LOCK, 1, lock_key, token)
+
+        entry = await self._wait_for_other_worker(key, lock_key)
+        if entry is None:
+            # владелец блокировки не справился или не успел — грузим сами
+            entry = await self._load(key, loader, ttl)
+        return entry
+
+    async def _wait_for_other_worker(self, key: str, lock_key: str) -> _Entry | None:
+        """Ждёт, пока ключ перестроит воркер, владеющий блокировкой."""
+        self.lock_waits += 1
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.lock_poll_interval)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.exists(lock_key)
+                cached, locked = await pipe.execute()
+            try:
+                entry = None if cached is None else _decode(cached)
+            except ValueError:
+                entry = None  # запись старого формата — как промах
+            if entry is not None and entry.soft_expires_at > time.time():
+                self.local.set(key, entry)
+                return entry
+            if not locked:
+                return None
+        self.lock_timeouts += 1
+        return None
+
+    async def invalidate(self, *keys: str) -> None:
+        if not keys:
+            return
+        for key in keys:
+            self.local.delete(key)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(*keys, *(_variant_key(key, enc) for key in keys for enc in CODECS))
+            for key in keys:
+                pipe.publish(self.channel, key)
+            await pipe.execute()
+
+    async def listen(self) -> None:
+        """Слушает канал инвалидации до отмены задачи.
+
+        После (пере)подключения локальный уровень очищается целиком:
+        сообщения, пришедшие во время обрыва, потеряны.
+        """
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self.local.clear()
+                self.invalidations += 1
+                async for message in pubsub.listen():
+                    key = message["data"]
+                    self.local.delete(key.decode() if isinstance(key, bytes) else key)
+                    self.invalidations += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("cache invalidation listener failed, reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "local": self.local.stats(),
+            "redis": {"hits": self.redis_hits, "misses": self.redis_misses},
+            "singleflight": self.flights.stats(),
+            "lock": {"waits": self.lock_waits, "timeouts": self.lock_timeouts},
+            "stale": {
+                "hits": self.stale_hits,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "if_error_hits": self.stale_if_error_hits,
+            },
+        }
+
+
+entity_cache: EntityCache | None = None
+
+
+async def get_entity_cache() -> EntityCache:
+    if entity_cache is None:
+        raise RuntimeError("Cache disabled in DOCS_ONLY mode")
+    return entity_cache
@@ -0,0 +1,39 @@
+"""
+Контейнер сервисов уровня приложения.
+
+Сервисы создаются один раз в ``lifespan`` и кладутся в ``app.state``;
+зависимости ``get_*_service`` просто достают готовый объект, без дерева
+под‑зависимостей на каждый запрос.
+"""
+from dataclasses import dataclass
+
+from elasticsearch import AsyncElasticsearch
+
+from src.services.cache import EntityCache
+from src.services.film import FilmService
+from src.services.genre import GenreService
+from src.services.genre_catalog import GenreCatalog
+from src.services.person import PersonService
+from src.services.query_cache import QueryCache
+from src.services.rankings import Rankings
+
+
+@dataclass(frozen=True, slots=True)
+class ServiceContainer:
+    film: FilmService
+    genre: GenreService
+    person: PersonService
+
+
+def create_services(
+    cache: EntityCache,
+    queries: QueryCache,
+    elastic: AsyncElasticsearch,
+    genres: GenreCatalog | None = None,
+    rankings: Rankings | None = None,
+) -> ServiceContainer:
+    return ServiceContainer(
+        film=FilmService(cache, queries, elastic, genres, rankings),
+        genre=GenreService(cache, queries, elastic, genres),
+        person=PersonService(cache, queries, elastic),
+    )
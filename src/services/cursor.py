@@ -0,0 +1,101 @@
+"""
+Курсорная пагинация через point-in-time (PIT) + ``search_after``.
+
+В отличие от ``from``/``size`` стоимость страницы не растёт с глубиной и
+не упирается в ``index.max_result_window``. Курсор непрозрачен для
+клиента: это base64 от id PIT и значений сортировки последнего хита.
+Первая страница запрашивается курсором ``*``.
+"""
+import base64
+import binascii
+from http import HTTPStatus
+from typing import Type
+
+import orjson
+from elasticsearch import AsyncElasticsearch, BadRequestError, NotFoundError
+from fastapi import HTTPException
+
+from src.core.config import settings
+from src.models.page import CursorPage
+from src.services.cache import M
+
+FIRST_PAGE = "*"
+TIEBREAKER = {"_shard_doc": "asc"}
+# значения сортировки в search_after — только скаляры JSON
+SORT_VALUE_TYPES = (str, int, float, bool, type(None))
+
+
+def encode_cursor(pit_id: str, search_after: list) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([pit_id, search_after])).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, list]:
+    try:
+        pit_id, search_after = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, orjson.JSONDecodeError, ValueError, TypeError):
+        raise HTTPException(HTTPStatus.BAD_REQUEST, "invalid cursor")
+    if (
+        not isinstance(pit_id, str)
+        or not pit_id
+        or not isinstance(search_after, list)
+        or not all(isinstance(value, SORT_VALUE_TYPES) for value in search_after)
+    ):
+        raise HTTPException(HTTPStatus.BAD_REQUEST, "invalid cursor")
+    return pit_id, search_after
+
+
+async def search_after_page(
+    elastic: AsyncElasticsearch,
+    index: str,
+    body: dict,
+    model: Type[M],
+    *,
+    page_size: int,
+    cursor: str,
+) -> CursorPage[M]:
+    """Одна страница выдачи ``body`` по курсору.
+
+    ``body`` — обычное тело запроса без ``from``/``size``; сортировка
+    дополняется тай‑брейкером ``_shard_doc``, чтобы порядок был строгим
+    (без ``sort`` документы идут в порядке индекса — так дешевле всего).
+    """
+    keep_alive = settings.pit_keep_alive
+    if cursor == FIRST_PAGE:
+        pit = await elastic.open_point_in_time(index=index, keep_alive=keep_alive)
+        pit_id, search_after = pit["id"], None
+    else:
+        pit_id, search_after = decode_cursor(cursor)
+
+    body = {
+        **body,
+        "size": page_size,
+        "pit": {"id": pit_id, "keep_alive": keep_alive},
+        "sort": [*body.get("sort", []), TIEBREAKER],
+    }
+    if search_after is not None:
+        # курсор другой сортировки (или подделанный) ES отверг бы с 400
+        if len(search_after) != len(body["sort"]):
+            raise HTTPException(HTTPStatus.BAD_REQUEST, "invalid cursor")
+        body["search_after"] = search_after
+
+    try:
+        resp = await elastic.search(body=body)
+    except (BadRequestError, NotFoundError):
+        if cursor == FIRST_PAGE:
+            raise
+        # PIT истёк или id PIT/значения сортировки не приняты ES
+        raise HTTPException(HTTPStatus.BAD_REQUEST, "invalid or expired cursor")
+    hits = resp["hits"]["hits"]
+    pit_id = resp.get("pit_id", pit_id)
+
+    next_cursor = None
+    if len(hits) == page_size:
+        next_cursor = encode_cursor(pit_id, hits[-1]["sort"])
+    else:
+        # выдача закончилась — PIT больше не нужен
+        await elastic.close_point_in_time(id=pit_id)
+
+    return CursorPage[model](
+        items=[model(**hit["_source"]) for hit in hits],
+        next_cursor=next_cursor,
+    )
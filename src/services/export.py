@@ -0,0 +1,104 @@
+"""
+Потоковая выгрузка индекса в NDJSON (одна JSON‑строка на документ).
+
+Документы читаются из ES пачками через point-in-time + ``search_after``
+в порядке ``_shard_doc`` (самый дешёвый порядок обхода), ``_source``
+каждого хита кодируется orjson как есть — без pydantic. В памяти в любой
+момент только одна пачка, сколько бы документов ни было в индексе.
+
+Обратное давление — естественное: генератор запрашивает следующую пачку
+только после того, как сервер отправил предыдущую (``send`` в ASGI ждёт,
+пока клиент вычитает данные), так что медленный клиент замедляет чтение
+из ES, а не раздувает буферы.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncGenerator, Sequence
+
+import orjson
+from elasticsearch import AsyncElasticsearch
+
+from src.core.config import settings
+from src.services.cursor import TIEBREAKER
+
+logger = logging.getLogger(__name__)
+
+UPDATED_FIELD = "modified"
+
+
+def export_query(updated_since: datetime | None) -> dict:
+    if updated_since is None:
+        return {"match_all": {}}
+    return {"range": {UPDATED_FIELD: {"gte": updated_since.isoformat()}}}
+
+
+async def export_ndjson(
+    elastic: AsyncElasticsearch,
+    index: str,
+    source: Sequence[str],
+    *,
+    updated_since: datetime | None = None,
+    batch_size: int | None = None,
+) -> AsyncGenerator[bytes, None]:
+    """Возвращает поток NDJSON‑кусков (по куску на пачку) с уже открытым PIT.
+
+    PIT открывается до первого байта ответа: если ES недоступен, клиент
+    получит обычную ошибку, а не оборванный поток. Открывает и закрывает
+    его сам поток (в ``finally``), поэтому PIT не утечёт, даже если клиент
+    отключился раньше первого куска, — при условии, что поток закрыт:
+    роуты вызывают ``close_export`` фоновой задачей ответа.
+    """
+    body = {
+        "query": export_query(updated_since),
+        "_source": list(source),
+        "size": batch_size or settings.export_batch_size,
+        "sort": [TIEBREAKER],
+        "track_total_hits": False,
+    }
+    stream = _stream(elastic, index, body, settings.pit_keep_alive)
+    await anext(stream)  # открывает PIT
+    return stream
+
+
+async def close_export(stream: AsyncGenerator[bytes, None]) -> None:
+    """Закрывает поток выгрузки вместе с PIT (фоновая задача ответа).
+
+    ``BackgroundTask(stream.aclose)`` не годится: Starlette не распознаёт
+    встроенный метод как корутину и вызывает его в пуле потоков.
+    """
+    await stream.aclose()
+
+
+async def _stream(
+    elastic: AsyncElasticsearch, index: str, body: dict, keep_alive: str
+) -> AsyncGenerator[bytes, None]:
+    pit = await elastic.open_point_in_time(index=index, keep_alive=keep_alive)
+    pit_id = pit["id"]
+    exported = 0
+    try:
+        yield b""  # PIT открыт; этот кусок забирает export_ndjson, не клиент
+        search_after = None
+        while True:
+            page = {**body, "pit": {"id": pit_id, "keep_alive": keep_alive}}
+            if search_after is not None:
+                page["search_after"] = search_after
+            resp = await elastic.search(body=page)
+            pit_id = resp.get("pit_id", pit_id)
+            hits = resp["hits"]["hits"]
+            if not hits:
+                break
+
+            yield b"".join(orjson.dumps(hit["_source"]) + b"\n" for hit in hits)
+            exported += len(hits)
+            if len(hits) < body["size"]:
+                break
+            search_after = hits[-1]["sort"]
+    finally:
+        logger.info("export of %d documents done", exported)
+        try:
+            # при отключении клиента задачу отменяют — закрытие доводим до конца
+            await asyncio.shield(elastic.close_point_in_time(id=pit_id))
+        except Exception:  # pylint: disable=broad-except
+            # PIT всё равно истечёт через keep_alive
+            logger.warning("failed to close export PIT", exc_info=True)
@@ -1,57 +1,214 @@
-from functools import lru_cache
 from http import HTTPStatus
-from typing import List
+from datetime import datetime
+from typing import AsyncGenerator, Dict, List
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
-from fastapi import Depends, HTTPException
-from redis.asyncio import Redis
+from fastapi import HTTPException, Request
 
-from src.db.elastic import get_elastic
-from src.db.redis import get_redis
+from src.core.config import settings
+from src.models.batch import BatchItem
+from src.models.facets import FilmFacets, FilmListPage, GenreFacet, RatingBucket, YearRange
 from src.models.film import Film, ShortFilm
+from src.models.page import CursorPage
+from src.services.cache import CacheTTL, EntityCache, RawPayload
+from src.services.cursor import search_after_page
+from src.services.export import UPDATED_FIELD, export_ndjson
+from src.services.genre_catalog import GenreCatalog
+from src.services.projection import source_includes
+from src.services.query_cache import QueryCache
+from src.services.rankings import Rankings
+from src.services.suggest import suggest
 
-CACHE_TTL = 60 * 5
-INDEX = "movies"
+CACHE_TTL = CacheTTL(settings.film_cache_soft_ttl, settings.film_cache_hard_ttl)
+INDEX = "movies"   # алиас: физический индекс — movies_v<N>
+# фасеты: все жанры (их сотня с небольшим), шаг гистограммы рейтинга, поле даты
+GENRE_FACET_SIZE = 500
+RATING_INTERVAL = 1.0
+YEAR_FIELD = "creation_date"
 
 
 class FilmService:
     """Сервис «Фильмы».
 
     * Достаёт данные из Elasticsearch.
-    * Кэширует результат в Redis (`film:<uuid>`).
+    * Кэширует результат в памяти воркера и в Redis (`film:<поколение индекса>:<uuid>`),
+      списки и поиск — по хешу запроса (`query:movies:v<ver>:<hash>`).
     * Выдаёт:
         • подробную карточку фильма;
         • список фильмов с пагинацией;
         • результаты полнотекстового поиска.
+    * Фильтр по жанру сверяет с каталогом жанров в памяти (если он есть),
+      не отправляя в ES заведомо пустые запросы.
+    * Топ по рейтингу (``sort=-imdb_rating``) отдаёт из рейтингов в Redis,
+      если они построены.
     """
-    def __init__(self, redis: Redis, elastic: AsyncElasticsearch):
-        self.redis = redis
+    def __init__(
+        self,
+        cache: EntityCache,
+        queries: QueryCache,
+        elastic: AsyncElasticsearch,
+        genres: GenreCatalog | None = None,
+        rankings: Rankings | None = None,
+    ):
+        self.cache = cache
+        self.queries = queries
         self.elastic = elastic
+        self.genres = genres
+        self.rankings = rankings
 
     async def get_by_id(self, film_id: str) -> Film:
-        key = f"film:{film_id}"
-        cached = await self.redis.get(key)
-        if cached:
-            return Film.model_validate_json(cached)
+        return await self.cache.get_or_load(
+            await self.queries.key_prefix(INDEX, "film") + film_id,
+            Film,
+            lambda: self._get_from_elastic(film_id),
+            CACHE_TTL,
+        )
+
+    async def get_raw_by_id(self, film_id: str, encoding: str | None = None) -> RawPayload:
+        """JSON фильма в итоговом формате ответа.
+
+        На попадании в кеш байты отдаются как есть, без валидации модели;
+        при ``encoding`` — заранее сжатый вариант из кеша.
+        """
+        return await self.cache.get_or_load_raw(
+            await self.queries.key_prefix(INDEX, "film") + film_id,
+            lambda: self._get_from_elastic(film_id),
+            CACHE_TTL,
+            encoding,
+        )
 
+    async def _get_from_elastic(self, film_id: str) -> Film:
         try:
-            doc = await self.elastic.get(index=INDEX, id=film_id)
+            doc = await self.elastic.get(
+                index=INDEX, id=film_id, source_includes=source_includes(Film)
+            )
         except NotFoundError:
             raise HTTPException(HTTPStatus.NOT_FOUND, "film not found")
+        return Film(**doc["_source"])
 
-        film = Film(**doc["_source"])
-        await self.redis.set(key, film.model_dump_json(), ex=CACHE_TTL)
-        return film
+    async def get_many(self, film_ids: List[str]) -> List[BatchItem[Film]]:
+        """Пакетное получение по UUID: порядок ответа совпадает с запросом."""
+        prefix = await self.queries.key_prefix(INDEX, "film")
+        found = await self.cache.get_many(
+            prefix, film_ids, Film, self._mget_from_elastic, CACHE_TTL
+        )
+        return [
+            BatchItem[Film](id=film_id, found=film_id in found, item=found.get(film_id))
+            for film_id in film_ids
+        ]
+
+    async def _mget_from_elastic(self, film_ids: List[str]) -> Dict[str, Film]:
+        resp = await self.elastic.mget(
+            index=INDEX, ids=film_ids, source_includes=source_includes(Film)
+        )
+        return {doc["_id"]: Film(**doc["_source"]) for doc in resp["docs"] if doc.get("found")}
 
     async def list(
         self,
         *,
         sort: str | None,
-        genre: str | None,        # genre — название жанра («Action», «Comedy»)
+        genre: str | None,        # genre — название жанра («Action», «Comedy»)
         page_size: int,
         page_number: int,
     ) -> List[ShortFilm]:
-        """ES‑запрос со сортировкой и фильтром по названию жанра."""
+        """ES‑запрос со сортировкой и фильтром по названию жанра."""
+        genre = self._check_genre(genre)
+        if self.rankings is not None and self.rankings.supports(sort):
+            items = await self.rankings.page(sort, genre, (page_number - 1) * page_size, page_size)
+            if items is not None:
+                return items
+        body = {
+            **self._list_body(sort, genre),
+            "from": (page_number - 1) * page_size,
+            "size": page_size,
+        }
+        return await self.queries.get_or_load(INDEX, body, ShortFilm, lambda: self._search(body))
+
+    async def list_page(
+        self, *, sort: str | None, genre: str | None, page_size: int, cursor: str
+    ) -> CursorPage[ShortFilm]:
+        """То же, что ``list``, но постранично по курсору (PIT + search_after)."""
+        genre = self._check_genre(genre)
+        return await search_after_page(
+            self.elastic, INDEX, self._list_body(sort, genre), ShortFilm,
+            page_size=page_size, cursor=cursor,
+        )
+
+    async def list_with_facets(
+        self, *, sort: str | None, genre: str | None, page_size: int, page_number: int
+    ) -> FilmListPage:
+        """Страница списка вместе с total и фасетами — одним ES‑запросом.
+
+        Фильтр по жанру идёт в ``post_filter``: счётчики жанров считаются
+        по всему каталогу (чтобы показать, сколько фильмов в соседних
+        жанрах), а гистограмма рейтинга и диапазон лет — по отфильтрованной
+        выборке. Весь ответ кешируется как одна запись.
+        """
+        genre = self._check_genre(genre)
+        body = {
+            **self._list_body(sort, None),
+            "from": (page_number - 1) * page_size,
+            "size": page_size,
+            "track_total_hits": settings.facets_track_total_hits,
+            "aggs": {"genres": {"terms": {"field": "genres", "size": GENRE_FACET_SIZE}}},
+        }
+        stats = {
+            "rating": {
+                "histogram": {"field": "imdb_rating", "interval": RATING_INTERVAL, "min_doc_count": 0}
+            },
+            "year_min": {"min": {"field": YEAR_FIELD, "format": "yyyy"}},
+            "year_max": {"max": {"field": YEAR_FIELD, "format": "yyyy"}},
+        }
+        if genre:
+            body["post_filter"] = {"term": {"genres": genre}}
+            body["aggs"]["filtered"] = {"filter": body["post_filter"], "aggs": stats}
+        else:
+            body["aggs"].update(stats)
+
+        return await self.queries.get_or_load_model(
+            INDEX, body, FilmListPage, lambda: self._search_with_facets(body)
+        )
+
+    async def export(self, *, updated_since: datetime | None) -> AsyncGenerator[bytes, None]:
+        """Весь каталог полными карточками (плюс ``modified``) в NDJSON."""
+        return await export_ndjson(
+            self.elastic, INDEX, (*source_includes(Film), UPDATED_FIELD),
+            updated_since=updated_since,
+        )
+
+    async def _search_with_facets(self, body: dict) -> FilmListPage:
+        resp = await self.elastic.search(index=INDEX, body=body)
+        aggs = resp["aggregations"]
+        stats = aggs.get("filtered", aggs)
+        total = resp["hits"]["total"]
+        return FilmListPage(
+            items=[ShortFilm(**hit["_source"]) for hit in resp["hits"]["hits"]],
+            total=total["value"],
+            total_relation=total["relation"],
+            facets=FilmFacets(
+                genres=[
+                    GenreFacet(name=b["key"], count=b["doc_count"])
+                    for b in aggs["genres"]["buckets"]
+                ],
+                rating=[
+                    RatingBucket(min=b["key"], max=b["key"] + RATING_INTERVAL, count=b["doc_count"])
+                    for b in stats["rating"]["buckets"]
+                ],
+                years=YearRange(min=_year(stats["year_min"]), max=_year(stats["year_max"])),
+            ),
+        )
+
+    def _check_genre(self, genre: str | None) -> str | None:
+        """Жанр в написании индекса; неизвестный жанр — 400 без похода в ES."""
+        if not genre or self.genres is None or not self.genres.ready:
+            return genre
+        name = self.genres.resolve_name(genre)
+        if name is None:
+            raise HTTPException(HTTPStatus.BAD_REQUEST, "unknown genre")
+        return name
+
+    @staticmethod
+    def _list_body(sort: str | None, genre: str | None) -> dict:
         must = []
         if genre:
             # фильтрация по точному значению keyword‑поля                # изменено
@@ -59,20 +216,36 @@ class FilmService:
 
         body = {
             "query": {"bool": {"must": must}} if must else {"match_all": {}},
-            "from": (page_number - 1) * page_size,
-            "size": page_size,
+            "_source": source_includes(ShortFilm),
         }
         if sort:
             order = "desc" if sort.startswith("-") else "asc"
             body["sort"] = [{sort.lstrip('-'): {"order": order}}]
-
-        resp = await self.elastic.search(index=INDEX, body=body)
-        return [ShortFilm(**hit["_source"]) for hit in resp["hits"]["hits"]]
+        return body
 
     async def search(
         self, *, query: str, page_size: int, page_number: int
     ) -> List[ShortFilm]:
         body = {
+            **self._search_body(query),
+            "from": (page_number - 1) * page_size,
+            "size": page_size,
+        }
+        return await self.queries.get_or_load(INDEX, body, ShortFilm, lambda: self._search(body))
+
+    async def search_page(self, *, query: str, page_size: int, cursor: str) -> CursorPage[ShortFilm]:
+        body = {**self._search_body(query), "sort": ["_score"]}
+        return await search_after_page(
+            self.elastic, INDEX, body, ShortFilm, page_size=page_size, cursor=cursor
+        )
+
+    async def suggest(self, *, prefix: str, size: int) -> List[ShortFilm]:
+        """Подсказки по началу названия — для поиска при наборе."""
+        return await suggest(self.queries, self.elastic, INDEX, "title", ShortFilm, prefix, size)
+
+    @staticmethod
+    def _search_body(query: str) -> dict:
+        return {
             "query": {
                 "multi_match": {
                     "query": query,
@@ -85,16 +258,22 @@ class FilmService:
                     ],
                 }
             },
-            "from": (page_number - 1) * page_size,
-            "size": page_size,
+            "_source": source_includes(ShortFilm),
         }
+
+    async def _search(self, body: dict) -> List[ShortFilm]:
         resp = await self.elastic.search(index=INDEX, body=body)
         return [ShortFilm(**hit["_source"]) for hit in resp["hits"]["hits"]]
 
 
-@lru_cache()
-def get_film_service(
-    redis: Redis = Depends(get_redis),
-    elastic: AsyncElasticsearch = Depends(get_elastic),
-) -> FilmService:
-    return FilmService(redis, elastic)
+def _year(agg: dict) -> int | None:
+    # у пустой выборки min/max = null и нет value_as_string
+    return int(agg["value_as_string"]) if agg.get("value") is not None else None
+
+
+async def get_film_service(request: Request) -> FilmService:
+    # async — чтобы FastAPI не гонял зависимость через threadpool
+    services = getattr(request.app.state, "services", None)
+    if services is None:
+        raise RuntimeError("Services disabled in DOCS_ONLY mode")
+    return services.film
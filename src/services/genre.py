@@ -1,17 +1,28 @@
-from functools import lru_cache
 from http import HTTPStatus
-from typing import List
+from typing import Dict, List
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
-from fastapi import Depends, HTTPException
-from redis.asyncio import Redis
+from fastapi import HTTPException, Request
 
-from src.db.elastic import get_elastic
-from src.db.redis import get_redis
+from src.core.config import settings
+from src.models.batch import BatchItem
 from src.models.genre import Genre
+from src.models.page import CursorPage
+from src.services.cache import CacheTTL, EntityCache, RawPayload
+from src.services.cursor import FIRST_PAGE, decode_cursor, encode_cursor, search_after_page
+from src.services.genre_catalog import GenreCatalog
+from src.services.projection import source_includes
+from src.services.query_cache import QueryCache
 
-CACHE_TTL = 60 * 5
-INDEX = "genres"
+CACHE_TTL = CacheTTL(settings.genre_cache_soft_ttl, settings.genre_cache_hard_ttl)
+INDEX = "genres"   # алиас: физический индекс — genres_v<N>
+# вместо id PIT в курсоре страниц, отданных из каталога в памяти
+CATALOG_CURSOR = "catalog"
+LIST_BODY = {
+    "query": {"match_all": {}},
+    "sort": [{"name.keyword": {"order": "asc"}}],
+    "_source": source_includes(Genre),
+}
 
 
 class GenreService:
@@ -21,50 +32,139 @@ class GenreService:
     получить жанр по UUID,
     отфильтровать по имени,
     отдать весь список с пагинацией.
-    Кэширует каждый жанр в Redis (ключ `genre:<uuid>`).
+    Когда загружен каталог жанров (``GenreCatalog``), все операции
+    обслуживаются из памяти без сетевых походов; до его загрузки —
+    через кеш (ключ `genre:<поколение индекса>:<uuid>`) и Elasticsearch.
     """
-    def __init__(self, redis: Redis, elastic: AsyncElasticsearch):
-        self.redis = redis
+    def __init__(
+        self,
+        cache: EntityCache,
+        queries: QueryCache,
+        elastic: AsyncElasticsearch,
+        catalog: GenreCatalog | None = None,
+    ):
+        self.cache = cache
+        self.queries = queries
         self.elastic = elastic
+        self.catalog = catalog
+
+    @property
+    def _local(self) -> bool:
+        return self.catalog is not None and self.catalog.ready
 
     async def get_by_id(self, genre_id: str) -> Genre:
-        key = f"genre:{genre_id}"                                    # ключ единого формата
-        cached = await self.redis.get(key)
-        if cached:
-            return Genre.model_validate_json(cached)
+        if self._local:
+            genre = self.catalog.get(genre_id)
+            if genre is None:
+                raise HTTPException(HTTPStatus.NOT_FOUND, "genre not found")
+            return genre
+        return await self.cache.get_or_load(
+            await self.queries.key_prefix(INDEX, "genre") + genre_id,
+            Genre,
+            lambda: self._get_from_elastic(genre_id),
+            CACHE_TTL,
+        )
+
+    async def get_raw_by_id(self, genre_id: str, encoding: str | None = None) -> RawPayload:
+        """JSON жанра в итоговом формате ответа.
 
+        На попадании в кеш байты отдаются как есть, без валидации модели;
+        при ``encoding`` — заранее сжатый вариант из кеша.
+        """
+        if self._local:
+            raw = self.catalog.get_raw(genre_id)
+            if raw is None:
+                raise HTTPException(HTTPStatus.NOT_FOUND, "genre not found")
+            return raw
+        return await self.cache.get_or_load_raw(
+            await self.queries.key_prefix(INDEX, "genre") + genre_id,
+            lambda: self._get_from_elastic(genre_id),
+            CACHE_TTL,
+            encoding,
+        )
+
+    async def _get_from_elastic(self, genre_id: str) -> Genre:
         try:
-            doc = await self.elastic.get(index=INDEX, id=genre_id)
+            doc = await self.elastic.get(
+                index=INDEX, id=genre_id, source_includes=source_includes(Genre)
+            )
         except NotFoundError:
             raise HTTPException(HTTPStatus.NOT_FOUND, "genre not found")
+        return Genre(**doc["_source"])
+
+    async def get_many(self, genre_ids: List[str]) -> List[BatchItem[Genre]]:
+        """Пакетное получение по UUID: порядок ответа совпадает с запросом."""
+        if self._local:
+            return [
+                BatchItem[Genre](id=genre_id, found=genre is not None, item=genre)
+                for genre_id in genre_ids
+                for genre in (self.catalog.get(genre_id),)
+            ]
+        prefix = await self.queries.key_prefix(INDEX, "genre")
+        found = await self.cache.get_many(
+            prefix, genre_ids, Genre, self._mget_from_elastic, CACHE_TTL
+        )
+        return [
+            BatchItem[Genre](id=genre_id, found=genre_id in found, item=found.get(genre_id))
+            for genre_id in genre_ids
+        ]
 
-        genre = Genre(**doc["_source"])
-        await self.redis.set(key, genre.model_dump_json(), ex=CACHE_TTL)
-        return genre
+    async def _mget_from_elastic(self, genre_ids: List[str]) -> Dict[str, Genre]:
+        resp = await self.elastic.mget(
+            index=INDEX, ids=genre_ids, source_includes=source_includes(Genre)
+        )
+        return {doc["_id"]: Genre(**doc["_source"]) for doc in resp["docs"] if doc.get("found")}
 
     async def list(self, *, page_size: int, page_number: int) -> List[Genre]:
-        body = {
-            "query": {"match_all": {}},
-            "sort": [{"name.keyword": {"order": "asc"}}],
-            "from": (page_number - 1) * page_size,
-            "size": page_size,
-        }
-        resp = await self.elastic.search(index=INDEX, body=body)
-        return [Genre(**hit["_source"]) for hit in resp["hits"]["hits"]]
+        if self._local:
+            return self.catalog.page((page_number - 1) * page_size, page_size)
+        body = {**LIST_BODY, "from": (page_number - 1) * page_size, "size": page_size}
+        return await self.queries.get_or_load(INDEX, body, Genre, lambda: self._search(body))
+
+    async def list_page(self, *, page_size: int, cursor: str) -> CursorPage[Genre]:
+        """Список по курсору (PIT + search_after) — для глубокого обхода.
+
+        Из каталога курсор — просто ключ сортировки последнего жанра; курсор,
+        выданный ещё через ES, дочитывается через ES.
+        """
+        if self._local:
+            marker, key = CATALOG_CURSOR, None
+            if cursor != FIRST_PAGE:
+                marker, key = decode_cursor(cursor)
+            if marker == CATALOG_CURSOR:
+                if key is not None and not (
+                    isinstance(key, list) and len(key) == 2 and all(isinstance(k, str) for k in key)
+                ):
+                    raise HTTPException(HTTPStatus.BAD_REQUEST, "invalid cursor")
+                items = self.catalog.after(tuple(key) if key else None, page_size)
+                next_cursor = None
+                if len(items) == page_size:
+                    next_cursor = encode_cursor(CATALOG_CURSOR, [items[-1].name, items[-1].uuid])
+                return CursorPage[Genre](items=items, next_cursor=next_cursor)
+        return await search_after_page(
+            self.elastic, INDEX, LIST_BODY, Genre, page_size=page_size, cursor=cursor
+        )
 
     async def search(self, *, query: str, page_size: int, page_number: int) -> List[Genre]:
+        if self._local:
+            offset = (page_number - 1) * page_size
+            return self.catalog.search(query)[offset:offset + page_size]
         body = {
             "query": {"match": {"name": {"query": query, "fuzziness": "auto"}}},
+            "_source": source_includes(Genre),
             "from": (page_number - 1) * page_size,
             "size": page_size,
         }
+        return await self.queries.get_or_load(INDEX, body, Genre, lambda: self._search(body))
+
+    async def _search(self, body: dict) -> List[Genre]:
         resp = await self.elastic.search(index=INDEX, body=body)
         return [Genre(**hit["_source"]) for hit in resp["hits"]["hits"]]
 
 
-@lru_cache()
-def get_genre_service(
-    redis: Redis = Depends(get_redis),
-    elastic: AsyncElasticsearch = Depends(get_elastic),
-) -> GenreService:
-    return GenreService(redis, elastic)
+async def get_genre_service(request: Request) -> GenreService:
+    # async — чтобы FastAPI не гонял зависимость через threadpool
+    services = getattr(request.app.state, "services", None)
+    if services is None:
+        raise RuntimeError("Services disabled in DOCS_ONLY mode")
+    return services.genre
@@ -0,0 +1,207 @@
+"""
+Каталог жанров в памяти воркера.
+
+Индекс ``genres`` крошечный и почти не меняется, поэтому он целиком
+загружается в память при старте и обслуживается без сетевых походов:
+индекс по id, список в порядке сортировки по имени, готовые JSON‑ответы
+и триграммный индекс для нечёткого поиска (сходство как у ``pg_trgm``).
+
+Актуальность — по версии индекса (``index_version:genres``, см.
+``QueryCache``): фоновая задача ``run`` периодически сверяет версию и
+при её смене перечитывает каталог. Снимок данных заменяется целиком,
+так что читатели никогда не видят частично обновлённый каталог.
+"""
+import asyncio
+import bisect
+import logging
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, NamedTuple, Tuple
+
+from elasticsearch import AsyncElasticsearch
+
+from src.models.genre import Genre
+from src.services.cache import RawPayload, make_etag
+from src.services.projection import source_includes
+from src.services.query_cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+INDEX = "genres"
+# жанров единицы‑сотни; больше — значит, каталог пора держать в ES
+MAX_SIZE = 10_000
+# порог сходства по умолчанию в pg_trgm
+SIMILARITY_THRESHOLD = 0.3
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Триграммы слов строки; слово дополняется пробелами, как в pg_trgm."""
+    grams = set()
+    for word in text.casefold().split():
+        word = f"  {word} "
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return frozenset(grams)
+
+
+def sort_key(genre: Genre) -> Tuple[str, str]:
+    # как сортировка ES по ``name.keyword`` + id в роли тай‑брейкера
+    return genre.name, genre.uuid
+
+
+class _Snapshot(NamedTuple):
+    version: int
+    by_id: Dict[str, Genre]
+    by_name: List[Genre]                  # отсортирован по ``sort_key``
+    keys: List[Tuple[str, str]]           # ``sort_key`` для bisect
+    names: Dict[str, str]                 # casefold имени → имя как в индексе
+    folded: List[str]                     # casefold by_name[i]
+    grams: List[FrozenSet[str]]           # триграммы by_name[i]
+    postings: Dict[str, List[int]]        # триграмма → позиции в by_name
+    raw: Dict[str, RawPayload]
+
+
+def _build(version: int, genres: List[Genre]) -> _Snapshot:
+    by_name = sorted(genres, key=sort_key)
+    grams = [trigrams(genre.name) for genre in by_name]
+    postings: Dict[str, List[int]] = defaultdict(list)
+    for pos, genre_grams in enumerate(grams):
+        for gram in genre_grams:
+            postings[gram].append(pos)
+
+    raw = {}
+    for genre in by_name:
+        payload = genre.model_dump_json(by_alias=True).encode()
+        raw[genre.uuid] = RawPayload(payload, make_etag(payload))
+
+    return _Snapshot(
+        version=version,
+        by_id={genre.uuid: genre for genre in by_name},
+        by_name=by_name,
+        keys=[sort_key(genre) for genre in by_name],
+        names={genre.name.casefold(): genre.name for genre in by_name},
+        folded=[genre.name.casefold() for genre in by_name],
+        grams=grams,
+        postings=dict(postings),
+        raw=raw,
+    )
+
+
+class GenreCatalog:
+    """Все жанры в памяти процесса.
+
+    Пока каталог не загружен (``ready`` ложно), сервисы работают как
+    раньше — через кеш и Elasticsearch.
+    """
+
+    def __init__(self, elastic: AsyncElasticsearch, queries: QueryCache, refresh_interval: float):
+        self.elastic = elastic
+        self.queries = queries
+        self.refresh_interval = refresh_interval
+        self._snapshot: _Snapshot | None = None
+        self.reloads = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def version(self) -> int | None:
+        return self._snapshot.version if self._snapshot is not None else None
+
+    async def load(self) -> None:
+        """Перечитывает каталог из ES и атомарно подменяет снимок."""
+        version = await self.queries.version(INDEX)
+        resp = await self.elastic.search(
+            index=INDEX,
+            body={
+                "query": {"match_all": {}},
+                "_source": source_includes(Genre),
+                "size": MAX_SIZE,
+            },
+        )
+        hits = resp["hits"]["hits"]
+        if len(hits) == MAX_SIZE:
+            logger.warning("genre catalog truncated to %d genres", MAX_SIZE)
+        self._snapshot = _build(version, [Genre(**hit["_source"]) for hit in hits])
+        self.reloads += 1
+        logger.info("genre catalog loaded: %d genres, version %d", len(hits), version)
+
+    async def refresh(self) -> bool:
+        """Загружает каталог, если его ещё нет или сменилась версия индекса.
+
+        Ошибки не пробрасываются: воркер остаётся на прежнем снимке (или
+        без каталога — тогда сервисы ходят в ES) и пробует снова позже.
+        """
+        try:
+            if self.ready and await self.queries.version(INDEX) == self.version:
+                return False
+            await self.load()
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("genre catalog refresh failed")
+            return False
+
+    async def run(self) -> None:
+        """Фоновая задача: перезагрузка каталога при смене версии индекса."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    # --- чтение ---
+    def get(self, genre_id: str) -> Genre | None:
+        return self._snapshot.by_id.get(genre_id)
+
+    def get_raw(self, genre_id: str) -> RawPayload | None:
+        return self._snapshot.raw.get(genre_id)
+
+    def resolve_name(self, name: str) -> str | None:
+        """Имя жанра в написании индекса (без учёта регистра) или None."""
+        return self._snapshot.names.get(name.casefold())
+
+    def page(self, offset: int, limit: int) -> List[Genre]:
+        return self._snapshot.by_name[offset:offset + limit]
+
+    def after(self, key: Tuple[str, str] | None, limit: int) -> List[Genre]:
+        """Страница строго после ``key`` в порядке сортировки (для курсора)."""
+        snapshot = self._snapshot
+        start = 0 if key is None else bisect.bisect_right(snapshot.keys, key)
+        return snapshot.by_name[start:start + limit]
+
+    def search(self, query: str) -> List[Genre]:
+        """Нечёткий поиск по имени.
+
+        Кандидаты — жанры с общими триграммами; сходство — доля общих
+        триграмм (Жаккар). Вхождение запроса подстрокой (в том числе
+        короче триграммы) поднимает жанр выше любых нечётких совпадений.
+        """
+        snapshot = self._snapshot
+        query_grams = trigrams(query)
+        needle = query.casefold().strip()
+
+        scores: Dict[int, float] = defaultdict(float)
+        if needle:
+            # каталог маленький — полный проход по именам дешевле ещё одного индекса
+            for pos, name in enumerate(snapshot.folded):
+                if needle in name:
+                    scores[pos] = 1.0
+
+        common: Dict[int, int] = defaultdict(int)
+        for gram in query_grams:
+            for pos in snapshot.postings.get(gram, ()):
+                common[pos] += 1
+        for pos, shared in common.items():
+            scores[pos] += shared / (len(query_grams) + len(snapshot.grams[pos]) - shared)
+
+        scored = sorted(
+            (-score, pos) for pos, score in scores.items() if score >= SIMILARITY_THRESHOLD
+        )
+        return [snapshot.by_name[pos] for _, pos in scored]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "version": self.version,
+            "size": len(self._snapshot.by_id) if self._snapshot is not None else 0,
+            "reloads": self.reloads,
+        }
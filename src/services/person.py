@@ -1,68 +1,168 @@
-from functools import lru_cache
 from http import HTTPStatus
-from typing import List
+from datetime import datetime
+from typing import AsyncGenerator, Dict, List
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
-from fastapi import Depends, HTTPException
-from redis.asyncio import Redis
+from fastapi import HTTPException, Request
 
-from src.db.elastic import get_elastic
-from src.db.redis import get_redis
-from src.models.person import Person
+from src.core.config import settings
+from src.models.batch import BatchItem
+from src.models.film import ShortFilm
+from src.models.person import Person, PersonFilmCard, PersonFilmography, ShortPerson
+from src.models.page import CursorPage
+from src.services.cache import CacheTTL, EntityCache, RawPayload
+from src.services.cursor import search_after_page
+from src.services.export import UPDATED_FIELD, export_ndjson
+from src.services.film import INDEX as FILM_INDEX
+from src.services.projection import source_includes
+from src.services.query_cache import QueryCache
+from src.services.suggest import suggest
 
-CACHE_TTL = 60 * 5
-INDEX = "persons"
+CACHE_TTL = CacheTTL(settings.person_cache_soft_ttl, settings.person_cache_hard_ttl)
+INDEX = "persons"   # алиас: физический индекс — persons_v<N>
+# фильмография лежит рядом с карточкой: ``person:<поколение>:<uuid>:films``
+FILMS_KEY_SUFFIX = ":films"
+LIST_BODY = {
+    "query": {"match_all": {}},
+    "sort": [{"full_name.keyword": {"order": "asc"}}],
+    "_source": source_includes(Person),
+}
 
 
 class PersonService:
     """Сервис «Персоны».
 
     Даёт подробные данные по актёрам/режиссёрам/сценаристам,
-    включая список фильмов и ролей.
-    Результаты кэшируются: `person:<uuid>`.
+    включая список фильмов и ролей, и фильмографию короткими карточками.
+    Результаты кэшируются (память воркера + Redis): `person:<поколение индекса>:<uuid>`
+    и `person:<поколение индекса>:<uuid>:films`.
     """
-    def __init__(self, redis: Redis, elastic: AsyncElasticsearch):
-        self.redis = redis
+    def __init__(self, cache: EntityCache, queries: QueryCache, elastic: AsyncElasticsearch):
+        self.cache = cache
+        self.queries = queries
         self.elastic = elastic
 
     async def get_by_id(self, person_id: str) -> Person:
-        key = f"person:{person_id}"                                 # ключ единого формата
-        cached = await self.redis.get(key)
-        if cached:
-            return Person.model_validate_json(cached)
+        return await self.cache.get_or_load(
+            await self.queries.key_prefix(INDEX, "person") + person_id,
+            Person,
+            lambda: self._get_from_elastic(person_id),
+            CACHE_TTL,
+        )
 
+    async def get_raw_by_id(self, person_id: str, encoding: str | None = None) -> RawPayload:
+        """JSON персоны в итоговом формате ответа.
+
+        На попадании в кеш байты отдаются как есть, без валидации модели;
+        при ``encoding`` — заранее сжатый вариант из кеша.
+        """
+        return await self.cache.get_or_load_raw(
+            await self.queries.key_prefix(INDEX, "person") + person_id,
+            lambda: self._get_from_elastic(person_id),
+            CACHE_TTL,
+            encoding,
+        )
+
+    async def _get_from_elastic(self, person_id: str) -> Person:
         try:
-            doc = await self.elastic.get(index=INDEX, id=person_id)
+            doc = await self.elastic.get(
+                index=INDEX, id=person_id, source_includes=source_includes(Person)
+            )
         except NotFoundError:
             raise HTTPException(HTTPStatus.NOT_FOUND, "person not found")
+        return Person(**doc["_source"])
+
+    async def get_films_raw(self, person_id: str, encoding: str | None = None) -> RawPayload:
+        """Фильмография персоны — короткие карточки с ролями, готовым JSON.
+
+        Собирается одним ES‑запросом ``ids`` по ``movies`` и кешируется
+        целиком рядом с персоной: страница персоны — один поход в кеш при
+        любом числе фильмов. ETL сбрасывает запись вместе с персоной.
+        """
+        return await self.cache.get_or_load_raw(
+            await self.queries.key_prefix(INDEX, "person") + person_id + FILMS_KEY_SUFFIX,
+            lambda: self._films_from_elastic(person_id),
+            CACHE_TTL,
+            encoding,
+        )
 
-        person = Person(**doc["_source"])
-        await self.redis.set(key, person.model_dump_json(), ex=CACHE_TTL)
-        return person
+    async def _films_from_elastic(self, person_id: str) -> PersonFilmography:
+        person = await self.get_by_id(person_id)
+        if not person.films:
+            return PersonFilmography([])
+        resp = await self.elastic.search(
+            index=FILM_INDEX,
+            body={
+                "query": {"ids": {"values": [film.uuid for film in person.films]}},
+                "_source": source_includes(ShortFilm),
+                "size": len(person.films),
+            },
+        )
+        found = {hit["_id"]: hit["_source"] for hit in resp["hits"]["hits"]}
+        # порядок — как в документе персоны; фильмы, которых уже нет в индексе, пропускаются
+        return PersonFilmography([
+            PersonFilmCard(**found[film.uuid], roles=film.roles)
+            for film in person.films
+            if film.uuid in found
+        ])
+
+    async def get_many(self, person_ids: List[str]) -> List[BatchItem[Person]]:
+        """Пакетное получение по UUID: порядок ответа совпадает с запросом."""
+        prefix = await self.queries.key_prefix(INDEX, "person")
+        found = await self.cache.get_many(
+            prefix, person_ids, Person, self._mget_from_elastic, CACHE_TTL
+        )
+        return [
+            BatchItem[Person](id=person_id, found=person_id in found, item=found.get(person_id))
+            for person_id in person_ids
+        ]
+
+    async def _mget_from_elastic(self, person_ids: List[str]) -> Dict[str, Person]:
+        resp = await self.elastic.mget(
+            index=INDEX, ids=person_ids, source_includes=source_includes(Person)
+        )
+        return {doc["_id"]: Person(**doc["_source"]) for doc in resp["docs"] if doc.get("found")}
 
     async def list(self, *, page_size: int, page_number: int) -> List[Person]:
-        body = {
-            "query": {"match_all": {}},
-            "sort": [{"full_name.keyword": {"order": "asc"}}],
-            "from": (page_number - 1) * page_size,
-            "size": page_size,
-        }
-        resp = await self.elastic.search(index=INDEX, body=body)
-        return [Person(**hit["_source"]) for hit in resp["hits"]["hits"]]
+        body = {**LIST_BODY, "from": (page_number - 1) * page_size, "size": page_size}
+        return await self.queries.get_or_load(INDEX, body, Person, lambda: self._search(body))
+
+    async def list_page(self, *, page_size: int, cursor: str) -> CursorPage[Person]:
+        """Список по курсору (PIT + search_after) — для глубокого обхода."""
+        return await search_after_page(
+            self.elastic, INDEX, LIST_BODY, Person, page_size=page_size, cursor=cursor
+        )
 
     async def search(self, *, query: str, page_size: int, page_number: int) -> List[Person]:
         body = {
             "query": {"match": {"full_name": {"query": query, "fuzziness": "auto"}}},
+            "_source": source_includes(Person),
             "from": (page_number - 1) * page_size,
             "size": page_size,
         }
+        return await self.queries.get_or_load(INDEX, body, Person, lambda: self._search(body))
+
+    async def export(self, *, updated_since: datetime | None) -> AsyncGenerator[bytes, None]:
+        """Все персоны (плюс ``modified``) в NDJSON."""
+        return await export_ndjson(
+            self.elastic, INDEX, (*source_includes(Person), UPDATED_FIELD),
+            updated_since=updated_since,
+        )
+
+    async def suggest(self, *, prefix: str, size: int) -> List[ShortPerson]:
+        """Подсказки по началу имени — для поиска при наборе."""
+        return await suggest(
+            self.queries, self.elastic, INDEX, "full_name", ShortPerson, prefix, size
+        )
+
+    async def _search(self, body: dict) -> List[Person]:
         resp = await self.elastic.search(index=INDEX, body=body)
         return [Person(**hit["_source"]) for hit in resp["hits"]["hits"]]
 
 
-@lru_cache()
-def get_person_service(
-    redis: Redis = Depends(get_redis),
-    elastic: AsyncElasticsearch = Depends(get_elastic),
-) -> PersonService:
-    return PersonService(redis, elastic)
+async def get_person_service(request: Request) -> PersonService:
+    # async — чтобы FastAPI не гонял зависимость через threadpool
+    services = getattr(request.app.state, "services", None)
+    if services is None:
+        raise RuntimeError("Services disabled in DOCS_ONLY mode")
+    return services.person
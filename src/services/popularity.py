@@ -0,0 +1,134 @@
+"""
+Учёт популярности: самые запрашиваемые сущности и запросы list/search.
+
+Обращение к кешу с вероятностью ``sample_rate`` попадает в счётчик в
+памяти воркера — на запрос ни одного сетевого похода. Фоновая задача
+``run`` раз в ``flush_interval`` переносит накопленное в Redis одним
+пайплайном ``ZINCRBY``:
+
+* ``popular:film`` / ``popular:person`` / ``popular:genre`` — uuid сущностей;
+* ``popular:query`` — запросы list/search: JSON ``[index, model, ttl, body]``,
+  по которому прогрев повторит запрос.
+
+Раз в ``decay_interval`` счёты делятся пополам (``ZUNIONSTORE`` с весом
+0.5), а всё дальше ``max_size`` обрезается: наверху то, что популярно
+сейчас, а не неделю назад. Делает это один воркер — тот, кто первым
+поставил ``popular:decay``.
+
+Топ читает прогрев кеша (``src.services.warmup``); его собственные
+обращения (внутри ``not_recorded``) не учитываются — иначе каждый деплой
+накручивал бы текущий топ и вытеснял из него реальный трафик. Ключи ``popular:*`` —
+без TTL и небольшие: переживают деплой, а при включённом сохранении
+Redis на диск — и его перезапуск.
+"""
+import asyncio
+import logging
+import random
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Type
+
+import orjson
+from pydantic import BaseModel
+from redis.asyncio import Redis  # pylint: disable=no-name-in-module,import-error
+
+logger = logging.getLogger(__name__)
+
+ENTITIES = ("film", "person", "genre")
+QUERY = "query"
+KEY = "popular:{kind}"
+DECAY_KEY = "popular:decay"
+
+# False — обращения текущей задачи (и порождённых ею) не учитываются
+_recording: ContextVar[bool] = ContextVar("popularity_recording", default=True)
+
+
+@contextmanager
+def not_recorded() -> Iterator[None]:
+    """Обращения внутри блока не попадают в счётчики (прогрев кеша)."""
+    token = _recording.set(False)
+    try:
+        yield
+    finally:
+        _recording.reset(token)
+
+
+class Popularity:
+    """Сэмплирующие счётчики обращений с периодическим сбросом в Redis."""
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        sample_rate: float,
+        flush_interval: float,
+        decay_interval: float,
+        max_size: int,
+    ):
+        self.redis = redis
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.decay_interval = decay_interval
+        self.max_size = max_size
+        self._counts: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, kind: str, member: str) -> None:
+        if not _recording.get():
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self._counts[kind][member] += 1
+
+    def record_key(self, key: str) -> None:
+        """Обращение к ключу сущности ``<entity>:<поколение>:<uuid>``.
+
+        Прочие ключи (``result:``, ``person:…:films``) не учитываются.
+        """
+        entity, _, rest = key.partition(":")
+        if entity in ENTITIES:
+            _, sep, id_ = rest.partition(":")
+            if sep and ":" not in id_:
+                self.record(entity, id_)
+
+    def record_query(self, index: str, model: Type[BaseModel], ttl: int | None, body: dict) -> None:
+        member = orjson.dumps([index, model.__name__, ttl, body], option=orjson.OPT_SORT_KEYS)
+        self.record(QUERY, member.decode())
+
+    async def top(self, kind: str, limit: int) -> List[str]:
+        members = await self.redis.zrevrange(KEY.format(kind=kind), 0, limit - 1)
+        return [member.decode() for member in members]
+
+    async def flush(self) -> None:
+        counts, self._counts = self._counts, defaultdict(Counter)
+        if not counts:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for kind, counter in counts.items():
+                # за интервал в хвосте — единичные обращения, их не переносим
+                for member, count in counter.most_common(self.max_size):
+                    pipe.zincrby(KEY.format(kind=kind), count, member)
+            await pipe.execute()
+
+    async def decay(self) -> None:
+        if not await self.redis.set(DECAY_KEY, 1, nx=True, ex=int(self.decay_interval)):
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for kind in (*ENTITIES, QUERY):
+                key = KEY.format(kind=kind)
+                pipe.zunionstore(key, {key: 0.5})
+                pipe.zremrangebyrank(key, 0, -self.max_size - 1)
+            await pipe.execute()
+
+    async def run(self) -> None:
+        """Фоновая задача воркера: перенос счётчиков в Redis и затухание."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                await self.decay()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pylint: disable=broad-except
+                # счётчики интервала теряются — это всего лишь статистика
+                logger.exception("popularity flush failed")
@@ -0,0 +1,41 @@
+"""
+Проекция ``_source`` по pydantic‑модели ответа.
+
+Список полей строится из самой модели (с учётом alias и вложенных
+моделей), поэтому запрос к ES не может разойтись с тем, что реально
+попадает в ответ.
+"""
+import typing
+from functools import lru_cache
+from typing import Tuple, Type
+
+from pydantic import BaseModel
+
+
+def _nested_model(annotation) -> Type[BaseModel] | None:
+    """Вложенная модель из ``Model``, ``Optional[Model]``, ``List[Model]``."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in typing.get_args(annotation):
+        nested = _nested_model(arg)
+        if nested is not None:
+            return nested
+    return None
+
+
+@lru_cache()
+def source_includes(model: Type[BaseModel], prefix: str = "") -> Tuple[str, ...]:
+    """Пути полей документа ES, нужные для построения ``model``.
+
+    >>> source_includes(Person)
+    ('id', 'full_name', 'films.uuid', 'films.roles')
+    """
+    fields = []
+    for name, info in model.model_fields.items():
+        path = prefix + (info.alias or name)
+        nested = _nested_model(info.annotation)
+        if nested is None:
+            fields.append(path)
+        else:
+            fields.extend(source_includes(nested, path + "."))
+    return tuple(fields)
@@ -0,0 +1,186 @@
+"""
+Кеш результатов списков и поиска (list/search).
+
+Ключ результата — хеш нормализованного тела ES‑запроса. Сам результат
+хранится компактно: список id (``query:<index>:v<ver>:<hash>``), а
+карточки лежат отдельными ключами (``card:<index>:v<ver>:<model>:<id>``)
+и переиспользуются разными запросами. Поэтому карточки живут не по TTL
+запроса, а по самому долгому из TTL запросов (``card_ttl``): иначе
+короткий TTL подсказок обрезал бы карточки, общие со списками, и те
+перестраивались бы целиком.
+
+Каждый индекс имеет номер версии (``index_version:<index>``), который
+входит во все ключи. При перезаливке индекса версия увеличивается, и
+старые записи просто перестают читаться и истекают по TTL — без SCAN.
+
+Ключи сущностей (``film:<gen>:<uuid>`` и т. п.) несут поколение индекса
+(``index_generation:<index>``) — номер физического индекса за алиасом.
+Переключение алиаса на новый индекс меняет поколение, и все записи
+старого индекса разом перестают читаться.
+
+Ответы, которые не сводятся к списку карточек (например, с агрегациями),
+кешируются целиком под ``result:<index>:v<ver>:<hash>``.
+"""
+import hashlib
+from typing import Awaitable, Callable, List, Type
+
+import orjson
+
+from src.core.metrics import cache_lookup, stage
+from src.services.cache import CacheTTL, EntityCache, M
+
+VERSION_KEY = "index_version:{index}"
+GENERATION_KEY = "index_generation:{index}"
+
+
+def query_hash(body: dict) -> str:
+    """Хеш тела запроса, не зависящий от порядка ключей."""
+    return hashlib.sha1(orjson.dumps(body, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class QueryCache:
+    """Кеш результатов list/search поверх ``EntityCache``.
+
+    Использует тот же локальный уровень, канал инвалидации и single-flight,
+    что и кеш сущностей.
+    """
+
+    def __init__(self, cache: EntityCache, ttl: int, version_ttl: float):
+        self.cache = cache
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        # самый долгий TTL запросов, виденный воркером; не короче ttl
+        self.card_ttl = ttl
+
+    async def version(self, index: str) -> int:
+        """Текущая версия индекса; в памяти воркера держится ``version_ttl``."""
+        key = VERSION_KEY.format(index=index)
+        version = self.cache.local.get(key)
+        if version is None:
+            version = int(await self.cache.redis.get(key) or 0)
+            self.cache.local.set(key, version, self.version_ttl)
+        return version
+
+    async def bump_version(self, index: str) -> int:
+        """Сбрасывает все закешированные результаты индекса."""
+        key = VERSION_KEY.format(index=index)
+        version = await self.cache.redis.incr(key)
+        await self.cache.redis.publish(self.cache.channel, key)
+        self.cache.local.delete(key)
+        return version
+
+    async def generation(self, index: str) -> str:
+        """Поколение индекса (номер физического индекса за алиасом)."""
+        key = GENERATION_KEY.format(index=index)
+        generation = self.cache.local.get(key)
+        if generation is None:
+            raw = await self.cache.redis.get(key)
+            generation = raw.decode() if raw is not None else "0"
+            self.cache.local.set(key, generation, self.version_ttl)
+        return generation
+
+    async def set_generation(self, index: str, generation: str) -> None:
+        """Переключает ключи сущностей индекса на новое поколение."""
+        key = GENERATION_KEY.format(index=index)
+        await self.cache.redis.set(key, generation)
+        await self.cache.redis.publish(self.cache.channel, key)
+        self.cache.local.delete(key)
+
+    async def key_prefix(self, index: str, entity: str) -> str:
+        """Префикс ключей сущностей: ``<entity>:<поколение>:``."""
+        return f"{entity}:{await self.generation(index)}:"
+
+    async def get_or_load(
+        self,
+        index: str,
+        body: dict,
+        model: Type[M],
+        loader: Callable[[], Awaitable[List[M]]],
+        ttl: int | None = None,
+    ) -> List[M]:
+        """Результат запроса ``body``; ``ttl`` переопределяет TTL по умолчанию."""
+        if self.cache.popularity is not None:
+            self.cache.popularity.record_query(index, model, ttl, body)
+        version = await self.version(index)
+        key = f"query:{index}:v{version}:{query_hash(body)}"
+        card_prefix = f"card:{index}:v{version}:{model.__name__.lower()}:"
+
+        items = self.cache.local.get(key)
+        if items is not None:
+            cache_lookup(key, "local")
+            return items
+        items = await self._get(key, card_prefix, model)
+        if items is not None:
+            cache_lookup(key, "redis")
+            return items
+        cache_lookup(key, "miss")
+        return await self.cache.flights.do(
+            key, lambda: self._fill(key, card_prefix, model, loader, ttl or self.ttl)
+        )
+
+    async def get_or_load_model(
+        self,
+        index: str,
+        body: dict,
+        model: Type[M],
+        loader: Callable[[], Awaitable[M]],
+    ) -> M:
+        """Результат запроса целиком одной моделью — например, вместе с
+        агрегациями, которые не раскладываются на карточки.
+
+        Хранится обычной записью кеша сущностей (``result:<index>:v<ver>:<hash>``).
+        """
+        version = await self.version(index)
+        key = f"result:{index}:v{version}:{query_hash(body)}"
+        return await self.cache.get_or_load(key, model, loader, CacheTTL(self.ttl, self.ttl))
+
+    async def _get(self, key: str, card_prefix: str, model: Type[M]) -> List[M] | None:
+        redis = self.cache.redis
+        ids = await redis.get(key)
+        if ids is None:
+            return None
+
+        ids = orjson.loads(ids)
+        if not ids:
+            items = []
+        else:
+            cards = await redis.mget([card_prefix + id_ for id_ in ids])
+            if any(card is None for card in cards):
+                return None  # часть карточек истекла — перестраиваем целиком
+            with stage("validate", model):
+                items = [model.model_validate_json(card) for card in cards]
+
+        self.cache.local.set(key, items)
+        return items
+
+    async def _fill(
+        self,
+        key: str,
+        card_prefix: str,
+        model: Type[M],
+        loader: Callable[[], Awaitable[List[M]]],
+        ttl: int,
+    ) -> List[M]:
+        items = await loader()
+        self.card_ttl = max(self.card_ttl, ttl)
+        async with self.cache.redis.pipeline(transaction=False) as pipe:
+            with stage("serialize", model):
+                for item in items:
+                    pipe.set(
+                        card_prefix + item.uuid,
+                        item.model_dump_json(by_alias=True),
+                        ex=self.card_ttl,
+                    )
+            pipe.set(key, orjson.dumps([item.uuid for item in items]), ex=ttl)
+            await pipe.execute()
+        self.cache.local.set(key, items)
+        return items
+
+
+query_cache: QueryCache | None = None
+
+
+async def get_query_cache() -> QueryCache:
+    if query_cache is None:
+        raise RuntimeError("Cache disabled in DOCS_ONLY mode")
+    return query_cache
@@ -0,0 +1,167 @@
+"""
+Материализованные рейтинги фильмов в Redis.
+
+Главная страница каждого жанра — ``/films/?sort=-imdb_rating&genre=X``.
+Вместо отсортированного ES‑запроса на каждый промах кеша фоновый
+материализатор (``build``, его вызывает ETL после прохода с изменениями
+в ``movies`` и переиндексация) держит в Redis:
+
+* ``ranking:movies:<поле>:all`` и ``ranking:movies:<поле>:genre:<жанр>`` —
+  sorted set'ы ``uuid → значение поля``, не глубже ``depth`` фильмов;
+* ``ranking:movies:cards`` — хеш ``uuid → JSON короткой карточки``;
+* ``ranking:movies:keys`` — множество ключей рейтингов (чтобы при
+  перестроении удалить рейтинги исчезнувших жанров).
+
+Страница отдаётся двумя походами в Redis (``ZCARD`` + ``ZREVRANGE``, затем
+``HMGET`` карточек) без ES. Перестроение пишет всё во временные ключи и
+одной транзакцией ``MULTI``/``RENAME`` подменяет рабочие: читатель видит
+либо старые рейтинги целиком, либо новые.
+
+В рейтинг попадают только фильмы со значением поля. Страница, которая
+выходит за конец рейтинга (хвост без рейтинга, глубже ``depth``), а также
+сортировки и жанры без рейтинга обслуживаются ES, как раньше. Порядок
+фильмов с одинаковым значением — по uuid (в ES он не определён вовсе).
+"""
+import logging
+import uuid
+from typing import Dict, List
+
+from elasticsearch import AsyncElasticsearch
+
+from src.core.metrics import cache_lookup, stage
+from src.models.film import ShortFilm
+from src.services.cache import EntityCache
+from src.services.projection import source_includes
+
+logger = logging.getLogger(__name__)
+
+INDEX = "movies"
+# сортировка API → поле рейтинга; только по убыванию: у ES фильмы без
+# значения идут в конце при любом направлении, а в sorted set их нет
+SORTS = {"-imdb_rating": "imdb_rating"}
+# жанров сотня с небольшим
+MAX_GENRES = 500
+# недостроенные временные ключи (упавший материализатор) истекают сами
+TMP_TTL = 60 * 60
+
+CARDS_KEY = f"ranking:{INDEX}:cards"
+KEYS_KEY = f"ranking:{INDEX}:keys"
+
+
+def ranking_key(field: str, genre: str | None) -> str:
+    suffix = "all" if genre is None else f"genre:{genre}"
+    return f"ranking:{INDEX}:{field}:{suffix}"
+
+
+class Rankings:
+    """Рейтинги «топ фильмов» по жанрам: чтение и перестроение.
+
+    Готовые страницы держатся в локальном уровне ``EntityCache`` — его TTL
+    ограничивает, насколько воркер отстаёт от перестроения.
+    """
+
+    def __init__(self, cache: EntityCache, elastic: AsyncElasticsearch, depth: int):
+        self.cache = cache
+        self.elastic = elastic
+        self.depth = depth
+
+    @staticmethod
+    def supports(sort: str | None) -> bool:
+        return sort in SORTS
+
+    async def page(self, sort: str, genre: str | None, offset: int, limit: int) -> List[ShortFilm] | None:
+        """Страница рейтинга или None, если её нужно брать из ES."""
+        key = ranking_key(SORTS[sort], genre)
+        local_key = f"{key}:{offset}:{limit}"
+        items = self.cache.local.get(local_key)
+        if items is not None:
+            cache_lookup(local_key, "local")
+            return items
+
+        redis = self.cache.redis
+        stop = offset + limit - 1
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zcard(key)
+            pipe.zrevrange(key, offset, stop)
+            size, ids = await pipe.execute()
+        if stop >= size:
+            # хвост без рейтинга, глубже depth или рейтинга нет совсем
+            cache_lookup(local_key, "miss")
+            return None
+        cards = await redis.hmget(CARDS_KEY, ids)
+        if any(card is None for card in cards):
+            # между ZREVRANGE и HMGET рейтинги перестроились
+            cache_lookup(local_key, "miss")
+            return None
+        with stage("validate", ShortFilm):
+            items = [ShortFilm.model_validate_json(card) for card in cards]
+        cache_lookup(local_key, "redis")
+        self.cache.local.set(local_key, items)
+        return items
+
+    async def build(self) -> Dict[str, int]:
+        """Перестраивает все рейтинги; возвращает их размеры по ключам."""
+        redis = self.cache.redis
+        token = uuid.uuid4().hex
+        sizes: Dict[str, int] = {}
+        cards: Dict[str, str] = {}
+
+        for field in set(SORTS.values()):
+            for genre in [None, *await self._genres()]:
+                films = await self._top(field, genre)
+                if not films:
+                    continue
+                key = ranking_key(field, genre)
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.zadd(f"{key}:tmp:{token}", {
+                        film.uuid: getattr(film, field) for film in films
+                    })
+                    pipe.expire(f"{key}:tmp:{token}", TMP_TTL)
+                    await pipe.execute()
+                with stage("serialize", ShortFilm):
+                    for film in films:
+                        cards[film.uuid] = film.model_dump_json(by_alias=True)
+                sizes[key] = len(films)
+
+        if cards:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hset(f"{CARDS_KEY}:tmp:{token}", mapping=cards)
+                pipe.sadd(f"{KEYS_KEY}:tmp:{token}", *sizes)
+                for key in (CARDS_KEY, KEYS_KEY):
+                    pipe.expire(f"{key}:tmp:{token}", TMP_TTL)
+                await pipe.execute()
+
+        old = {key.decode() for key in await redis.smembers(KEYS_KEY)}
+        async with redis.pipeline(transaction=True) as pipe:
+            for key in (*sizes, CARDS_KEY, KEYS_KEY) if cards else ():
+                pipe.rename(f"{key}:tmp:{token}", key)
+            stale = old - sizes.keys()
+            if stale:
+                pipe.delete(*stale)
+            if not cards:
+                pipe.delete(CARDS_KEY, KEYS_KEY)
+            await pipe.execute()
+        logger.info("rankings rebuilt: %d sets, %d cards", len(sizes), len(cards))
+        return sizes
+
+    async def _genres(self) -> List[str]:
+        resp = await self.elastic.search(
+            index=INDEX,
+            body={"size": 0, "aggs": {"genres": {"terms": {"field": "genres", "size": MAX_GENRES}}}},
+        )
+        return [bucket["key"] for bucket in resp["aggregations"]["genres"]["buckets"]]
+
+    async def _top(self, field: str, genre: str | None) -> List[ShortFilm]:
+        filters: List[dict] = [{"exists": {"field": field}}]
+        if genre is not None:
+            filters.append({"term": {"genres": genre}})
+        resp = await self.elastic.search(
+            index=INDEX,
+            body={
+                "query": {"bool": {"filter": filters}},
+                "sort": [{field: {"order": "desc"}}],
+                "_source": source_includes(ShortFilm),
+                "size": self.depth,
+            },
+        )
+        return [ShortFilm(**hit["_source"]) for hit in resp["hits"]["hits"]]
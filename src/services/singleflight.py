@@ -0,0 +1,54 @@
+"""
+Single-flight: объединение одновременных запросов за одним и тем же ключом.
+
+Пока загрузка ключа «в полёте», остальные корутины воркера не идут в
+источник сами, а ждут результат (или исключение) первой.
+"""
+import asyncio
+from functools import partial
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Дедупликация конкурентных загрузок внутри одного event loop.
+
+    Загрузка запускается отдельной задачей, поэтому отмена запроса,
+    который её инициировал, не обрывает ожидание остальных.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(partial(self._forget, key))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # помечаем исключение полученным, даже если ждать некому
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
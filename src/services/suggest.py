@@ -0,0 +1,79 @@
+"""
+Подсказки при наборе (typeahead) для фильмов и персон.
+
+Запрос — ``multi_match`` типа ``bool_prefix`` по подполю ``<поле>.suggest``
+(``search_as_you_type``, см. ``src.etl.indices``) и его шинглам
+``._2gram``/``._3gram``: все слова, кроме последнего, ищутся целиком,
+последнее — как префикс. Подполе анализируется без стемминга, поэтому
+недописанное слово находит свои формы, а префикс ищется по готовым
+edge n-gram'ам одним термом, без перебора словаря.
+
+Префикс нормализуется (регистр, пробелы) и обрезается до
+``suggest_max_prefix``, поэтому «Star », «star» и «STAR» делят одну
+запись кеша результатов (``QueryCache`` с коротким TTL). На ответ есть
+бюджет ``suggest_timeout``: если ES не уложился, клиент получает пустую
+выдачу, а загрузка продолжается в фоне (single-flight) и заполнит кеш
+для следующего нажатия клавиши.
+"""
+import asyncio
+import logging
+from typing import List, Type
+
+from elasticsearch import AsyncElasticsearch
+
+from src.core.config import settings
+from src.services.cache import M
+from src.services.projection import source_includes
+from src.services.query_cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prefix(prefix: str) -> str:
+    return " ".join(prefix.casefold().split())[: settings.suggest_max_prefix]
+
+
+def suggest_body(field: str, prefix: str, model: Type[M], size: int) -> dict:
+    return {
+        "query": {
+            "multi_match": {
+                "query": prefix,
+                "type": "bool_prefix",
+                "fields": [f"{field}.suggest", f"{field}.suggest._2gram", f"{field}.suggest._3gram"],
+            }
+        },
+        "_source": source_includes(model),
+        "size": size,
+        "track_total_hits": False,
+        # ES сам прерывает поиск по шардам, не дожидаясь нашего таймаута
+        "timeout": f"{int(settings.suggest_timeout * 1000)}ms",
+    }
+
+
+async def suggest(
+    queries: QueryCache,
+    elastic: AsyncElasticsearch,
+    index: str,
+    field: str,
+    model: Type[M],
+    prefix: str,
+    size: int,
+) -> List[M]:
+    prefix = normalize_prefix(prefix)
+    if not prefix:
+        return []
+
+    body = suggest_body(field, prefix, model, size)
+
+    async def load() -> List[M]:
+        resp = await elastic.search(index=index, body=body)
+        return [model(**hit["_source"]) for hit in resp["hits"]["hits"]]
+
+    try:
+        return await asyncio.wait_for(
+            queries.get_or_load(index, body, model, load, settings.suggest_cache_ttl),
+            settings.suggest_timeout,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("suggest %s %r exceeded %.3fs budget", index, prefix, settings.suggest_timeout)
+        return []
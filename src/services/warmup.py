@@ -0,0 +1,223 @@
+"""
+Прогрев кеша самым популярным (см. ``src.services.popularity``).
+
+После деплоя локальные уровни пусты, а после перезапуска Redis пуст и он —
+первые минуты горячие карточки идут в ES, и p99 плохой. Прогрев берёт
+топ сущностей по типам и топ запросов list/search и прогоняет их через
+обычные пути сервисов: сущности — ``get_many`` пачками по ``batch_size``
+(один ``MGET`` в Redis и один ES ``mget`` на промахи), запросы —
+``QueryCache.get_or_load``. Одновременно идёт не больше ``concurrency``
+пачек — прогрев не должен сам перегрузить ES.
+
+В API прогрев запускается фоном из ``lifespan`` в каждом воркере, но
+прогревает только один: кто первым взял блокировку ``warmup:lock``, тот
+и заполняет Redis. Остальные ждут, пока блокировка освободится, и
+объявляют себя готовыми — Redis уже тёплый, а свой локальный уровень
+(секунды TTL) заполнять заранее нет смысла. Пока прогрев идёт,
+``/api/v1/health/ready`` отвечает 503 с прогрессом. Обращения прогрева в
+учёт популярности не попадают. Отдельно, например после перезапуска Redis::
+
+    python -m src.services.warmup
+"""
+import argparse
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Awaitable, Callable, List, Type
+
+import orjson
+from elasticsearch import AsyncElasticsearch
+
+from src.core.config import settings
+from src.db import elastic, redis
+from src.etl.state import RunLock
+from src.models.film import ShortFilm
+from src.models.genre import Genre
+from src.models.person import Person, ShortPerson
+from src.services.cache import EntityCache, LocalCache, M
+from src.services.container import ServiceContainer, create_services
+from src.services.popularity import ENTITIES, QUERY, Popularity, not_recorded
+from src.services.query_cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "warmup:lock"
+
+# модели карточек, которыми QueryCache хранит результаты list/search
+CARD_MODELS = {model.__name__: model for model in (ShortFilm, Person, ShortPerson, Genre)}
+
+
+class WarmUp:
+    """Один прогон прогрева с прогрессом для проверки готовности."""
+
+    def __init__(
+        self,
+        services: ServiceContainer,
+        queries: QueryCache,
+        elastic: AsyncElasticsearch,
+        popularity: Popularity,
+        *,
+        top_entities: int,
+        top_queries: int,
+        batch_size: int,
+        concurrency: int,
+    ):
+        self.services = services
+        self.queries = queries
+        self.elastic = elastic
+        self.popularity = popularity
+        self.top_entities = top_entities
+        self.top_queries = top_queries
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        # pending → running (leader) | waiting (follower) → done | failed | timeout
+        self.state = "pending"
+        # leader заполняет Redis, follower ждёт его
+        self.role: str | None = None
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.started_at: float | None = None
+        self.duration: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        # неудачный или долгий прогрев не держит воркер вне балансировки
+        return self.state in ("done", "failed", "timeout")
+
+    async def run(self, timeout: float) -> None:
+        self.state = "running"
+        self.started_at = time.monotonic()
+        try:
+            await asyncio.wait_for(self._run(timeout), timeout)
+            self.state = "done"
+        except asyncio.TimeoutError:
+            self.state = "timeout"
+            logger.warning("cache warm-up timed out after %.0fs: %d/%d", timeout, self.done, self.total)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # pylint: disable=broad-except
+            self.state = "failed"
+            logger.exception("cache warm-up failed")
+        finally:
+            self.duration = time.monotonic() - self.started_at
+        logger.info(
+            "cache warm-up %s as %s in %.1fs: %d/%d (%d failed)",
+            self.state, self.role, self.duration, self.done, self.total, self.failed,
+        )
+
+    async def _run(self, timeout: float) -> None:
+        # блокировка истекает сама, если ведущий воркер умер
+        lock = RunLock(self.queries.cache.redis, LOCK_KEY, timeout)
+        if await lock.acquire():
+            self.role = "leader"
+            try:
+                with not_recorded():
+                    await self._warm()
+            finally:
+                await lock.release()
+            return
+        self.role = "follower"
+        self.state = "waiting"
+        while await self.queries.cache.redis.exists(LOCK_KEY):
+            await asyncio.sleep(self.queries.cache.lock_poll_interval)
+
+    async def _warm(self) -> None:
+        jobs: List[tuple[int, Callable[[], Awaitable]]] = []
+        get_many = {
+            "film": self.services.film.get_many,
+            "person": self.services.person.get_many,
+            "genre": self.services.genre.get_many,
+        }
+        for entity in ENTITIES:
+            ids = await self.popularity.top(entity, self.top_entities)
+            for start in range(0, len(ids), self.batch_size):
+                batch = ids[start:start + self.batch_size]
+                jobs.append((len(batch), partial(get_many[entity], batch)))
+        for member in await self.popularity.top(QUERY, self.top_queries):
+            index, model_name, ttl, body = orjson.loads(member)
+            model = CARD_MODELS.get(model_name)
+            if model is not None:
+                loader = partial(self._search, index, body, model)
+                jobs.append((1, partial(self.queries.get_or_load, index, body, model, loader, ttl)))
+        self.total = sum(size for size, _ in jobs)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_job(size: int, job: Callable[[], Awaitable]) -> None:
+            async with semaphore:
+                try:
+                    await job()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:  # pylint: disable=broad-except
+                    # промах прогрева — не повод бросать остальное
+                    self.failed += size
+                    logger.warning("warm-up batch failed: %r", exc)
+                finally:
+                    self.done += size
+
+        await asyncio.gather(*(run_job(size, job) for size, job in jobs))
+
+    async def _search(self, index: str, body: dict, model: Type[M]) -> List[M]:
+        resp = await self.elastic.search(index=index, body=body)
+        return [model(**hit["_source"]) for hit in resp["hits"]["hits"]]
+
+    def progress(self) -> dict:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "role": self.role,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "duration": self.duration,
+        }
+
+
+async def main(timeout: float) -> None:
+    await redis.open_redis()
+    await elastic.open_elastic()
+    try:
+        # локальный уровень CLI никому не нужен — заполняется только Redis
+        cache = EntityCache(
+            redis.redis,
+            LocalCache(0, 0),
+            settings.cache_invalidation_channel,
+            compress_min_size=(
+                settings.compression_min_size if settings.compression_enabled else None
+            ),
+            stale_if_error=settings.cache_stale_if_error,
+        )
+        queries = QueryCache(cache, settings.query_cache_ttl, settings.index_version_ttl)
+        popularity = Popularity(
+            redis.redis,
+            sample_rate=settings.popularity_sample_rate,
+            flush_interval=settings.popularity_flush_interval,
+            decay_interval=settings.popularity_decay_interval,
+            max_size=settings.popularity_max_size,
+        )
+        warmup = WarmUp(
+            create_services(cache, queries, elastic.es),
+            queries,
+            elastic.es,
+            popularity,
+            top_entities=settings.warmup_top_entities,
+            top_queries=settings.warmup_top_queries,
+            batch_size=settings.warmup_batch_size,
+            concurrency=settings.warmup_concurrency,
+        )
+        await warmup.run(timeout)
+    finally:
+        await elastic.close_elastic()
+        await redis.close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Прогрев кеша самым популярным")
+    parser.add_argument(
+        "--timeout", type=float, default=settings.warmup_timeout, help="предел времени, секунды"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.timeout))
@@ -0,0 +1,37 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class Clock:
+    """Подменяемые часы модуля: ``monotonic``/``time`` двигает тест."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def patch_clock(monkeypatch, module, clock: Clock) -> None:
+    """Подменяет ``time`` в модуле, не трогая часы event loop."""
+    monkeypatch.setattr(module, "time", SimpleNamespace(
+        monotonic=clock.monotonic, time=clock.time, perf_counter=time.perf_counter,
+    ))
@@ -0,0 +1,219 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+
+from benchmarks import fakes
+from src.core.overload import Overloaded
+from src.services import cache
+from src.services.cache import CacheTTL, EntityCache, LocalCache
+from tests.conftest import patch_clock
+
+pytestmark = pytest.mark.anyio
+
+KEY = "film:0:42"
+TTL = CacheTTL(60, 120)
+
+
+class Item(BaseModel):
+    uuid: str
+    title: str
+
+
+class Loader:
+    """Загрузчик с подсчётом вызовов; ``gate`` держит загрузку до сигнала."""
+
+    def __init__(self, title: str = "fresh", exc: Exception | None = None):
+        self.title = title
+        self.exc = exc
+        self.calls = 0
+        self.gate: asyncio.Event | None = None
+
+    async def __call__(self) -> Item:
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.exc is not None:
+            raise self.exc
+        return Item(uuid="42", title=self.title)
+
+
+@pytest.fixture
+def redis():
+    return fakes.fake_redis()
+
+
+def worker(redis, **kwargs) -> EntityCache:
+    """Кеш одного воркера: свой локальный уровень, общий Redis."""
+    return EntityCache(redis, LocalCache(100, 60), "invalidate", **kwargs)
+
+
+# --- блокировка между воркерами ---
+
+async def test_lock_waiter_takes_value_loaded_by_holder(redis):
+    holder = worker(redis, lock_ttl=2.0, lock_poll_interval=0.01)
+    waiter = worker(redis, lock_ttl=2.0, lock_poll_interval=0.01)
+    slow, spare = Loader("from holder"), Loader("from waiter")
+    slow.gate = asyncio.Event()
+
+    first = asyncio.create_task(holder.get_or_load(KEY, Item, slow, TTL))
+    await asyncio.sleep(0.02)  # блокировка взята, загрузка висит
+    second = asyncio.create_task(waiter.get_or_load(KEY, Item, spare, TTL))
+    await asyncio.sleep(0.03)
+    slow.gate.set()
+
+    assert (await first).title == "from holder"
+    assert (await second).title == "from holder"
+    assert (slow.calls, spare.calls) == (1, 0)
+    assert waiter.lock_waits == 1
+    assert not await redis.exists(f"lock:{KEY}")
+
+
+async def test_lock_waiter_loads_itself_when_holder_gives_up(redis):
+    waiter = worker(redis, lock_ttl=0.5, lock_poll_interval=0.01)
+    await redis.set(f"lock:{KEY}", "someone", px=100)
+    loader = Loader()
+
+    assert (await waiter.get_or_load(KEY, Item, loader, TTL)).title == "fresh"
+    assert loader.calls == 1
+
+
+async def test_lock_waiter_treats_legacy_entry_as_miss(redis):
+    waiter = worker(redis, lock_ttl=0.5, lock_poll_interval=0.01)
+    await redis.set(f"lock:{KEY}", "someone", px=50)
+    loader = Loader()
+
+    async def legacy_write():
+        await asyncio.sleep(0.02)
+        await redis.set(KEY, b'{"uuid": "42", "title": "legacy"}')
+
+    _, item = await asyncio.gather(legacy_write(), waiter.get_or_load(KEY, Item, loader, TTL))
+    assert item.title == "fresh"
+
+
+async def test_single_flight_within_worker(redis):
+    entities = worker(redis)
+    loader = Loader()
+    loader.gate = asyncio.Event()
+    tasks = [asyncio.create_task(entities.get_or_load(KEY, Item, loader, TTL)) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    loader.gate.set()
+    assert {item.title for item in await asyncio.gather(*tasks)} == {"fresh"}
+    assert loader.calls == 1
+
+
+# --- мягкий срок и XFetch ---
+
+async def test_xfetch_refreshes_before_soft_expiry(redis, monkeypatch):
+    entities = worker(redis)
+    await entities.set(KEY, Item(uuid="42", title="old"), TTL, delta=30.0)
+    loader = Loader("new")
+
+    # ln(1 - 0.999999) ≈ -13.8: при загрузке в 30 с — на ~400 с раньше срока
+    monkeypatch.setattr(cache, "random", SimpleNamespace(random=lambda: 0.999999))
+    item = await entities.get_or_load(KEY, Item, loader, TTL)
+    assert item.title == "old"  # устаревшее отдаётся сразу
+    await asyncio.gather(*entities._refreshes)  # pylint: disable=protected-access
+    assert loader.calls == 1
+    assert entities.stale_hits == 1
+    assert (await entities.get(KEY, Item)).title == "new"
+
+
+async def test_xfetch_keeps_entry_with_fast_loads(redis, monkeypatch):
+    entities = worker(redis)
+    await entities.set(KEY, Item(uuid="42", title="old"), TTL, delta=0.001)
+    loader = Loader("new")
+    monkeypatch.setattr(cache, "random", SimpleNamespace(random=lambda: 0.999999))
+
+    assert (await entities.get_or_load(KEY, Item, loader, TTL)).title == "old"
+    assert loader.calls == 0
+    assert entities.stale_hits == 0
+
+
+# --- stale-if-error ---
+
+async def test_expired_entry_served_when_backend_is_overloaded(redis, monkeypatch, clock):
+    patch_clock(monkeypatch, cache, clock)
+    entities = worker(redis, stale_if_error=3600)
+    await entities.set(KEY, Item(uuid="42", title="old"), CacheTTL(1, 1))
+    clock.advance(10)
+
+    item = await entities.get_or_load(KEY, Item, Loader(exc=Overloaded("elastic", 1.0)), TTL)
+    assert item.title == "old"
+    assert entities.stale_if_error_hits == 1
+
+    # другой воркер (пустой локальный уровень) берёт запасную запись из Redis
+    other = worker(redis, stale_if_error=3600)
+    item = await other.get_or_load(KEY, Item, Loader(exc=Overloaded("elastic", 1.0)), TTL)
+    assert item.title == "old"
+
+
+async def test_expired_entry_is_a_miss_when_backend_is_up(redis, monkeypatch, clock):
+    patch_clock(monkeypatch, cache, clock)
+    entities = worker(redis, stale_if_error=3600)
+    await entities.set(KEY, Item(uuid="42", title="old"), CacheTTL(1, 1))
+    clock.advance(10)
+
+    assert (await entities.get_or_load(KEY, Item, Loader("new"), TTL)).title == "new"
+    assert await entities.get(KEY, Item) is not None
+
+
+async def test_overloaded_without_stale_copy_propagates(redis):
+    entities = worker(redis, stale_if_error=3600)
+    with pytest.raises(Overloaded):
+        await entities.get_or_load(KEY, Item, Loader(exc=Overloaded("elastic", 1.0)), TTL)
+
+
+async def test_get_many_serves_stale_only_when_every_miss_has_a_copy(redis, monkeypatch, clock):
+    patch_clock(monkeypatch, cache, clock)
+    entities = worker(redis, stale_if_error=3600)
+    await entities.set("film:0:1", Item(uuid="1", title="old"), CacheTTL(1, 1))
+    clock.advance(10)
+
+    async def overloaded(_ids):
+        raise Overloaded("elastic", 1.0)
+
+    found = await entities.get_many("film:0:", ["1"], Item, overloaded, TTL)
+    assert found["1"].title == "old"
+    with pytest.raises(Overloaded):
+        await entities.get_many("film:0:", ["1", "2"], Item, overloaded, TTL)
+
+
+async def test_entry_header_round_trip_and_legacy_format():
+    entry = cache._Entry(b'{"uuid":"42"}', 100.5, 0.25, hard_expires_at=200.0)  # pylint: disable=protected-access
+    decoded = cache._decode(cache._encode(entry))  # pylint: disable=protected-access
+    assert (decoded.payload, decoded.soft_expires_at, decoded.delta, decoded.hard_expires_at) == (
+        b'{"uuid":"42"}', 100.5, 0.25, 200.0,
+    )
+    # запись без жёсткого срока в заголовке — срок по TTL ключа
+    assert cache._decode(b"100.000 0.1000\n{}").hard_expires_at == float("inf")  # pylint: disable=protected-access
+    with pytest.raises(ValueError):
+        cache._decode(b'{"uuid": "42"}')  # pylint: disable=protected-access
+
+
+# --- инвалидация через pub/sub ---
+
+async def test_invalidation_reaches_other_workers(redis):
+    writer, reader = worker(redis), worker(redis)
+    listener = asyncio.create_task(reader.listen())
+    try:
+        await reader.get_or_load(KEY, Item, Loader("v1"), TTL)
+        for _ in range(100):
+            if reader.invalidations:
+                break  # подписка оформлена
+            await asyncio.sleep(0.01)
+        seen = reader.invalidations
+
+        await writer.invalidate(KEY)
+        for _ in range(100):
+            if reader.local.get(KEY) is None:
+                break
+            await asyncio.sleep(0.01)
+        assert reader.local.get(KEY) is None
+        assert reader.invalidations > seen
+        assert not await redis.exists(KEY)
+        assert (await reader.get_or_load(KEY, Item, Loader("v2"), TTL)).title == "v2"
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
@@ -0,0 +1,70 @@
+import asyncio
+from collections import Counter
+
+import orjson
+import pytest
+
+from benchmarks import fakes
+from src.api.v1.films import films_export
+from src.services.cache import EntityCache, LocalCache
+from src.services.container import create_services
+from src.services.export import export_ndjson
+from src.services.query_cache import QueryCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def store():
+    return fakes.FakeStore(fakes.make_catalog(25, 10, seed=1))
+
+
+@pytest.fixture
+def pits(store, monkeypatch):
+    """Счётчик открытий/закрытий PIT мимо кеша ответов заглушки."""
+    counts: Counter = Counter()
+    handle = store.handle
+
+    def counting(method, target, body):
+        if "_pit" in target:
+            counts["close" if method == "DELETE" else "open"] += 1
+        return handle(method, target, body)
+
+    monkeypatch.setattr(store, "handle", counting)
+    return counts
+
+
+@pytest.fixture
+async def es(store):
+    client = fakes.fake_elastic(store, 0)
+    yield client
+    await client.close()
+
+
+async def test_stream_reads_everything_and_closes_pit(es, pits):
+    stream = await export_ndjson(es, "movies", ["id"], batch_size=10)
+    assert pits == {"open": 1}
+    lines = b"".join([chunk async for chunk in stream]).splitlines()
+    assert len({orjson.loads(line)["id"] for line in lines}) == 25
+    assert pits == {"open": 1, "close": 1}
+
+
+async def test_pit_closed_when_stream_is_dropped_before_first_chunk(es, pits):
+    stream = await export_ndjson(es, "movies", ["id"], batch_size=10)
+    await stream.aclose()
+    assert pits == {"open": 1, "close": 1}
+
+
+async def test_route_closes_pit_when_client_disconnects_early(es, pits):
+    cache = EntityCache(fakes.fake_redis(), LocalCache(10, 60), "invalidate")
+    services = create_services(cache, QueryCache(cache, 60, 5), es)
+    response = await films_export(updated_since=None, film_service=services.film)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(_message):
+        await asyncio.Event().wait()  # заголовки так и не ушли
+
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    assert pits == {"open": 1, "close": 1}
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from elasticsearch import NotFoundError
+
+from benchmarks import fakes
+from src.core.metrics import BACKEND_ERRORS, BACKEND_LATENCY
+from src.core.overload import AdaptiveLimiter, CircuitBreaker, Guard, Overloaded
+from src.db import elastic
+from src.db.msearch import SearchBatcher
+
+pytestmark = pytest.mark.anyio
+
+QUERY = {"query": {"match_all": {}}, "size": 2}
+
+
+@pytest.fixture
+def store():
+    return fakes.FakeStore(fakes.make_catalog(50, 20, seed=1))
+
+
+@pytest.fixture
+async def es(store):
+    client = fakes.fake_elastic(store, 0)
+    client.batcher = SearchBatcher(client, window=0.01, max_size=8)
+    yield client
+    await client.close()
+
+
+def make_guard() -> Guard:
+    return Guard(
+        "elastic",
+        AdaptiveLimiter(initial=10, min_limit=1, max_limit=20, latency=1.0,
+                        queue_size=10, queue_timeout=1.0),
+        CircuitBreaker(failure_threshold=2, reset_timeout=5.0),
+        elastic.is_failure,
+        retry_after=1.0,
+    )
+
+
+def sample(metric, index: str) -> float:
+    name = "_count" if metric is BACKEND_LATENCY else "_total"
+    for family in metric.collect():
+        for s in family.samples:
+            if s.name.endswith(name) and s.labels == {
+                "backend": "elastic", "operation": "search", "index": index,
+            }:
+                return s.value
+    return 0.0
+
+
+async def test_concurrent_searches_share_one_msearch(es, store):
+    results = await asyncio.gather(*(
+        es.search(index=index, body=QUERY) for index in ("movies", "genres", "persons")
+    ))
+    assert [len(r["hits"]["hits"]) for r in results] == [2, 2, 2]
+    assert store.calls["msearch"] == 1
+    assert store.calls["search"] == 0
+
+
+async def test_item_errors_stay_with_their_search(es):
+    errors_before = sample(BACKEND_ERRORS, "missing")
+    latency_before = sample(BACKEND_LATENCY, "movies")
+    ok, missing = await asyncio.gather(
+        es.search(index="movies", body=QUERY),
+        es.search(index="missing", body=QUERY),
+        return_exceptions=True,
+    )
+    assert len(ok["hits"]["hits"]) == 2
+    assert isinstance(missing, NotFoundError)
+    assert sample(BACKEND_ERRORS, "missing") == errors_before + 1
+    assert sample(BACKEND_LATENCY, "movies") == latency_before + 1
+
+
+async def test_item_overload_reaches_the_guard(es, store, monkeypatch):
+    monkeypatch.setattr(store, "_msearch_item", lambda index, body: {
+        "status": 429, "error": {"type": "es_rejected_execution_exception"},
+    })
+    es.guard = make_guard()
+    results = await asyncio.gather(
+        *(es.search(index="movies", body=QUERY) for _ in range(2)), return_exceptions=True,
+    )
+    assert all(isinstance(r, Overloaded) for r in results)
+    assert es.guard.breaker.is_open
+    assert es.guard.limiter.limit < 10
@@ -0,0 +1,246 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from src.api.overload import overloaded_handler
+from src.core import overload
+from src.core.overload import (
+    HIGH, LOW, AdaptiveLimiter, CircuitBreaker, Guard, Overloaded,
+)
+from tests.conftest import patch_clock
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fake_clock(monkeypatch, clock):
+    patch_clock(monkeypatch, overload, clock)
+    return clock
+
+
+def make_limiter(**kwargs) -> AdaptiveLimiter:
+    params = dict(initial=2, min_limit=1, max_limit=4, latency=0.1, queue_size=4, queue_timeout=1.0)
+    params.update(kwargs)
+    return AdaptiveLimiter(**params)
+
+
+def make_breaker() -> CircuitBreaker:
+    return CircuitBreaker(failure_threshold=3, reset_timeout=5.0)
+
+
+# --- AdaptiveLimiter ---
+
+async def test_limit_grows_additively_on_fast_calls():
+    limiter = make_limiter()
+    await limiter.acquire(HIGH)
+    limiter.release(0.01)
+    assert limiter.limit == pytest.approx(2.5)
+    await limiter.acquire(HIGH)
+    limiter.release(0.01)
+    assert limiter.limit == pytest.approx(2.9)
+
+
+async def test_limit_does_not_exceed_max():
+    limiter = make_limiter(initial=4)
+    await limiter.acquire(HIGH)
+    limiter.release(0.01)
+    assert limiter.limit == 4
+
+
+async def test_slow_calls_decrease_once_per_window(clock):
+    limiter = make_limiter(initial=4)
+    for _ in range(3):
+        await limiter.acquire(HIGH)
+    for _ in range(3):
+        limiter.release(1.0)
+    assert limiter.limit == pytest.approx(3.6)
+
+    clock.advance(0.2)
+    await limiter.acquire(HIGH)
+    limiter.release(None, dropped=True)  # отменённый вызов лимит не меняет
+    assert limiter.limit == pytest.approx(3.6)
+    await limiter.acquire(HIGH)
+    limiter.release(0.01, dropped=True)
+    assert limiter.limit == pytest.approx(3.24)
+
+
+async def test_limit_does_not_drop_below_min(clock):
+    limiter = make_limiter(initial=1, backoff=0.5)
+    await limiter.acquire(HIGH)
+    limiter.release(1.0)
+    assert limiter.limit == 1
+
+
+async def test_high_priority_is_served_before_low():
+    limiter = make_limiter(initial=1, max_limit=1)
+    await limiter.acquire(HIGH)
+    order = []
+
+    async def waiter(name, priority):
+        await limiter.acquire(priority)
+        order.append(name)
+
+    low = asyncio.create_task(waiter("low", LOW))
+    await asyncio.sleep(0)
+    high = asyncio.create_task(waiter("high", HIGH))
+    await asyncio.sleep(0)
+    assert limiter.queued == 2
+
+    limiter.release(0.01)
+    await asyncio.sleep(0)
+    limiter.release(0.01)
+    await asyncio.gather(low, high)
+    assert order == ["high", "low"]
+
+
+async def test_low_priority_gets_half_of_the_queue():
+    limiter = make_limiter(initial=1, max_limit=1, queue_size=4)
+    await limiter.acquire(HIGH)
+    waiters = [asyncio.create_task(limiter.acquire(LOW)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(OverflowError):
+        await limiter.acquire(LOW)
+    high = asyncio.create_task(limiter.acquire(HIGH))
+    await asyncio.sleep(0)
+    assert limiter.queued == 3
+
+    for task in [*waiters, high]:
+        task.cancel()
+    await asyncio.gather(*waiters, high, return_exceptions=True)
+    assert limiter.queued == 0
+
+
+async def test_queue_timeout_leaves_no_slot_behind():
+    limiter = make_limiter(initial=1, max_limit=1, queue_timeout=0.01)
+    await limiter.acquire(HIGH)
+    with pytest.raises(asyncio.TimeoutError):
+        await limiter.acquire(HIGH)
+    assert limiter.queued == 0
+    limiter.release(0.01)
+    assert limiter.in_flight == 0
+
+
+# --- CircuitBreaker ---
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.record(True, breaker.allow())
+    assert not breaker.is_open
+    breaker.record(False, breaker.allow())
+    breaker.record(True, breaker.allow())
+    breaker.record(True, breaker.allow())
+    assert not breaker.is_open  # успех сбросил счётчик
+    breaker.record(True, breaker.allow())
+    assert breaker.is_open
+    assert breaker.allow() is None
+
+
+def test_breaker_half_open_probe_closes_on_success(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(True, breaker.allow())
+    assert breaker.retry_after() == pytest.approx(5.0)
+
+    clock.advance(2.0)
+    assert breaker.retry_after() == pytest.approx(3.0)
+    assert breaker.allow() is None
+
+    clock.advance(3.0)
+    probe = breaker.allow()
+    assert probe
+    assert breaker.allow() is None  # пока идёт проба — одна
+    breaker.record(False, probe)
+    assert not breaker.is_open
+    assert breaker.allow() == 0
+
+
+def test_breaker_failed_probe_reopens(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(True, breaker.allow())
+    clock.advance(5.0)
+    breaker.record(True, breaker.allow())
+    assert breaker.is_open
+    assert breaker.retry_after() == pytest.approx(5.0)
+
+
+def test_breaker_cancelled_probe_allows_another(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(True, breaker.allow())
+    clock.advance(5.0)
+    breaker.record(None, breaker.allow())
+    assert breaker.allow()
+
+
+def test_late_outcome_of_call_started_before_opening_is_ignored(clock):
+    breaker = make_breaker()
+    in_flight = breaker.allow()
+    for _ in range(3):
+        breaker.record(True, breaker.allow())
+    clock.advance(5.0)
+    probe = breaker.allow()
+
+    # вызов, начатый до открытия, завершился во время пробы
+    breaker.record(False, in_flight)
+    assert breaker.is_open
+    assert breaker.allow() is None  # вторую пробу не пропускает
+
+    breaker.record(False, probe)
+    assert not breaker.is_open
+
+
+# --- Guard и ответ 503 ---
+
+def make_guard(limiter=None) -> Guard:
+    return Guard(
+        "elastic", limiter or make_limiter(), make_breaker(),
+        lambda exc: isinstance(exc, ConnectionError), retry_after=1.5,
+    )
+
+
+async def test_guard_turns_backend_failures_into_overloaded():
+    guard = make_guard()
+    for _ in range(3):
+        with pytest.raises(Overloaded) as info:
+            async with guard.call(LOW):
+                raise ConnectionError
+        assert info.value.retry_after == 1.5
+
+    with pytest.raises(Overloaded) as info:
+        async with guard.call(LOW):
+            pass
+    assert info.value.retry_after == pytest.approx(5.0)
+    assert guard.stats()["circuit_open"] == 1
+    assert guard.limiter.in_flight == 0
+
+
+async def test_guard_passes_through_ordinary_errors():
+    guard = make_guard()
+    with pytest.raises(KeyError):
+        async with guard.call(HIGH):
+            raise KeyError("not found")
+    assert not guard.breaker.is_open
+    assert guard.breaker.failures == 0
+
+
+async def test_guard_sheds_when_queue_is_full():
+    guard = make_guard(make_limiter(initial=1, max_limit=1, queue_size=0))
+    async with guard.call(HIGH):
+        with pytest.raises(Overloaded) as info:
+            async with guard.call(HIGH):
+                pass
+    assert info.value.retry_after == 1.5
+
+
+async def test_overloaded_handler_sets_retry_after():
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    response = await overloaded_handler(request, Overloaded("elastic", 2.2))
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+
+    response = await overloaded_handler(request, Overloaded("elastic", 0.0))
+    assert response.headers["retry-after"] == "1"
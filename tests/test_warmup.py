@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from benchmarks import fakes
+from src.services.cache import EntityCache, LocalCache
+from src.services.container import create_services
+from src.services.popularity import Popularity
+from src.services.query_cache import QueryCache
+from src.services.warmup import LOCK_KEY, WarmUp
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def env():
+    catalog = fakes.make_catalog(60, 20, seed=1)
+    store = fakes.FakeStore(catalog)
+    redis = fakes.fake_redis()
+    es = fakes.fake_elastic(store, 0.01)
+    popularity = Popularity(redis, sample_rate=1.0, flush_interval=60,
+                            decay_interval=3600, max_size=1000)
+    for film in catalog["movies"][:40]:
+        popularity.record("film", film["id"])
+    await popularity.flush()
+    yield store, redis, es, popularity
+    await es.close()
+
+
+def make_warmup(redis, es, popularity) -> WarmUp:
+    cache = EntityCache(redis, LocalCache(1000, 60), "invalidate", popularity=popularity)
+    queries = QueryCache(cache, 60, 5)
+    return WarmUp(create_services(cache, queries, es), queries, es, popularity,
+                  top_entities=100, top_queries=10, batch_size=20, concurrency=2)
+
+
+async def test_one_worker_warms_redis_and_the_rest_just_wait(env):
+    store, redis, es, popularity = env
+    workers = [make_warmup(redis, es, popularity) for _ in range(3)]
+    await asyncio.gather(*(worker.run(5) for worker in workers))
+
+    roles = sorted(worker.role for worker in workers)
+    assert roles == ["follower", "follower", "leader"]
+    assert all(worker.ready for worker in workers)
+    assert store.calls["mget"] == 2  # 40 фильмов пачками по 20, один раз
+    assert not await redis.exists(LOCK_KEY)
+    leader = next(worker for worker in workers if worker.role == "leader")
+    assert leader.progress()["done"] == 40
+
+
+async def test_warm_up_does_not_count_towards_popularity(env):
+    _, redis, es, popularity = env
+    before = await redis.zrevrange("popular:film", 0, 0, withscores=True)
+    await make_warmup(redis, es, popularity).run(5)
+    await popularity.flush()
+    assert await redis.zrevrange("popular:film", 0, 0, withscores=True) == before